@@ -1,28 +1,133 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, Header, BackgroundTasks
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, Header
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import StreamingResponse, Response
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, TEXT, ReturnDocument, UpdateOne, monitoring
+from pymongo.errors import PyMongoError, DuplicateKeyError
 import os
+import io
+import csv
+import zlib
+import json
+import base64
+import html
 import logging
+import asyncio
+import time
+import threading
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from collections import OrderedDict, deque
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
 from typing import List, Optional, Dict, Any
 import uuid
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone, timedelta, time as dt_time
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 import jwt
 import bcrypt
+import aiohttp
 from emergentintegrations.llm.chat import LlmChat, UserMessage
+from litellm import acompletion
 from emergentintegrations.payments.stripe.checkout import StripeCheckout, CheckoutSessionResponse, CheckoutSessionRequest
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail, Email, To, Content
+from sendgrid.helpers.mail import Mail, Email, To, Content, Personalization, Substitution
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# ==================== METRICS ====================
+
+# Defined ahead of the MongoDB client so its command listener can be attached at creation.
+# Histograms are observed from pymongo's worker threads as well as the event loop.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+def _label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _label_set(names, values) -> str:
+    return ",".join(f'{name}="{_label_value(value)}"' for name, value in zip(names, values))
+
+class Histogram:
+    """Prometheus-style latency histogram keyed by a tuple of label values"""
+
+    def __init__(self, name: str, help_text: str, label_names: tuple, buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, seconds: float):
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += seconds
+
+    def render(self) -> List[str]:
+        with self._lock:
+            snapshot = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, counts, total in sorted(snapshot):
+            label_set = _label_set(self.label_names, labels)
+            prefix = f"{label_set}," if label_set else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {cumulative}')
+            suffix = f"{{{label_set}}}" if label_set else ""
+            lines.append(f"{self.name}_sum{suffix} {total:.6f}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "Time to serve an HTTP request, by route template", ("method", "route", "status"))
+mongo_command_duration = Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command round-trip time", ("collection", "command", "outcome"))
+outbound_call_duration = Histogram(
+    "outbound_call_duration_seconds", "Calls to external services (PubMed, SendGrid, LLM, Stripe)", ("service", "operation", "outcome"))
+event_loop_lag = Histogram(
+    "event_loop_lag_seconds", "How late the event loop wakes a task sleeping on a timer", (), LOOP_LAG_BUCKETS)
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Times every MongoDB command by collection and command name"""
+
+    def __init__(self):
+        self._collections = {}
+
+    def started(self, event):
+        if METRICS_ENABLED:
+            target = event.command.get(event.command_name)
+            # getMore names the cursor id first and the collection separately
+            collection = target if isinstance(target, str) else event.command.get("collection", "")
+            self._collections[(event.connection_id, event.request_id)] = collection
+
+    def succeeded(self, event):
+        self._finish(event, "ok")
+
+    def failed(self, event):
+        self._finish(event, "error")
+
+    def _finish(self, event, outcome: str):
+        collection = self._collections.pop((event.connection_id, event.request_id), None)
+        if collection is not None:
+            mongo_command_duration.observe((collection, event.command_name, outcome), event.duration_micros / 1e6)
+
+mongo_command_metrics = MongoCommandMetrics()
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[mongo_command_metrics])
 db = client[os.environ['DB_NAME']]
 
 # JWT Configuration
@@ -42,6 +147,92 @@ EMERGENT_LLM_KEY = os.environ.get('EMERGENT_LLM_KEY')
 # SendGrid Configuration
 SENDGRID_API_KEY = os.environ.get('SENDGRID_API_KEY')
 SENDER_EMAIL = os.environ.get('SENDER_EMAIL', 'noreply@nfadhfadh.com')
+SENDGRID_API_URL = "https://api.sendgrid.com/v3/mail/send"
+
+# Outbound HTTP configuration
+HTTP_POOL_LIMIT = int(os.environ.get('HTTP_POOL_LIMIT', '100'))
+HTTP_POOL_LIMIT_PER_HOST = int(os.environ.get('HTTP_POOL_LIMIT_PER_HOST', '20'))
+HTTP_KEEPALIVE_SECONDS = float(os.environ.get('HTTP_KEEPALIVE_SECONDS', '30'))
+PUBMED_TIMEOUT_SECONDS = float(os.environ.get('PUBMED_TIMEOUT_SECONDS', '20'))
+SENDGRID_TIMEOUT_SECONDS = float(os.environ.get('SENDGRID_TIMEOUT_SECONDS', '10'))
+
+# Email outbox configuration
+EMAIL_WORKER_CONCURRENCY = int(os.environ.get('EMAIL_WORKER_CONCURRENCY', '4'))
+# The token bucket meters SendGrid requests; each request carries up to EMAIL_BATCH_SIZE recipients
+SENDGRID_REQUESTS_PER_SECOND = float(os.environ.get('SENDGRID_REQUESTS_PER_SECOND', '10'))
+SENDGRID_REQUEST_BURST = int(os.environ.get('SENDGRID_REQUEST_BURST', '20'))
+EMAIL_MAX_ATTEMPTS = int(os.environ.get('EMAIL_MAX_ATTEMPTS', '5'))
+EMAIL_RETRY_BASE_SECONDS = float(os.environ.get('EMAIL_RETRY_BASE_SECONDS', '30'))
+EMAIL_RETRY_MAX_SECONDS = float(os.environ.get('EMAIL_RETRY_MAX_SECONDS', '3600'))
+EMAIL_LEASE_SECONDS = float(os.environ.get('EMAIL_LEASE_SECONDS', '120'))
+EMAIL_OUTBOX_POLL_SECONDS = float(os.environ.get('EMAIL_OUTBOX_POLL_SECONDS', '5'))
+EMAIL_OUTBOX_RETENTION_DAYS = float(os.environ.get('EMAIL_OUTBOX_RETENTION_DAYS', '7'))  # Completed jobs hold recipient addresses
+EMAIL_BATCH_SIZE = min(int(os.environ.get('EMAIL_BATCH_SIZE', '1000')), 1000)  # SendGrid allows 1000 personalizations per request
+
+# Stripe webhook inbox configuration
+WEBHOOK_WORKER_CONCURRENCY = int(os.environ.get('WEBHOOK_WORKER_CONCURRENCY', '2'))
+WEBHOOK_MAX_ATTEMPTS = int(os.environ.get('WEBHOOK_MAX_ATTEMPTS', '8'))
+WEBHOOK_RETRY_BASE_SECONDS = float(os.environ.get('WEBHOOK_RETRY_BASE_SECONDS', '5'))
+WEBHOOK_RETRY_MAX_SECONDS = float(os.environ.get('WEBHOOK_RETRY_MAX_SECONDS', '900'))
+WEBHOOK_LEASE_SECONDS = float(os.environ.get('WEBHOOK_LEASE_SECONDS', '60'))
+WEBHOOK_POLL_SECONDS = float(os.environ.get('WEBHOOK_POLL_SECONDS', '5'))
+# Processed events hold raw Stripe payloads; keep them well past Stripe's 3-day retry window so redeliveries still dedupe
+WEBHOOK_EVENT_RETENTION_DAYS = float(os.environ.get('WEBHOOK_EVENT_RETENTION_DAYS', '30'))
+
+# Payment status configuration
+CHECKOUT_STATUS_CACHE_SECONDS = float(os.environ.get('CHECKOUT_STATUS_CACHE_SECONDS', '3'))
+CHECKOUT_STATUS_CACHE_MAX_ENTRIES = int(os.environ.get('CHECKOUT_STATUS_CACHE_MAX_ENTRIES', '1000'))
+PAYMENT_STATUS_MAX_WAIT_SECONDS = float(os.environ.get('PAYMENT_STATUS_MAX_WAIT_SECONDS', '25'))
+PAYMENT_STATUS_RECHECK_SECONDS = float(os.environ.get('PAYMENT_STATUS_RECHECK_SECONDS', '1'))
+
+# Reminder scheduler configuration
+REMINDER_SCHEDULER_ENABLED = os.environ.get('REMINDER_SCHEDULER_ENABLED', 'true').lower() == 'true'
+REMINDER_MAX_LATENESS_MINUTES = int(os.environ.get('REMINDER_MAX_LATENESS_MINUTES', '60'))
+REMINDER_LOCK_SECONDS = float(os.environ.get('REMINDER_LOCK_SECONDS', '90'))
+INSTANCE_ID = str(uuid.uuid4())
+
+# Admin analytics configuration
+ANALYTICS_REFRESH_SECONDS = float(os.environ.get('ANALYTICS_REFRESH_SECONDS', '300'))
+
+# Chat context configuration
+CHAT_CONTEXT_TOKEN_BUDGET = int(os.environ.get('CHAT_CONTEXT_TOKEN_BUDGET', '3000'))
+CHAT_SUMMARY_MAX_TOKENS = int(os.environ.get('CHAT_SUMMARY_MAX_TOKENS', '500'))
+CHAT_HISTORY_FETCH_LIMIT = int(os.environ.get('CHAT_HISTORY_FETCH_LIMIT', '100'))
+
+# LLM call configuration
+LLM_PROVIDER = os.environ.get('LLM_PROVIDER', 'openai')
+LLM_MODEL = os.environ.get('LLM_MODEL', 'gpt-5.2')
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', '8'))
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.environ.get('LLM_QUEUE_TIMEOUT_SECONDS', '8'))
+LLM_CALL_TIMEOUT_SECONDS = float(os.environ.get('LLM_CALL_TIMEOUT_SECONDS', '60'))
+# Streaming replies call litellm directly through the same proxy LlmChat uses for the Emergent key
+LLM_API_BASE = os.environ.get('LLM_API_BASE', 'https://integrations.emergentagent.com/llm')
+
+# Chat storage layout: "documents" (one chat_messages doc per turn) or "buckets" (chat_buckets, N turns per doc)
+CHAT_STORAGE_LAYOUT = os.environ.get('CHAT_STORAGE_LAYOUT', 'documents')
+CHAT_BUCKET_SIZE = int(os.environ.get('CHAT_BUCKET_SIZE', '50'))
+
+# Password hashing pool configuration
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', '4'))
+PASSWORD_HASH_MAX_CONCURRENCY = int(os.environ.get('PASSWORD_HASH_MAX_CONCURRENCY', str(PASSWORD_HASH_WORKERS)))
+PASSWORD_HASH_MAX_QUEUE = int(os.environ.get('PASSWORD_HASH_MAX_QUEUE', '1000'))
+
+# Authenticated user cache configuration
+USER_CACHE_TTL_SECONDS = float(os.environ.get('USER_CACHE_TTL_SECONDS', '60'))
+ADMIN_USER_HEADER_TTL_SECONDS = float(os.environ.get('ADMIN_USER_HEADER_TTL_SECONDS', '60'))
+USER_CACHE_MAX_ENTRIES = int(os.environ.get('USER_CACHE_MAX_ENTRIES', '10000'))
+
+# PubMed results cache configuration
+PUBMED_CACHE_TTL_SECONDS = float(os.environ.get('PUBMED_CACHE_TTL_SECONDS', '900'))
+PUBMED_CACHE_STALE_SECONDS = float(os.environ.get('PUBMED_CACHE_STALE_SECONDS', '3600'))
+PUBMED_CACHE_MAX_ENTRIES = int(os.environ.get('PUBMED_CACHE_MAX_ENTRIES', '500'))
+PUBMED_MAX_RESULTS = int(os.environ.get('PUBMED_MAX_RESULTS', '100'))  # PubMed results pageable after admin articles
+PUBMED_BLOCK_SIZE = int(os.environ.get('PUBMED_BLOCK_SIZE', '20'))  # Aligned retstart blocks, so pages share cache entries
+
+# Metrics configuration
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # When set, /metrics requires "Authorization: Bearer <token>"
+EVENT_LOOP_LAG_INTERVAL_SECONDS = float(os.environ.get('EVENT_LOOP_LAG_INTERVAL_SECONDS', '0.5'))
 
 # Create the main app
 app = FastAPI()
@@ -54,6 +245,65 @@ security = HTTPBearer()
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# ==================== HTTP CLIENT ====================
+
+_http_session: Optional[aiohttp.ClientSession] = None
+
+OUTBOUND_SERVICES = {"eutils.ncbi.nlm.nih.gov": "pubmed", "api.sendgrid.com": "sendgrid"}
+
+def outbound_trace_config() -> aiohttp.TraceConfig:
+    """Record every request made through the shared session in outbound_call_duration"""
+    async def on_start(session, context, params):
+        context.started_at = time.perf_counter()
+
+    def observe(context, url, outcome):
+        if METRICS_ENABLED:
+            service = OUTBOUND_SERVICES.get(url.host, url.host)
+            outbound_call_duration.observe((service, url.path.rsplit("/", 1)[-1], outcome), time.perf_counter() - context.started_at)
+
+    async def on_end(session, context, params):
+        observe(context, params.url, "ok" if params.response.status < 400 else "error")
+
+    async def on_exception(session, context, params):
+        observe(context, params.url, "error")
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_start)
+    trace_config.on_request_end.append(on_end)
+    trace_config.on_request_exception.append(on_exception)
+    return trace_config
+
+@asynccontextmanager
+async def timed_outbound(service: str, operation: str):
+    """Time a call made through a client library rather than the shared HTTP session"""
+    started_at = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        if METRICS_ENABLED:
+            outbound_call_duration.observe((service, operation, outcome), time.perf_counter() - started_at)
+
+def get_http_session() -> aiohttp.ClientSession:
+    """Get the application-wide pooled HTTP session used for all outbound calls"""
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_LIMIT,
+            limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+            keepalive_timeout=HTTP_KEEPALIVE_SECONDS,
+            ttl_dns_cache=300
+        )
+        _http_session = aiohttp.ClientSession(connector=connector, trace_configs=[outbound_trace_config()])
+    return _http_session
+
+async def close_http_session():
+    global _http_session
+    if _http_session is not None and not _http_session.closed:
+        await _http_session.close()
+    _http_session = None
+
 # ==================== MODELS ====================
 
 class UserCreate(BaseModel):
@@ -151,6 +401,219 @@ def hash_password(password: str) -> str:
 def verify_password(password: str, hashed: str) -> bool:
     return bcrypt.checkpw(password.encode(), hashed.encode())
 
+class PasswordHashPool:
+    """Runs bcrypt work on a dedicated thread pool so it never blocks the event loop"""
+
+    def __init__(self, workers: int, max_concurrency: int, max_queue: int):
+        self.workers = workers
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.waiting = 0
+        self.in_flight = 0
+        self.peak_waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+
+    async def run(self, fn, *args):
+        if self.max_queue and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Server busy, please try again")
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        self.peak_waiting = max(self.peak_waiting, self.waiting)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        started_at = time.perf_counter()
+        self.total_wait_seconds += started_at - queued_at
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self.total_run_seconds += time.perf_counter() - started_at
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "queue_depth": self.waiting,
+            "peak_queue_depth": self.peak_waiting,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.total_wait_seconds / self.completed * 1000, 2) if self.completed else 0.0,
+            "avg_run_ms": round(self.total_run_seconds / self.completed * 1000, 2) if self.completed else 0.0
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+password_pool = PasswordHashPool(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_CONCURRENCY, PASSWORD_HASH_MAX_QUEUE)
+
+async def hash_password_async(password: str) -> str:
+    return await password_pool.run(hash_password, password)
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    return await password_pool.run(verify_password, password, hashed)
+
+class TTLCache:
+    """Bounded in-process LRU cache whose entries expire after a fixed TTL"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+
+    def invalidate_where(self, predicate):
+        for key in [k for k in self._entries if predicate(k)]:
+            del self._entries[key]
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+user_cache = TTLCache(USER_CACHE_MAX_ENTRIES, USER_CACHE_TTL_SECONDS)
+
+class AsyncTTLCache:
+    """Async LRU cache that serves stale entries while refreshing and coalesces concurrent misses"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float, stale_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.refreshes = 0
+        self.errors = 0
+
+    async def get_or_fetch(self, key, fetch):
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, fetched_at = entry
+            age = time.monotonic() - fetched_at
+            if age < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            if age < self.ttl_seconds + self.stale_seconds:
+                self._entries.move_to_end(key)
+                self.stale_hits += 1
+                if key not in self._inflight:
+                    self.refreshes += 1
+                    self._start_fetch(key, fetch)
+                return value
+            del self._entries[key]
+        
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = self._start_fetch(key, fetch)
+        return await asyncio.shield(task)
+
+    def _start_fetch(self, key, fetch):
+        task = asyncio.create_task(self._load(key, fetch))
+        self._inflight[key] = task
+        task.add_done_callback(self._on_fetch_done)
+        return task
+
+    async def _load(self, key, fetch):
+        try:
+            value = await fetch()
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def _on_fetch_done(self, task):
+        if not task.cancelled() and task.exception() is not None:
+            self.errors += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "stale_seconds": self.stale_seconds,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "refreshes": self.refreshes,
+            "errors": self.errors,
+            "in_flight": len(self._inflight),
+            "hit_ratio": round((self.hits + self.stale_hits + self.coalesced) / lookups, 4) if lookups else 0.0
+        }
+
+async def get_cached_user(user_id: str) -> Optional[dict]:
+    """Load a user document, serving repeat lookups from the in-process cache"""
+    user = user_cache.get(user_id)
+    if user is None:
+        user = await db.users.find_one({"id": user_id}, {"_id": 0})
+        if not user:
+            return None
+        user_cache.set(user_id, user)
+    return dict(user)
+
 def create_token(user_id: str, is_admin: bool = False) -> str:
     payload = {
         "user_id": user_id,
@@ -166,7 +629,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         is_admin = payload.get("is_admin", False)
         if is_admin:
             return {"user_id": user_id, "is_admin": True}
-        user = await db.users.find_one({"id": user_id}, {"_id": 0})
+        user = await get_cached_user(user_id)
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
         return user
@@ -201,6 +664,43 @@ def get_price_for_country(country: str) -> tuple:
     # Default: $10 for all other countries worldwide
     return "international", 10.00
 
+# ==================== PAGINATION ====================
+
+PAGE_DEFAULT_LIMIT = 20
+PAGE_MAX_LIMIT = 100
+
+def encode_page_cursor(doc: dict) -> str:
+    """Opaque continuation token for the (created_at, id) position of doc"""
+    raw = json.dumps([doc["created_at"], doc["id"]], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_page_cursor(token: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        created_at, doc_id = json.loads(raw)
+        if not isinstance(created_at, str) or not isinstance(doc_id, str):
+            raise ValueError
+        return created_at, doc_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def paginate(collection, query: dict, projection: dict, limit: int, cursor: Optional[str], direction: int = DESCENDING, max_limit: int = PAGE_MAX_LIMIT):
+    """Keyset page over (created_at, id) in the given direction; returns (docs, next_cursor)"""
+    limit = max(1, min(limit, max_limit))
+    query = dict(query)
+    if cursor:
+        created_at, doc_id = decode_page_cursor(cursor)
+        op = "$lt" if direction == DESCENDING else "$gt"
+        # The created_at bound keeps the index scan tight; the $or breaks ties on id
+        query["created_at"] = {**query.get("created_at", {}), "$lte" if direction == DESCENDING else "$gte": created_at}
+        query["$or"] = [{"created_at": {op: created_at}}, {"id": {op: doc_id}}]
+    
+    docs = await collection.find(query, projection).sort(
+        [("created_at", direction), ("id", direction)]
+    ).limit(limit + 1).to_list(limit + 1)
+    next_cursor = encode_page_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return docs[:limit], next_cursor
+
 # ==================== AUTH ROUTES ====================
 
 @api_router.post("/auth/register")
@@ -211,11 +711,12 @@ async def register(user: UserCreate):
     
     user_id = str(uuid.uuid4())
     tier, price = get_price_for_country(user.country)
+    password_hash = await hash_password_async(user.password)
     
     user_doc = {
         "id": user_id,
         "username": user.username,
-        "password_hash": hash_password(user.password),
+        "password_hash": password_hash,
         "birthdate": user.birthdate,
         "country": user.country,
         "city": user.city,
@@ -225,10 +726,14 @@ async def register(user: UserCreate):
         "subscription_tier": tier,
         "subscription_status": "inactive",
         "subscription_price": price,
+        "chat_sessions_built": True,
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     
-    await db.users.insert_one(user_doc)
+    try:
+        await db.users.insert_one(user_doc)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Username already exists")
     token = create_token(user_id)
     
     return {
@@ -251,7 +756,7 @@ async def register(user: UserCreate):
 @api_router.post("/auth/login")
 async def login(credentials: UserLogin):
     user = await db.users.find_one({"username": credentials.username}, {"_id": 0})
-    if not user or not verify_password(credentials.password, user["password_hash"]):
+    if not user or not await verify_password_async(credentials.password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     token = create_token(user["id"])
@@ -301,6 +806,7 @@ async def get_me(current_user: dict = Depends(get_current_user)):
 @api_router.put("/auth/language")
 async def update_language(data: LanguageUpdate, current_user: dict = Depends(get_current_user)):
     await db.users.update_one({"id": current_user["id"]}, {"$set": {"language": data.language}})
+    user_cache.invalidate(current_user["id"])
     return {"message": "Language updated", "language": data.language}
 
 # ==================== MOOD CHECK-IN ROUTES ====================
@@ -359,8 +865,8 @@ QUESTIONS_OF_THE_DAY = {
     ]
 }
 
-async def calculate_streak(user_id: str) -> dict:
-    """Calculate user's check-in streak"""
+async def calculate_streak_from_history(user_id: str) -> dict:
+    """Calculate user's check-in streak by replaying recent check-ins (legacy algorithm)"""
     checkins = await db.mood_checkins.find(
         {"user_id": user_id}, {"_id": 0, "created_at": 1}
     ).sort("created_at", -1).to_list(365)
@@ -420,6 +926,184 @@ async def calculate_streak(user_id: str) -> dict:
         "total_checkins": len(checkins)
     }
 
+def _utc_day(offset_days: int = 0) -> str:
+    return (datetime.now(timezone.utc) - timedelta(days=offset_days)).strftime("%Y-%m-%d")
+
+def streak_info_from_state(state: Optional[dict]) -> dict:
+    """Turn a stored streak state into the streak response relative to today"""
+    if not state or not state.get("total_checkins"):
+        return {"current_streak": 0, "longest_streak": 0, "checked_in_today": False, "weekly_badge": False, "total_checkins": 0}
+    
+    last_day = state.get("last_checkin_date")
+    checked_in_today = last_day == _utc_day()
+    # The stored streak is as of the last check-in day; it is broken once a full day is missed
+    current_streak = state.get("current_streak", 0) if last_day in (_utc_day(), _utc_day(1)) else 0
+    
+    return {
+        "current_streak": current_streak,
+        "longest_streak": state.get("longest_streak", 0),
+        "checked_in_today": checked_in_today,
+        "weekly_badge": current_streak >= 7,
+        "total_checkins": state.get("total_checkins", 0)
+    }
+
+async def compute_streak_state(user_id: str) -> dict:
+    """Derive a user's streak state from their full check-in history"""
+    pipeline = [
+        {"$match": {"user_id": user_id}},
+        {"$group": {"_id": {"$substrBytes": ["$created_at", 0, 10]}, "count": {"$sum": 1}}},
+        {"$sort": {"_id": 1}}
+    ]
+    days = await db.mood_checkins.aggregate(pipeline).to_list(None)
+    
+    longest_streak = 0
+    run = 0
+    prev_date = None
+    for day in days:
+        current_date = datetime.strptime(day["_id"], "%Y-%m-%d")
+        run = run + 1 if prev_date is not None and (current_date - prev_date).days == 1 else 1
+        longest_streak = max(longest_streak, run)
+        prev_date = current_date
+    
+    return {
+        "user_id": user_id,
+        "current_streak": run,
+        "longest_streak": longest_streak,
+        "last_checkin_date": days[-1]["_id"] if days else None,
+        "total_checkins": sum(d["count"] for d in days),
+        "updated_at": datetime.now(timezone.utc).isoformat()
+    }
+
+async def rebuild_streak_state(user_id: str) -> dict:
+    """Recompute a user's streak state from their full check-in history and store it"""
+    state = await compute_streak_state(user_id)
+    await db.mood_streaks.update_one({"user_id": user_id}, {"$set": state}, upsert=True)
+    return state
+
+async def seed_once(collection, user_id: str, compute) -> dict:
+    """Return the user's stored state, creating it from history if missing without ever overwriting it.
+
+    Check-ins seed their user's state before they are inserted, so a history snapshot
+    that still wins the insert cannot contain a check-in that will also be counted
+    incrementally; snapshots that lose the race are discarded.
+    """
+    state = await collection.find_one({"user_id": user_id}, {"_id": 0})
+    if state is not None:
+        return state
+    state = await compute(user_id)
+    try:
+        result = await collection.update_one(
+            {"user_id": user_id},
+            {"$setOnInsert": {k: v for k, v in state.items() if k != "user_id"}},
+            upsert=True
+        )
+        if result.upserted_id is not None:
+            return state
+    except DuplicateKeyError:
+        # A concurrent upsert inserted first
+        pass
+    return await collection.find_one({"user_id": user_id}, {"_id": 0})
+
+async def seed_streak_state(user_id: str) -> dict:
+    return await seed_once(db.mood_streaks, user_id, compute_streak_state)
+
+async def record_checkin_streak(user_id: str, checkin_day: str):
+    """Atomically advance the stored streak state for a new check-in on checkin_day"""
+    previous_day = (datetime.strptime(checkin_day, "%Y-%m-%d") - timedelta(days=1)).strftime("%Y-%m-%d")
+    update_pipeline = [
+        {"$set": {
+            "total_checkins": {"$add": [{"$ifNull": ["$total_checkins", 0]}, 1]},
+            "current_streak": {"$switch": {
+                "branches": [
+                    {"case": {"$eq": ["$last_checkin_date", checkin_day]}, "then": "$current_streak"},
+                    {"case": {"$eq": ["$last_checkin_date", previous_day]}, "then": {"$add": ["$current_streak", 1]}}
+                ],
+                "default": 1
+            }}
+        }},
+        {"$set": {
+            "longest_streak": {"$max": [{"$ifNull": ["$longest_streak", 0]}, "$current_streak"]},
+            "last_checkin_date": checkin_day,
+            "updated_at": datetime.now(timezone.utc).isoformat()
+        }}
+    ]
+    # The state was seeded before the check-in was inserted (see seed_once)
+    await db.mood_streaks.update_one({"user_id": user_id}, update_pipeline)
+
+async def calculate_streak(user_id: str) -> dict:
+    """Get user's check-in streak from the incrementally maintained streak state"""
+    return streak_info_from_state(await seed_streak_state(user_id))
+
+def _rollup_key(feeling: str) -> str:
+    """Escape a feeling name so it can be used as a MongoDB field name"""
+    key = feeling.replace(".", "\uff0e") or "unknown"
+    return "\uff04" + key[1:] if key.startswith("$") else key
+
+def _rollup_feeling(key: str) -> str:
+    return key.replace("\uff0e", ".").replace("\uff04", "$")
+
+def _iso_week(day: str) -> str:
+    year, week, _ = datetime.strptime(day, "%Y-%m-%d").isocalendar()
+    return f"{year}-W{week:02d}"
+
+def _decode_counts(counts: dict) -> dict:
+    return {_rollup_feeling(k): v for k, v in counts.items()}
+
+async def compute_mood_rollup(user_id: str) -> dict:
+    """Derive a user's feeling counters from their full check-in history"""
+    pipeline = [
+        {"$match": {"user_id": user_id}},
+        {"$group": {"_id": {"feeling": "$feeling", "day": {"$substrBytes": ["$created_at", 0, 10]}}, "count": {"$sum": 1}}}
+    ]
+    groups = await db.mood_checkins.aggregate(pipeline).to_list(None)
+    
+    rollup = {"user_id": user_id, "total_checkins": 0, "feelings": {}, "days": {}, "weeks": {}}
+    for group in groups:
+        key = _rollup_key(group["_id"]["feeling"])
+        day = group["_id"]["day"]
+        week = _iso_week(day)
+        count = group["count"]
+        rollup["total_checkins"] += count
+        rollup["feelings"][key] = rollup["feelings"].get(key, 0) + count
+        day_counts = rollup["days"].setdefault(day, {})
+        day_counts[key] = day_counts.get(key, 0) + count
+        week_counts = rollup["weeks"].setdefault(week, {})
+        week_counts[key] = week_counts.get(key, 0) + count
+    rollup["updated_at"] = datetime.now(timezone.utc).isoformat()
+    return rollup
+
+async def rebuild_mood_rollup(user_id: str) -> dict:
+    """Recompute a user's feeling counters from their full check-in history and store them"""
+    rollup = await compute_mood_rollup(user_id)
+    await db.mood_rollups.replace_one({"user_id": user_id}, rollup, upsert=True)
+    return rollup
+
+async def seed_mood_rollup(user_id: str) -> dict:
+    return await seed_once(db.mood_rollups, user_id, compute_mood_rollup)
+
+async def record_checkin_rollup(user_id: str, feeling: str, checkin_day: str):
+    """Increment the per-user feeling counters for a new check-in"""
+    key = _rollup_key(feeling)
+    # The rollup was seeded before the check-in was inserted (see seed_once)
+    await db.mood_rollups.update_one(
+        {"user_id": user_id},
+        {
+            "$inc": {
+                "total_checkins": 1,
+                f"feelings.{key}": 1,
+                f"days.{checkin_day}.{key}": 1,
+                f"weeks.{_iso_week(checkin_day)}.{key}": 1
+            },
+            "$set": {"updated_at": datetime.now(timezone.utc).isoformat()}
+        }
+    )
+
+async def get_mood_rollup(user_id: str, projection: Optional[dict] = None) -> dict:
+    rollup = await db.mood_rollups.find_one({"user_id": user_id}, projection or {"_id": 0})
+    if rollup is None:
+        rollup = await seed_mood_rollup(user_id)
+    return rollup
+
 @api_router.get("/feelings")
 async def get_feelings():
     return {"feelings": FEELINGS}
@@ -443,9 +1127,13 @@ async def create_mood_checkin(mood: MoodCheckIn, current_user: dict = Depends(ge
         "note": mood.note or "",
         "created_at": datetime.now(timezone.utc).isoformat()
     }
+    # Seed from history first so the snapshot cannot also include this check-in
+    await asyncio.gather(seed_streak_state(current_user["id"]), seed_mood_rollup(current_user["id"]))
     await db.mood_checkins.insert_one(mood_doc)
     
-    # Calculate streak after check-in
+    # Advance streak state and feeling counters with this check-in
+    await record_checkin_streak(current_user["id"], mood_doc["created_at"][:10])
+    await record_checkin_rollup(current_user["id"], mood.feeling, mood_doc["created_at"][:10])
     streak_info = await calculate_streak(current_user["id"])
     
     return {
@@ -458,11 +1146,10 @@ async def create_mood_checkin(mood: MoodCheckIn, current_user: dict = Depends(ge
     }
 
 @api_router.get("/mood/checkins")
-async def get_mood_checkins(current_user: dict = Depends(get_current_user)):
-    checkins = await db.mood_checkins.find(
-        {"user_id": current_user["id"]}, {"_id": 0}
-    ).sort("created_at", -1).to_list(100)
-    return {"checkins": checkins}
+async def get_mood_checkins(limit: int = PAGE_DEFAULT_LIMIT, cursor: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    """Get check-ins newest first; pass next_cursor back as cursor for the following page"""
+    checkins, next_cursor = await paginate(db.mood_checkins, {"user_id": current_user["id"]}, {"_id": 0}, limit, cursor)
+    return {"checkins": checkins, "next_cursor": next_cursor}
 
 @api_router.get("/mood/streak")
 async def get_mood_streak(current_user: dict = Depends(get_current_user)):
@@ -472,16 +1159,10 @@ async def get_mood_streak(current_user: dict = Depends(get_current_user)):
 
 @api_router.get("/mood/summary")
 async def get_mood_summary(current_user: dict = Depends(get_current_user)):
-    checkins = await db.mood_checkins.find(
-        {"user_id": current_user["id"]}, {"_id": 0}
-    ).to_list(1000)
-    
-    feeling_counts = {}
-    for checkin in checkins:
-        feeling = checkin["feeling"]
-        feeling_counts[feeling] = feeling_counts.get(feeling, 0) + 1
+    rollup = await get_mood_rollup(current_user["id"], {"_id": 0, "total_checkins": 1, "feelings": 1})
+    feeling_counts = _decode_counts(rollup.get("feelings", {}))
     
-    total = len(checkins)
+    total = rollup.get("total_checkins", 0)
     streak_info = await calculate_streak(current_user["id"])
     
     return {
@@ -491,6 +1172,20 @@ async def get_mood_summary(current_user: dict = Depends(get_current_user)):
         "streak": streak_info
     }
 
+@api_router.get("/mood/distribution")
+async def get_mood_distribution(period: str = "day", last: int = 30, current_user: dict = Depends(get_current_user)):
+    """Get feeling counts bucketed per day or per ISO week"""
+    if period not in ("day", "week"):
+        raise HTTPException(status_code=400, detail="period must be 'day' or 'week'")
+    field = "days" if period == "day" else "weeks"
+    rollup = await get_mood_rollup(current_user["id"], {"_id": 0, field: 1})
+    
+    buckets = sorted(rollup.get(field, {}).items())[-last:] if last > 0 else []
+    return {
+        "period": period,
+        "buckets": [{"bucket": bucket, "feeling_distribution": _decode_counts(counts)} for bucket, counts in buckets]
+    }
+
 @api_router.get("/mood/weekly-report")
 async def get_weekly_report(current_user: dict = Depends(get_current_user)):
     """Generate weekly emotional report"""
@@ -604,11 +1299,20 @@ async def update_notification_settings(settings: NotificationSettings, current_u
 
 # ==================== EMAIL REMINDERS ====================
 
+USERNAME_PLACEHOLDER = "-username-"
+
 async def send_reminder_email(to_email: str, username: str, language: str = "en"):
     """Send a check-in reminder email via SendGrid"""
+    return await send_reminder_batch([{"email": to_email, "username": username}], language) == 202
+
+async def send_reminder_batch(recipients: List[dict], language: str = "en") -> int:
+    """Send one check-in reminder to up to 1000 recipients in a single SendGrid request.
+
+    Returns the SendGrid HTTP status (202 on success), or 0 when the request never got a response.
+    """
     if not SENDGRID_API_KEY:
         logger.warning("SendGrid API key not configured")
-        return False
+        return 0
     
     subject = "🌟 Time for your daily check-in!" if language == "en" else "🌟 حان وقت تسجيلك اليومي!"
     
@@ -621,7 +1325,7 @@ async def send_reminder_email(to_email: str, username: str, language: str = "en"
                     <span style="font-size: 28px; color: white; font-weight: bold;">ن</span>
                 </div>
             </div>
-            <h2 style="color: #0F4C81; text-align: center;">{"Hello" if language == "en" else "مرحباً"}, {username}!</h2>
+            <h2 style="color: #0F4C81; text-align: center;">{"Hello" if language == "en" else "مرحباً"}, {USERNAME_PLACEHOLDER}!</h2>
             <p style="color: #64748B; text-align: center; font-size: 16px; line-height: 1.6;">
                 {"Don't forget to check in with your feelings today. Taking a moment to reflect on your emotions can help improve your mental wellness." if language == "en" else "لا تنسَ تسجيل مشاعرك اليوم. أخذ لحظة للتفكير في مشاعرك يمكن أن يساعد في تحسين صحتك النفسية."}
             </p>
@@ -640,22 +1344,296 @@ async def send_reminder_email(to_email: str, username: str, language: str = "en"
     """
     
     try:
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
         message = Mail(
             from_email=SENDER_EMAIL,
-            to_emails=to_email,
             subject=subject,
             html_content=html_content
         )
-        response = sg.send(message)
-        logger.info(f"Reminder email sent to {to_email}, status: {response.status_code}")
-        return response.status_code == 202
+        # One personalization per recipient so each only sees their own address and name
+        for recipient in recipients:
+            personalization = Personalization()
+            personalization.add_to(To(recipient["email"]))
+            personalization.add_substitution(Substitution(USERNAME_PLACEHOLDER, html.escape(recipient["username"])))
+            message.add_personalization(personalization)
+        async with get_http_session().post(
+            SENDGRID_API_URL,
+            json=message.get(),
+            headers={"Authorization": f"Bearer {SENDGRID_API_KEY}"},
+            timeout=aiohttp.ClientTimeout(total=SENDGRID_TIMEOUT_SECONDS)
+        ) as response:
+            if response.status == 202:
+                logger.info(f"Reminder email sent to {len(recipients)} recipients")
+            else:
+                body = await response.text()
+                logger.warning(f"Reminder email to {len(recipients)} recipients failed, status: {response.status}, body: {body[:1000]}")
+            return response.status
     except Exception as e:
         logger.error(f"Failed to send reminder email: {e}")
-        return False
+        return 0
+
+class TokenBucket:
+    """Async token bucket limiting how many operations start per second"""
+
+    def __init__(self, rate_per_second: float, capacity: int):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+class LeasedJobQueue:
+    """Durable job queue in a MongoDB collection, drained by a pool of async workers
+
+    Workers lease one due job at a time; a lease that expires (e.g. its worker's process
+    died) makes the job claimable again. Failed jobs retry with exponential backoff and
+    are dead-lettered after max_attempts. Subclasses implement _process(job).
+    """
+
+    name = "Queue"
+    active_status = "processing"
+    done_status = "done"
+    claim_projection = {"_id": 0}
+
+    def __init__(self, collection_name: str, concurrency: int, max_attempts: int, lease_seconds: float,
+                 poll_seconds: float, retry_base_seconds: float, retry_max_seconds: float):
+        self.collection_name = collection_name
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self._wakeup = asyncio.Event()
+        self._workers = []
+        self._stopping = False
+        self.failed_attempts = 0
+        self.dead_lettered = 0
+
+    @property
+    def collection(self):
+        return db[self.collection_name]
+
+    def start(self):
+        if not self._workers:
+            self._stopping = False
+            self._workers = [asyncio.create_task(self._worker(i)) for i in range(self.concurrency)]
+
+    async def stop(self):
+        # The flag also ends workers whose cancellation is swallowed by wait_for when the wakeup fires concurrently
+        self._stopping = True
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _claim(self) -> Optional[dict]:
+        """Lease the next due job, including jobs whose previous lease expired (e.g. after a restart)"""
+        now = datetime.now(timezone.utc)
+        return await self.collection.find_one_and_update(
+            {"$or": [
+                {"status": "pending", "next_attempt_at": {"$lte": now.isoformat()}},
+                {"status": self.active_status, "locked_until": {"$lte": now.isoformat()}}
+            ]},
+            {
+                "$set": {
+                    "status": self.active_status,
+                    "locked_until": (now + timedelta(seconds=self.lease_seconds)).isoformat(),
+                    "updated_at": now.isoformat()
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("next_attempt_at", ASCENDING)],
+            projection=self.claim_projection,
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _worker(self, index: int):
+        while not self._stopping:
+            try:
+                job = await self._claim()
+                if job is None:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), self.poll_seconds)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await self._process(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"{self.name} worker {index} error: {e}")
+                await asyncio.sleep(self.poll_seconds)
+
+    async def _process(self, job: dict):
+        raise NotImplementedError
+
+    async def _complete(self, job: dict, fields: Optional[dict] = None):
+        now = datetime.now(timezone.utc)
+        # completed_at is a BSON date rather than an ISO string so TTL indexes can expire finished jobs
+        await self.collection.update_one(
+            {"id": job["id"]},
+            {"$set": {"status": self.done_status, "updated_at": now.isoformat(), "completed_at": now, **(fields or {})},
+             "$unset": {"locked_until": ""}}
+        )
+
+    async def _fail(self, job: dict, error: str, permanent: bool = False):
+        """Schedule a retry with exponential backoff, or dead-letter the job once out of attempts (or if retrying cannot help)"""
+        self.failed_attempts += 1
+        now = datetime.now(timezone.utc)
+        if permanent or job["attempts"] >= self.max_attempts:
+            self.dead_lettered += 1
+            update = {"status": "dead", "last_error": error, "updated_at": now.isoformat()}
+        else:
+            delay = min(self.retry_base_seconds * 2 ** (job["attempts"] - 1), self.retry_max_seconds)
+            update = {
+                "status": "pending",
+                "next_attempt_at": (now + timedelta(seconds=delay)).isoformat(),
+                "last_error": error,
+                "updated_at": now.isoformat()
+            }
+        await self.collection.update_one({"id": job["id"]}, {"$set": update, "$unset": {"locked_until": ""}})
+
+    async def requeue(self, query: dict) -> int:
+        """Put matching jobs back in the queue with a fresh attempt budget"""
+        now = datetime.now(timezone.utc).isoformat()
+        result = await self.collection.update_many(
+            query,
+            {"$set": {"status": "pending", "attempts": 0, "next_attempt_at": now, "updated_at": now}, "$unset": {"locked_until": ""}}
+        )
+        if result.modified_count:
+            self._wakeup.set()
+        return result.modified_count
+
+    async def requeue_dead(self) -> int:
+        return await self.requeue({"status": "dead"})
+
+    async def _status_counts(self) -> dict:
+        counts = await self.collection.aggregate([
+            {"$match": {"status": {"$in": ["pending", self.active_status, "dead"]}}},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+        ]).to_list(10)
+        by_status = {c["_id"]: c["count"] for c in counts}
+        return {status: by_status.get(status, 0) for status in ("pending", self.active_status, "dead")}
+
+class EmailOutbox(LeasedJobQueue):
+    """Durable email queue stored in email_outbox and drained by a pool of async workers"""
+
+    name = "Email"
+    active_status = "sending"
+    done_status = "sent"
+
+    def __init__(self, concurrency: int, requests_per_second: float, burst: int, max_attempts: int):
+        super().__init__("email_outbox", concurrency, max_attempts, EMAIL_LEASE_SECONDS,
+                         EMAIL_OUTBOX_POLL_SECONDS, EMAIL_RETRY_BASE_SECONDS, EMAIL_RETRY_MAX_SECONDS)
+        self._bucket = TokenBucket(requests_per_second, burst)
+        self._recent_sends = deque()
+        self.sent = 0
+        self.split_batches = 0
+
+    def _job(self, recipients: List[dict], language: str) -> dict:
+        now = datetime.now(timezone.utc).isoformat()
+        return {
+            "id": str(uuid.uuid4()),
+            "recipients": recipients,
+            "recipient_count": len(recipients),
+            "language": language,
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt_at": now,
+            "created_at": now,
+            "updated_at": now
+        }
+
+    async def enqueue(self, to_email: str, username: str, language: str = "en", user_id: Optional[str] = None) -> str:
+        return await self.enqueue_batch([{"email": to_email, "username": username, "user_id": user_id}], language)
+
+    async def enqueue_batch(self, recipients: List[dict], language: str = "en") -> str:
+        """Queue one reminder for a batch of {email, username, user_id} recipients sharing a language"""
+        job = self._job(recipients, language)
+        await self.collection.insert_one(job)
+        self._wakeup.set()
+        return job["id"]
+
+    async def _split(self, job: dict):
+        """Replace a rejected batch with its two halves so one bad address cannot sink the rest"""
+        recipients = job["recipients"]
+        middle = len(recipients) // 2
+        now = datetime.now(timezone.utc).isoformat()
+        # Ids derive from the parent so re-splitting after an expired lease upserts the same halves
+        halves = [{**self._job(part, job["language"]), "id": f"{job['id']}.{i}", "parent_id": job["id"]}
+                  for i, part in enumerate((recipients[:middle], recipients[middle:]))]
+        await self.collection.bulk_write(
+            [UpdateOne({"id": half["id"]}, {"$setOnInsert": half}, upsert=True) for half in halves],
+            ordered=False
+        )
+        self.split_batches += 1
+        await self._complete(job, {"status": "split", "split_at": now})
+        self._wakeup.set()
+
+    async def _process(self, job: dict):
+        await self._bucket.acquire()
+        status = await send_reminder_batch(job["recipients"], job["language"])
+        if status == 400:
+            # SendGrid rejects the whole request when any recipient is invalid
+            if job["recipient_count"] > 1:
+                await self._split(job)
+            else:
+                await self._fail(job, "Rejected by SendGrid (400)", permanent=True)
+            return
+        if status != 202:
+            await self._fail(job, f"Delivery failed ({status})" if status else "Delivery failed")
+            return
+        self.sent += job["recipient_count"]
+        self._recent_sends.append((time.monotonic(), job["recipient_count"]))
+        await self._complete(job, {"sent_at": datetime.now(timezone.utc).isoformat()})
+
+    async def forget_recipient(self, user_id: str, emails: List[str]) -> int:
+        """Strip a deleted user's address from every job, dropping jobs left with no recipients"""
+        # Jobs queued before recipients carried user_id are matched by address
+        jobs = self.collection.find(
+            {"$or": [{"recipients.user_id": user_id}, {"recipients.email": {"$in": emails}}]}, {"_id": 0, "id": 1}
+        )
+        job_ids = [job["id"] async for job in jobs]
+        if not job_ids:
+            return 0
+        for match in ({"user_id": user_id}, {"email": {"$in": emails}}):
+            await self.collection.update_many({"id": {"$in": job_ids}}, {"$pull": {"recipients": match}})
+        await self.collection.update_many({"id": {"$in": job_ids}}, [{"$set": {"recipient_count": {"$size": "$recipients"}}}])
+        await self.collection.delete_many({"id": {"$in": job_ids}, "recipients": {"$size": 0}})
+        return len(job_ids)
+
+    async def stats(self) -> dict:
+        cutoff = time.monotonic() - 60
+        while self._recent_sends and self._recent_sends[0][0] < cutoff:
+            self._recent_sends.popleft()
+        counts = await self._status_counts()
+        return {
+            "workers": len(self._workers),
+            "requests_per_second": self._bucket.rate,
+            **counts,
+            "sent": self.sent,
+            "split_batches": self.split_batches,
+            "failed_attempts": self.failed_attempts,
+            "dead_lettered": self.dead_lettered,
+            "sent_last_minute": sum(count for _, count in self._recent_sends)
+        }
+
+email_outbox = EmailOutbox(EMAIL_WORKER_CONCURRENCY, SENDGRID_REQUESTS_PER_SECOND, SENDGRID_REQUEST_BURST, EMAIL_MAX_ATTEMPTS)
 
 @api_router.post("/email/test-reminder")
-async def send_test_reminder(request: SendTestEmailRequest, background_tasks: BackgroundTasks, current_user: dict = Depends(get_current_user)):
+async def send_test_reminder(request: SendTestEmailRequest, current_user: dict = Depends(get_current_user)):
     """Send a test reminder email to verify the setup"""
     if not SENDGRID_API_KEY:
         raise HTTPException(status_code=503, detail="Email service not configured. Please add SENDGRID_API_KEY to enable email reminders.")
@@ -663,7 +1641,7 @@ async def send_test_reminder(request: SendTestEmailRequest, background_tasks: Ba
     language = current_user.get("language", "en")
     username = current_user.get("username", "User")
     
-    background_tasks.add_task(send_reminder_email, request.email, username, language)
+    await email_outbox.enqueue(request.email, username, language, current_user["id"])
     
     return {"message": "Test reminder email queued for delivery", "email": request.email}
 
@@ -678,10 +1656,15 @@ async def update_email_reminder_settings(settings: EmailReminderSettings, curren
         "timezone": settings.timezone,
         "updated_at": datetime.now(timezone.utc).isoformat()
     }
+    update = {"$set": settings_doc}
+    if settings.enabled:
+        settings_doc["next_fire_at"] = compute_next_fire_at(settings.reminder_time, settings.timezone, datetime.now(timezone.utc)).isoformat()
+    else:
+        update["$unset"] = {"next_fire_at": ""}
     
     await db.email_reminders.update_one(
         {"user_id": current_user["id"]},
-        {"$set": settings_doc},
+        update,
         upsert=True
     )
     
@@ -706,27 +1689,218 @@ async def get_email_reminder_settings(current_user: dict = Depends(get_current_u
     return settings
 
 @api_router.post("/admin/send-bulk-reminders")
-async def admin_send_bulk_reminders(background_tasks: BackgroundTasks, admin: dict = Depends(get_admin_user)):
+async def admin_send_bulk_reminders(admin: dict = Depends(get_admin_user)):
     """Admin endpoint to trigger bulk reminder emails to all users with email reminders enabled"""
     if not SENDGRID_API_KEY:
         raise HTTPException(status_code=503, detail="Email service not configured")
     
-    # Get all users with email reminders enabled
-    reminders = await db.email_reminders.find({"enabled": True}, {"_id": 0}).to_list(1000)
+    total_enabled = await db.email_reminders.count_documents({"enabled": True})
+    
+    # Join enabled reminders with their users in one streamed aggregation
+    pipeline = [
+        {"$match": {"enabled": True, "email": {"$nin": [None, ""]}}},
+        {"$lookup": {"from": "users", "localField": "user_id", "foreignField": "id", "as": "user"}},
+        {"$unwind": "$user"},
+        {"$project": {
+            "_id": 0,
+            "user_id": 1,
+            "email": 1,
+            "username": {"$ifNull": ["$user.username", "User"]},
+            "language": {"$ifNull": ["$user.language", "en"]}
+        }}
+    ]
     
+    # Group recipients by language into SendGrid-sized batches
+    batches = {}
     sent_count = 0
-    for reminder in reminders:
-        user = await db.users.find_one({"id": reminder["user_id"]}, {"_id": 0})
-        if user and reminder.get("email"):
-            background_tasks.add_task(
-                send_reminder_email, 
-                reminder["email"], 
-                user.get("username", "User"),
-                user.get("language", "en")
+    batch_count = 0
+    async for recipient in db.email_reminders.aggregate(pipeline):
+        batch = batches.setdefault(recipient["language"], [])
+        batch.append({"email": recipient["email"], "username": recipient["username"], "user_id": recipient["user_id"]})
+        sent_count += 1
+        if len(batch) >= EMAIL_BATCH_SIZE:
+            await email_outbox.enqueue_batch(batch, recipient["language"])
+            batch_count += 1
+            batches[recipient["language"]] = []
+    for language, batch in batches.items():
+        if batch:
+            await email_outbox.enqueue_batch(batch, language)
+            batch_count += 1
+    
+    return {"message": f"Queued {sent_count} reminder emails for delivery", "total_enabled": total_enabled, "batches": batch_count}
+
+@api_router.post("/admin/email/outbox/retry-dead")
+async def admin_retry_dead_emails(admin: dict = Depends(get_admin_user)):
+    """Move dead-lettered emails back into the delivery queue"""
+    requeued = await email_outbox.requeue_dead()
+    return {"message": f"Requeued {requeued} emails", "requeued": requeued}
+
+# ==================== REMINDER SCHEDULER ====================
+
+def compute_next_fire_at(reminder_time: str, tz_name: str, after: datetime) -> datetime:
+    """Next UTC minute after `after` at which reminder_time (HH:MM) occurs in tz_name, DST-aware"""
+    try:
+        tz = ZoneInfo(tz_name or "UTC")
+    except (ZoneInfoNotFoundError, ValueError):
+        tz = timezone.utc
+    try:
+        hour, minute = (int(part) for part in reminder_time.split(":"))
+        local_time = dt_time(hour, minute)
+    except (AttributeError, ValueError):
+        local_time = dt_time(9, 0)
+    
+    local_date = after.astimezone(tz).date()
+    for day_offset in range(3):
+        # Wall-clock times skipped by DST resolve forward; repeated ones fire on their first occurrence
+        candidate = datetime.combine(local_date + timedelta(days=day_offset), local_time, tzinfo=tz).astimezone(timezone.utc)
+        if candidate > after:
+            return candidate
+    return candidate
+
+class ReminderScheduler:
+    """Minute-tick timing wheel over email_reminders.next_fire_at that dispatches due reminders to the outbox"""
+
+    def __init__(self):
+        self._task = None
+        self._stopping = False
+        self._fire_times_assigned = False
+        self.is_leader = False
+        self.last_tick_at = None
+        self.last_dispatched = 0
+        self.total_dispatched = 0
+        self.total_skipped_late = 0
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._stopping = True
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.is_leader:
+            await db.scheduler_locks.delete_one({"_id": "reminder_scheduler", "owner": INSTANCE_ID})
+            self.is_leader = False
+
+    async def _acquire_lock(self) -> bool:
+        """Only one process dispatches reminders; the lock expires if its owner dies"""
+        now = datetime.now(timezone.utc)
+        try:
+            await db.scheduler_locks.update_one(
+                {"_id": "reminder_scheduler", "$or": [{"owner": INSTANCE_ID}, {"expires_at": {"$lte": now.isoformat()}}]},
+                {"$set": {"owner": INSTANCE_ID, "expires_at": (now + timedelta(seconds=REMINDER_LOCK_SECONDS)).isoformat()}},
+                upsert=True
             )
-            sent_count += 1
-    
-    return {"message": f"Queued {sent_count} reminder emails for delivery", "total_enabled": len(reminders)}
+            self.is_leader = True
+        except DuplicateKeyError:
+            self.is_leader = False
+        return self.is_leader
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await self.tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Reminder scheduler tick failed: {e}")
+            now = datetime.now(timezone.utc)
+            next_minute = now.replace(second=0, microsecond=0) + timedelta(minutes=1)
+            await asyncio.sleep((next_minute - now).total_seconds())
+
+    async def tick(self):
+        # Retried every tick until it succeeds, so a database error at startup doesn't stall scheduling
+        if not self._fire_times_assigned:
+            await self.assign_missing_fire_times()
+            self._fire_times_assigned = True
+        if await self._acquire_lock():
+            self.last_dispatched = await self.dispatch_due(datetime.now(timezone.utc))
+            self.total_dispatched += self.last_dispatched
+        self.last_tick_at = datetime.now(timezone.utc).isoformat()
+
+    async def assign_missing_fire_times(self):
+        """Give enabled reminders saved before scheduling existed a next_fire_at"""
+        now = datetime.now(timezone.utc)
+        updates = []
+        async for reminder in db.email_reminders.find(
+            {"enabled": True, "next_fire_at": {"$exists": False}},
+            {"_id": 0, "user_id": 1, "reminder_time": 1, "timezone": 1}
+        ):
+            next_fire = compute_next_fire_at(reminder.get("reminder_time"), reminder.get("timezone"), now)
+            updates.append(UpdateOne({"user_id": reminder["user_id"]}, {"$set": {"next_fire_at": next_fire.isoformat()}}))
+            if len(updates) >= 1000:
+                await db.email_reminders.bulk_write(updates, ordered=False)
+                updates = []
+        if updates:
+            await db.email_reminders.bulk_write(updates, ordered=False)
+
+    async def dispatch_due(self, now: datetime) -> int:
+        """Send every reminder whose bucket is due and advance it to its next fire time"""
+        bucket = now.replace(second=0, microsecond=0)
+        late_cutoff = (bucket - timedelta(minutes=REMINDER_MAX_LATENESS_MINUTES)).isoformat()
+        pipeline = [
+            {"$match": {"enabled": True, "next_fire_at": {"$lte": bucket.isoformat()}}},
+            {"$lookup": {"from": "users", "localField": "user_id", "foreignField": "id", "as": "user"}},
+            {"$unwind": {"path": "$user", "preserveNullAndEmptyArrays": True}},
+            {"$project": {
+                "_id": 0,
+                "user_id": 1,
+                "email": 1,
+                "reminder_time": 1,
+                "timezone": 1,
+                "next_fire_at": 1,
+                "username": "$user.username",
+                "language": {"$ifNull": ["$user.language", "en"]}
+            }}
+        ]
+        
+        advances = []
+        batches = {}
+        dispatched = 0
+        
+        async def flush():
+            # Advance before enqueueing: a crash in between skips one reminder rather than sending it twice
+            if advances:
+                await db.email_reminders.bulk_write(advances, ordered=False)
+                advances.clear()
+            for language, batch in batches.items():
+                if batch:
+                    await email_outbox.enqueue_batch(batch, language)
+            batches.clear()
+        
+        async for reminder in db.email_reminders.aggregate(pipeline):
+            next_fire = compute_next_fire_at(reminder.get("reminder_time"), reminder.get("timezone"), bucket)
+            advances.append(UpdateOne(
+                {"user_id": reminder["user_id"]},
+                {"$set": {"next_fire_at": next_fire.isoformat(), "last_fired_at": reminder["next_fire_at"]}}
+            ))
+            if reminder["next_fire_at"] < late_cutoff:
+                # Missed while the scheduler was down for too long; don't send a stale reminder
+                self.total_skipped_late += 1
+            elif reminder.get("email") and reminder.get("username"):
+                batches.setdefault(reminder["language"], []).append(
+                    {"email": reminder["email"], "username": reminder["username"], "user_id": reminder["user_id"]}
+                )
+                dispatched += 1
+            if len(advances) >= EMAIL_BATCH_SIZE:
+                await flush()
+        await flush()
+        return dispatched
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "is_leader": self.is_leader,
+            "last_tick_at": self.last_tick_at,
+            "last_dispatched": self.last_dispatched,
+            "total_dispatched": self.total_dispatched,
+            "total_skipped_late": self.total_skipped_late
+        }
+
+reminder_scheduler = ReminderScheduler()
 
 # ==================== DIARY ROUTES ====================
 
@@ -774,11 +1948,160 @@ async def create_diary_entry(entry: DiaryEntry, current_user: dict = Depends(get
     }
 
 @api_router.get("/diary/entries")
-async def get_diary_entries(current_user: dict = Depends(get_current_user)):
-    entries = await db.diary_entries.find(
-        {"user_id": current_user["id"]}, {"_id": 0}
-    ).sort("created_at", -1).to_list(100)
-    return {"entries": entries}
+async def get_diary_entries(limit: int = PAGE_DEFAULT_LIMIT, cursor: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    """Get diary entries newest first; pass next_cursor back as cursor for the following page"""
+    entries, next_cursor = await paginate(db.diary_entries, {"user_id": current_user["id"]}, {"_id": 0}, limit, cursor)
+    return {"entries": entries, "next_cursor": next_cursor}
+
+@api_router.get("/diary/count")
+async def get_diary_count(current_user: dict = Depends(get_current_user)):
+    """Number of diary entries the user has written"""
+    total = await db.diary_entries.count_documents({"user_id": current_user["id"]})
+    return {"total": total}
+
+# ==================== CHAT STORAGE ====================
+# Chat turns live either one per chat_messages document or packed per session into
+# chat_buckets documents: {user_id, session_id, count, first_at, last_at, turns: [...]}.
+# Everything outside this section goes through these helpers, which return turns in
+# the chat_messages document shape for both layouts.
+
+BUCKET_TURN_FIELDS = ("id", "user_message", "ai_response", "created_at")
+
+def chat_collection():
+    return db.chat_buckets if CHAT_STORAGE_LAYOUT == "buckets" else db.chat_messages
+
+def chat_turns_source(match: dict) -> List[dict]:
+    """Aggregation prefix yielding matching turns as chat_messages-shaped documents"""
+    if CHAT_STORAGE_LAYOUT != "buckets":
+        return [{"$match": match}]
+    return [
+        {"$match": match},
+        {"$unwind": "$turns"},
+        {"$project": {"_id": 0, "user_id": 1, "session_id": 1, **{field: f"$turns.{field}" for field in BUCKET_TURN_FIELDS}}}
+    ]
+
+async def append_chat_turn(chat_doc: dict):
+    if CHAT_STORAGE_LAYOUT != "buckets":
+        await db.chat_messages.insert_one(chat_doc)
+        return
+    created_at = chat_doc["created_at"]
+    await db.chat_buckets.update_one(
+        {"user_id": chat_doc["user_id"], "session_id": chat_doc["session_id"], "count": {"$lt": CHAT_BUCKET_SIZE}},
+        {
+            "$push": {"turns": {field: chat_doc[field] for field in BUCKET_TURN_FIELDS}},
+            "$inc": {"count": 1},
+            "$min": {"first_at": created_at},
+            "$max": {"last_at": created_at}
+        },
+        upsert=True
+    )
+
+async def page_chat_turns(user_id: str, session_id: Optional[str] = None, limit: int = PAGE_DEFAULT_LIMIT,
+                          cursor: Optional[str] = None, after: Optional[str] = None, max_limit: int = PAGE_MAX_LIMIT):
+    """Newest-first keyset page of chat turns created after `after`; returns (docs, next_cursor)"""
+    query = {"user_id": user_id}
+    if session_id is not None:
+        query["session_id"] = session_id
+    if CHAT_STORAGE_LAYOUT != "buckets":
+        if after:
+            query["created_at"] = {"$gt": after}
+        return await paginate(db.chat_messages, query, {"_id": 0}, limit, cursor, max_limit=max_limit)
+    
+    limit = max(1, min(limit, max_limit))
+    position = decode_page_cursor(cursor) if cursor else None
+    if position:
+        query["first_at"] = {"$lte": position[0]}
+    if after:
+        query["last_at"] = {"$gt": after}
+    
+    candidates = []
+    async for bucket in db.chat_buckets.find(query, {"_id": 0}).sort("last_at", DESCENDING):
+        # Buckets arrive newest-last-turn first: once one ends before the oldest turn we would keep, none can contribute
+        if len(candidates) > limit and bucket["last_at"] < candidates[limit]["created_at"]:
+            break
+        for turn in bucket["turns"]:
+            if position and (turn["created_at"], turn["id"]) >= position:
+                continue
+            if after and turn["created_at"] <= after:
+                continue
+            candidates.append({"user_id": bucket["user_id"], "session_id": bucket["session_id"], **turn})
+        candidates.sort(key=lambda t: (t["created_at"], t["id"]), reverse=True)
+        del candidates[limit + 1:]
+    
+    next_cursor = encode_page_cursor(candidates[limit - 1]) if len(candidates) > limit else None
+    return candidates[:limit], next_cursor
+
+async def count_chat_turns(user_id: Optional[str] = None) -> int:
+    """Number of stored turns for a user, or overall"""
+    if CHAT_STORAGE_LAYOUT != "buckets":
+        if user_id is None:
+            return await db.chat_messages.estimated_document_count()
+        return await db.chat_messages.count_documents({"user_id": user_id})
+    match = {"user_id": user_id} if user_id is not None else {}
+    result = await db.chat_buckets.aggregate([
+        {"$match": match},
+        {"$group": {"_id": None, "turns": {"$sum": "$count"}}}
+    ]).to_list(1)
+    return result[0]["turns"] if result else 0
+
+async def delete_chat_turns(user_id: str):
+    # Clear both layouts so migration leftovers never outlive the user
+    await db.chat_messages.delete_many({"user_id": user_id})
+    await db.chat_buckets.delete_many({"user_id": user_id})
+
+async def migrate_chat_messages_to_buckets() -> dict:
+    """Copy chat_messages turns not yet in chat_buckets into new buckets; safe to re-run
+
+    Turns are matched by id, and existing buckets are never rewritten, so turns
+    written only to chat_buckets (after switching CHAT_STORAGE_LAYOUT) survive a re-run.
+    """
+    sessions = 0
+    buckets = 0
+    turns = 0
+    pending = []
+    current = None
+    bucket = None
+    existing_ids = set()
+    
+    async def close_bucket():
+        nonlocal buckets, bucket
+        if bucket is not None:
+            pending.append(bucket)
+            bucket = None
+        if len(pending) >= 100:
+            await db.chat_buckets.insert_many(pending, ordered=False)
+            buckets += len(pending)
+            pending.clear()
+    
+    cursor = db.chat_messages.find({}, {"_id": 0}).sort(
+        [("user_id", ASCENDING), ("session_id", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)]
+    ).batch_size(1000)
+    async for msg in cursor:
+        key = (msg["user_id"], msg["session_id"])
+        if key != current:
+            await close_bucket()
+            current = key
+            sessions += 1
+            existing_ids = {
+                turn["id"]
+                async for stored in db.chat_buckets.find({"user_id": key[0], "session_id": key[1]}, {"_id": 0, "turns.id": 1})
+                for turn in stored.get("turns", [])
+            }
+        if msg["id"] in existing_ids:
+            continue
+        if bucket is not None and bucket["count"] >= CHAT_BUCKET_SIZE:
+            await close_bucket()
+        if bucket is None:
+            bucket = {"user_id": key[0], "session_id": key[1], "count": 0, "first_at": msg["created_at"], "turns": []}
+        bucket["turns"].append({field: msg[field] for field in BUCKET_TURN_FIELDS})
+        bucket["count"] += 1
+        bucket["last_at"] = msg["created_at"]
+        turns += 1
+    await close_bucket()
+    if pending:
+        await db.chat_buckets.insert_many(pending, ordered=False)
+        buckets += len(pending)
+    return {"sessions": sessions, "buckets": buckets, "turns": turns}
 
 # ==================== VENTING CHAT ROUTES ====================
 
@@ -805,6 +2128,315 @@ SYSTEM_PROMPT_AR = """أنت رفيق دعم عاطفي رحيم ومتفهم. 
 DISCLAIMER_EN = "This is not medical advice. For professional mental health support, please consult a licensed healthcare provider."
 DISCLAIMER_AR = "هذا ليس نصيحة طبية. للحصول على دعم نفسي متخصص، يرجى استشارة مقدم رعاية صحية مرخص."
 
+FALLBACK_REPLY_EN = "I'm here to listen. Can you tell me more about how you're feeling?"
+FALLBACK_REPLY_AR = "أنا هنا عشان أسمعك. ممكن تقولي أكتر عن اللي بتحس بيه؟"
+
+class LlmQueueTimeout(Exception):
+    """Raised when a model call waited longer than LLM_QUEUE_TIMEOUT_SECONDS for a slot"""
+
+class FairLlmLimiter:
+    """Caps concurrent model calls; each user has at most one in flight and waiting users are admitted round-robin"""
+
+    def __init__(self, max_concurrency: int, queue_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self._active_users = set()
+        self._waiters = OrderedDict()  # user_id -> deque of futures; key order is the round-robin order
+        self.in_flight = 0
+        self.peak_waiting = 0
+        self.completed = 0
+        self.timeouts = 0
+        self.queue_ms = deque(maxlen=1000)
+        self.model_ms = deque(maxlen=1000)
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(q) for q in self._waiters.values())
+
+    def _grant(self, user_id: str):
+        self.in_flight += 1
+        self._active_users.add(user_id)
+
+    def _dispatch(self):
+        while self.in_flight < self.max_concurrency:
+            user_id = next((u for u in self._waiters if u not in self._active_users), None)
+            if user_id is None:
+                return
+            queue = self._waiters.pop(user_id)
+            future = queue.popleft()
+            if queue:
+                self._waiters[user_id] = queue  # Re-inserted at the back: this user's next request waits its turn
+            if not future.done():
+                self._grant(user_id)
+                future.set_result(None)
+
+    def _release(self, user_id: str):
+        self.in_flight -= 1
+        self._active_users.discard(user_id)
+        if user_id in self._waiters:
+            self._waiters.move_to_end(user_id)
+        self._dispatch()
+
+    def _discard(self, user_id: str, future):
+        queue = self._waiters.get(user_id)
+        if queue and future in queue:
+            queue.remove(future)
+            if not queue:
+                del self._waiters[user_id]
+
+    async def _acquire(self, user_id: str):
+        if not self._waiters and user_id not in self._active_users and self.in_flight < self.max_concurrency:
+            self._grant(user_id)
+            self.queue_ms.append(0.0)
+            return
+        queued_at = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(user_id, deque()).append(future)
+        self.peak_waiting = max(self.peak_waiting, self.waiting)
+        self._dispatch()
+        try:
+            await asyncio.wait({future}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            if future.done():
+                self._release(user_id)
+            else:
+                future.cancel()
+                self._discard(user_id, future)
+            raise
+        self.queue_ms.append((time.perf_counter() - queued_at) * 1000)
+        if not future.done():
+            future.cancel()
+            self._discard(user_id, future)
+            self.timeouts += 1
+            raise LlmQueueTimeout(f"No model slot within {self.queue_timeout}s")
+
+    @asynccontextmanager
+    async def slot(self, user_id: str):
+        await self._acquire(user_id)
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.model_ms.append((time.perf_counter() - started_at) * 1000)
+            self.completed += 1
+            self._release(user_id)
+
+    def stats(self) -> dict:
+        def percentiles(samples):
+            ordered = sorted(samples)
+            if not ordered:
+                return {"p50": 0.0, "p95": 0.0, "max": 0.0}
+            def pick(q):
+                return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))], 1)
+            return {"p50": pick(0.5), "p95": pick(0.95), "max": round(ordered[-1], 1)}
+        return {
+            "max_concurrency": self.max_concurrency,
+            "queue_timeout_seconds": self.queue_timeout,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "peak_queue_depth": self.peak_waiting,
+            "completed": self.completed,
+            "queue_timeouts": self.timeouts,
+            "queue_ms": percentiles(self.queue_ms),
+            "model_ms": percentiles(self.model_ms)
+        }
+
+llm_limiter = FairLlmLimiter(LLM_MAX_CONCURRENCY, LLM_QUEUE_TIMEOUT_SECONDS)
+
+def create_llm_chat(session_id: str, system_prompt: str, context_messages: Optional[List[dict]] = None) -> LlmChat:
+    chat = LlmChat(
+        api_key=EMERGENT_LLM_KEY,
+        session_id=session_id,
+        system_message=system_prompt,
+        initial_messages=[{"role": "system", "content": system_prompt}, *context_messages] if context_messages else None
+    )
+    chat.with_model(LLM_PROVIDER, LLM_MODEL)
+    return chat
+
+async def request_llm_reply(session_id: str, system_prompt: str, context_messages: List[dict], text: str) -> str:
+    chat = create_llm_chat(session_id, system_prompt, context_messages)
+    async with timed_outbound("llm", "send_message"):
+        return await asyncio.wait_for(chat.send_message(UserMessage(text=text)), LLM_CALL_TIMEOUT_SECONDS)
+
+async def stream_llm_reply(session_id: str, system_prompt: str, context_messages: List[dict], text: str):
+    """Yield the model's reply in chunks as the provider streams them"""
+    messages = [{"role": "system", "content": system_prompt}, *context_messages, {"role": "user", "content": text}]
+    async with timed_outbound("llm", "stream"):
+        stream = await asyncio.wait_for(
+            acompletion(
+                model=f"{LLM_PROVIDER}/{LLM_MODEL}",
+                messages=messages,
+                api_key=EMERGENT_LLM_KEY,
+                api_base=LLM_API_BASE,
+                stream=True
+            ),
+            LLM_CALL_TIMEOUT_SECONDS
+        )
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 UTF-8 bytes per token) used for context budgeting"""
+    return len(text.encode("utf-8")) // 4 + 1
+
+def turn_tokens(turn: dict) -> int:
+    return estimate_tokens(turn["user_message"]) + estimate_tokens(turn["ai_response"])
+
+def summarize_turns(summary: str, turns: List[dict]) -> str:
+    """Fold older turns into the rolling session summary, keeping the most recent part when trimming"""
+    lines = [summary] if summary else []
+    for turn in turns:
+        lines.append(f"User: {turn['user_message'][:200]}")
+        lines.append(f"Assistant: {turn['ai_response'][:200]}")
+    text = "\n".join(lines)
+    max_chars = CHAT_SUMMARY_MAX_TOKENS * 4
+    if len(text) > max_chars:
+        text = text[-max_chars:].split("\n", 1)[-1]
+    return text
+
+class ChatContextStats:
+    """Aggregate prompt size metrics for chat requests"""
+
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.tokens_saved = 0
+        self.turns_folded = 0
+
+    def record(self, prompt_tokens: int, tokens_saved: int, turns_folded: int):
+        self.requests += 1
+        self.prompt_tokens += prompt_tokens
+        self.tokens_saved += tokens_saved
+        self.turns_folded += turns_folded
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "token_budget": CHAT_CONTEXT_TOKEN_BUDGET,
+            "prompt_tokens_total": self.prompt_tokens,
+            "tokens_saved_total": self.tokens_saved,
+            "turns_folded_total": self.turns_folded,
+            "avg_prompt_tokens": round(self.prompt_tokens / self.requests, 1) if self.requests else 0.0,
+            "avg_tokens_saved": round(self.tokens_saved / self.requests, 1) if self.requests else 0.0
+        }
+
+chat_context_stats = ChatContextStats()
+
+async def build_chat_context(user_id: str, session_id: str, system_prompt: str, text: str) -> List[dict]:
+    """Build role/content turns for a new message within the token budget, folding overflow into the session summary"""
+    state = await db.chat_summaries.find_one({"user_id": user_id, "session_id": session_id}, {"_id": 0}) or {}
+    summary = state.get("summary", "")
+    
+    after = state.get("summarized_until")
+    turns, older = await page_chat_turns(user_id, session_id, limit=CHAT_HISTORY_FETCH_LIMIT, after=after, max_limit=CHAT_HISTORY_FETCH_LIMIT)
+    turns.reverse()
+    # Unsummarized turns older than the fetch window (long sessions from before summaries existed)
+    # must be folded too, or moving the marker past the window would drop them for good
+    skipped = []
+    while older:
+        page, older = await page_chat_turns(
+            user_id, session_id, limit=CHAT_HISTORY_FETCH_LIMIT, cursor=older, after=after, max_limit=CHAT_HISTORY_FETCH_LIMIT
+        )
+        skipped = page[::-1] + skipped
+    
+    # Keep the newest turns that fit; everything older is folded into the summary
+    budget = CHAT_CONTEXT_TOKEN_BUDGET - estimate_tokens(system_prompt) - estimate_tokens(text) - estimate_tokens(summary)
+    kept_tokens = 0
+    split = len(turns)
+    while split > 0 and kept_tokens + turn_tokens(turns[split - 1]) <= budget:
+        split -= 1
+        kept_tokens += turn_tokens(turns[split])
+    folded, kept = skipped + turns[:split], turns[split:]
+    
+    folded_tokens = state.get("folded_tokens", 0)
+    if folded:
+        summary = summarize_turns(summary, folded)
+        folded_tokens += sum(turn_tokens(t) for t in folded)
+        await db.chat_summaries.update_one(
+            {"user_id": user_id, "session_id": session_id},
+            {"$set": {
+                "summary": summary,
+                "summarized_until": folded[-1]["created_at"],
+                "folded_tokens": folded_tokens,
+                "updated_at": datetime.now(timezone.utc).isoformat()
+            }},
+            upsert=True
+        )
+    
+    context_messages = []
+    if summary:
+        context_messages.append({"role": "system", "content": f"Summary of earlier conversation:\n{summary}"})
+    for turn in kept:
+        context_messages.append({"role": "user", "content": turn["user_message"]})
+        context_messages.append({"role": "assistant", "content": turn["ai_response"]})
+    
+    summary_tokens = estimate_tokens(summary) if summary else 0
+    prompt_tokens = estimate_tokens(system_prompt) + summary_tokens + kept_tokens + estimate_tokens(text)
+    chat_context_stats.record(prompt_tokens, max(folded_tokens - summary_tokens, 0), len(folded))
+    return context_messages
+
+async def save_chat_turn(user_id: str, session_id: str, user_message: str, ai_response: str):
+    chat_doc = {
+        "id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "session_id": session_id,
+        "user_message": user_message,
+        "ai_response": ai_response,
+        "created_at": datetime.now(timezone.utc).isoformat()
+    }
+    await append_chat_turn(chat_doc)
+    await record_chat_session(chat_doc)
+
+CHAT_PREVIEW_CHARS = 80
+
+async def record_chat_session(chat_doc: dict):
+    """Fold a saved turn into the session's summary document"""
+    await db.chat_sessions.update_one(
+        {"user_id": chat_doc["user_id"], "session_id": chat_doc["session_id"]},
+        {
+            "$max": {"last_message_at": chat_doc["created_at"]},
+            "$inc": {"message_count": 1},
+            "$setOnInsert": {
+                "preview": chat_doc["user_message"][:CHAT_PREVIEW_CHARS],
+                "created_at": chat_doc["created_at"]
+            }
+        },
+        upsert=True
+    )
+
+async def rebuild_chat_sessions(user_id: str):
+    """Recompute all session summaries for a user from the stored chat turns"""
+    pipeline = chat_turns_source({"user_id": user_id}) + [
+        {"$sort": {"session_id": 1, "created_at": 1}},
+        {"$group": {
+            "_id": "$session_id",
+            "created_at": {"$first": "$created_at"},
+            "preview": {"$first": "$user_message"},
+            "last_message_at": {"$last": "$created_at"},
+            "message_count": {"$sum": 1}
+        }}
+    ]
+    updates = []
+    async for session in chat_collection().aggregate(pipeline):
+        updates.append(UpdateOne(
+            {"user_id": user_id, "session_id": session["_id"]},
+            {"$set": {
+                "created_at": session["created_at"],
+                "preview": (session["preview"] or "")[:CHAT_PREVIEW_CHARS],
+                "last_message_at": session["last_message_at"],
+                "message_count": session["message_count"]
+            }},
+            upsert=True
+        ))
+    if updates:
+        await db.chat_sessions.bulk_write(updates, ordered=False)
+    # From here on record_chat_session keeps the summaries current
+    await db.users.update_one({"id": user_id}, {"$set": {"chat_sessions_built": True}})
+    user_cache.invalidate(user_id)
+    return len(updates)
+
 @api_router.post("/chat/message")
 async def send_chat_message(message: ChatMessage, current_user: dict = Depends(get_current_user)):
     user_lang = current_user.get("language", "en")
@@ -813,43 +2445,14 @@ async def send_chat_message(message: ChatMessage, current_user: dict = Depends(g
     system_prompt = SYSTEM_PROMPT_AR if user_lang == "ar" else SYSTEM_PROMPT_EN
     disclaimer = DISCLAIMER_AR if user_lang == "ar" else DISCLAIMER_EN
     
-    # Get chat history for this session
-    history = await db.chat_messages.find(
-        {"user_id": current_user["id"], "session_id": session_id}, {"_id": 0}
-    ).sort("created_at", 1).to_list(50)
+    context_messages = await build_chat_context(current_user["id"], session_id, system_prompt, message.message)
     
     try:
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=session_id,
-            system_message=system_prompt
-        )
-        chat.with_model("openai", "gpt-5.2")
-        
-        # Build context from history
-        context_messages = []
-        for msg in history[-10:]:  # Last 10 messages for context
-            context_messages.append(f"User: {msg['user_message']}")
-            context_messages.append(f"Assistant: {msg['ai_response']}")
-        
-        full_message = message.message
-        if context_messages:
-            context = "\n".join(context_messages)
-            full_message = f"Previous conversation:\n{context}\n\nCurrent message: {message.message}"
-        
-        user_msg = UserMessage(text=full_message)
-        response = await chat.send_message(user_msg)
+        async with llm_limiter.slot(current_user["id"]):
+            response = await request_llm_reply(session_id, system_prompt, context_messages, message.message)
         
         # Save to database
-        chat_doc = {
-            "id": str(uuid.uuid4()),
-            "user_id": current_user["id"],
-            "session_id": session_id,
-            "user_message": message.message,
-            "ai_response": response,
-            "created_at": datetime.now(timezone.utc).isoformat()
-        }
-        await db.chat_messages.insert_one(chat_doc)
+        await save_chat_turn(current_user["id"], session_id, message.message, response)
         
         return {
             "response": response,
@@ -857,30 +2460,83 @@ async def send_chat_message(message: ChatMessage, current_user: dict = Depends(g
             "disclaimer": disclaimer
         }
     except Exception as e:
-        logger.error(f"Chat error: {e}")
-        fallback = "أنا هنا عشان أسمعك. ممكن تقولي أكتر عن اللي بتحس بيه؟" if user_lang == "ar" else "I'm here to listen. Can you tell me more about how you're feeling?"
+        if isinstance(e, LlmQueueTimeout):
+            logger.warning(f"Chat fallback: {e}")
+        else:
+            logger.error(f"Chat error: {e}")
+        fallback = FALLBACK_REPLY_AR if user_lang == "ar" else FALLBACK_REPLY_EN
         return {
             "response": fallback,
             "session_id": session_id,
             "disclaimer": disclaimer
         }
 
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@api_router.post("/chat/message/stream")
+async def stream_chat_message(message: ChatMessage, current_user: dict = Depends(get_current_user)):
+    """Send a chat message and stream the reply as Server-Sent Events: session, delta..., disclaimer, done"""
+    user_lang = current_user.get("language", "en")
+    session_id = message.session_id or str(uuid.uuid4())
+    
+    system_prompt = SYSTEM_PROMPT_AR if user_lang == "ar" else SYSTEM_PROMPT_EN
+    disclaimer = DISCLAIMER_AR if user_lang == "ar" else DISCLAIMER_EN
+    
+    async def events():
+        yield sse_event("session", {"session_id": session_id})
+        chunks = []
+        try:
+            context_messages = await build_chat_context(current_user["id"], session_id, system_prompt, message.message)
+            async with llm_limiter.slot(current_user["id"]):
+                async for chunk in stream_llm_reply(session_id, system_prompt, context_messages, message.message):
+                    chunks.append(chunk)
+                    yield sse_event("delta", {"text": chunk})
+            response = "".join(chunks)
+            # Saved once the stream completes, exactly as /chat/message saves its reply
+            await save_chat_turn(current_user["id"], session_id, message.message, response)
+        except Exception as e:
+            if isinstance(e, LlmQueueTimeout):
+                logger.warning(f"Chat stream fallback: {e}")
+            else:
+                logger.error(f"Chat stream error: {e}")
+            if chunks:
+                response = "".join(chunks)
+                yield sse_event("error", {"message": "The response was interrupted"})
+            else:
+                response = FALLBACK_REPLY_AR if user_lang == "ar" else FALLBACK_REPLY_EN
+                yield sse_event("delta", {"text": response})
+        
+        yield sse_event("disclaimer", {"disclaimer": disclaimer})
+        yield sse_event("done", {"response": response, "session_id": session_id, "disclaimer": disclaimer})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @api_router.get("/chat/sessions")
 async def get_chat_sessions(current_user: dict = Depends(get_current_user)):
-    pipeline = [
-        {"$match": {"user_id": current_user["id"]}},
-        {"$group": {"_id": "$session_id", "last_message": {"$last": "$created_at"}, "message_count": {"$sum": 1}}},
-        {"$sort": {"last_message": -1}}
-    ]
-    sessions = await db.chat_messages.aggregate(pipeline).to_list(20)
-    return {"sessions": [{"session_id": s["_id"], "last_message": s["last_message"], "message_count": s["message_count"]} for s in sessions]}
+    # Users whose chats predate chat_sessions get their summaries built on first visit
+    if not current_user.get("chat_sessions_built"):
+        await rebuild_chat_sessions(current_user["id"])
+    # Served entirely from the (user_id, last_message_at, ...) index
+    sessions = await db.chat_sessions.find(
+        {"user_id": current_user["id"]},
+        {"_id": 0, "session_id": 1, "last_message_at": 1, "message_count": 1, "preview": 1}
+    ).sort("last_message_at", -1).to_list(20)
+    return {"sessions": [
+        {"session_id": s["session_id"], "last_message": s["last_message_at"], "message_count": s["message_count"], "preview": s.get("preview", "")}
+        for s in sessions
+    ]}
 
 @api_router.get("/chat/history/{session_id}")
-async def get_chat_history(session_id: str, current_user: dict = Depends(get_current_user)):
-    messages = await db.chat_messages.find(
-        {"user_id": current_user["id"], "session_id": session_id}, {"_id": 0}
-    ).sort("created_at", 1).to_list(100)
-    return {"messages": messages}
+async def get_chat_history(session_id: str, limit: int = PAGE_MAX_LIMIT, cursor: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    """Get the latest messages of a session in chronological order; next_cursor pages to earlier ones"""
+    messages, next_cursor = await page_chat_turns(current_user["id"], session_id, limit, cursor)
+    messages.reverse()
+    return {"messages": messages, "next_cursor": next_cursor}
 
 # ==================== MOOD STRATEGIES ====================
 
@@ -912,7 +2568,6 @@ async def get_strategies(feeling: Optional[str] = None, current_user: dict = Dep
     return {"strategies": strategies}
 
 # ==================== ARTICLES ====================
-import aiohttp
 import re
 
 # PubMed API endpoints
@@ -940,67 +2595,141 @@ class ArticleUpdate(BaseModel):
     published_date: Optional[str] = None
     image_url: Optional[str] = None
 
+# Article search: every admin article carries a normalized copy of its searchable
+# fields under "search", covered by the weighted text index in INDEX_SPECS
+ARTICLE_PROJECTION = {"_id": 0, "search": 0}
+ARABIC_DIACRITICS = re.compile(r'[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+ARABIC_LETTER_VARIANTS = str.maketrans({
+    "\u0623": "\u0627", "\u0625": "\u0627", "\u0622": "\u0627", "\u0671": "\u0627",  # hamza/madda/wasla alef -> alef
+    "\u0649": "\u064a",  # alef maqsura -> ya
+    "\u0629": "\u0647",  # ta marbuta -> ha
+    "\u0624": "\u0648",  # waw with hamza -> waw
+    "\u0626": "\u064a",  # ya with hamza -> ya
+})
+ARABIC_ARTICLE_PREFIXES = ("\u0648\u0627\u0644", "\u0628\u0627\u0644", "\u0643\u0627\u0644", "\u0641\u0627\u0644", "\u0644\u0644", "\u0627\u0644")  # wal, bal, kal, fal, lil, al
+SEARCH_SEPARATORS = re.compile(r'[^\w]+')
+
+def strip_arabic_article(token: str) -> str:
+    for prefix in ARABIC_ARTICLE_PREFIXES:
+        if token.startswith(prefix) and len(token) - len(prefix) >= 2:
+            return token[len(prefix):]
+    return token
+
+def normalize_search_text(text: str) -> str:
+    """Casefold, strip Arabic diacritics, tatweel and the definite article, unify letter variants and collapse punctuation"""
+    text = ARABIC_DIACRITICS.sub("", (text or "").casefold())
+    text = text.translate(ARABIC_LETTER_VARIANTS)
+    return " ".join(strip_arabic_article(token) for token in SEARCH_SEPARATORS.split(text) if token)
+
+def article_search_fields(article: dict) -> dict:
+    return {
+        "title": normalize_search_text(article.get("title", "")),
+        "summary": normalize_search_text(article.get("summary", "")),
+        "content": normalize_search_text(article.get("content", "")),
+        "tags": normalize_search_text(" ".join(article.get("tags") or []))
+    }
+
+async def reindex_articles(query: dict) -> int:
+    """Recompute the normalized search fields of the matching admin articles"""
+    updates = []
+    indexed = 0
+    async for article in db.articles.find(query, {"_id": 0, "id": 1, "title": 1, "summary": 1, "content": 1, "tags": 1}):
+        updates.append(UpdateOne({"id": article["id"]}, {"$set": {"search": article_search_fields(article)}}))
+        if len(updates) >= 1000:
+            await db.articles.bulk_write(updates, ordered=False)
+            indexed += len(updates)
+            updates = []
+    if updates:
+        await db.articles.bulk_write(updates, ordered=False)
+        indexed += len(updates)
+    return indexed
+
+pubmed_cache = AsyncTTLCache(PUBMED_CACHE_MAX_ENTRIES, PUBMED_CACHE_TTL_SECONDS, PUBMED_CACHE_STALE_SECONDS)
+
+async def fetch_pubmed_page(search_term: str, retstart: int, retmax: int) -> dict:
+    """Fetch one window of PubMed results and the total hit count, served from the results cache when possible"""
+    key = (search_term.lower().strip(), retstart, retmax)
+    try:
+        return await pubmed_cache.get_or_fetch(key, lambda: request_pubmed_page(search_term, retstart, retmax))
+    except Exception as e:
+        logger.error(f"Error fetching PubMed articles: {e}")
+        return {"count": 0, "articles": []}
+
 async def fetch_pubmed_articles(search_term: str = "mental health", max_results: int = 20):
-    """Fetch mental health articles from PubMed - searches by title"""
+    """Fetch the first max_results mental health articles from PubMed"""
+    return (await fetch_pubmed_page(search_term, 0, max_results))["articles"]
+
+async def fetch_pubmed_window(search_term: str, start: int, end: int) -> dict:
+    """PubMed results [start, end) and the hit count, assembled from aligned, individually cached blocks"""
+    first_block = start // PUBMED_BLOCK_SIZE * PUBMED_BLOCK_SIZE
+    blocks = await asyncio.gather(*[
+        fetch_pubmed_page(search_term, block_start, PUBMED_BLOCK_SIZE)
+        for block_start in range(first_block, end, PUBMED_BLOCK_SIZE)
+    ])
+    articles = [article for block in blocks for article in block["articles"]]
+    return {"count": max(block["count"] for block in blocks), "articles": articles[start - first_block:end - first_block]}
+
+async def request_pubmed_page(search_term: str, retstart: int, retmax: int) -> dict:
+    """Fetch mental health articles from PubMed - searches by title; retmax=0 only counts"""
     articles = []
     
-    try:
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=20)) as session:
-            # Search in title field specifically
-            search_params = {
-                "db": "pubmed",
-                "term": f"({search_term}[Title]) AND (mental health OR psychology OR therapy OR wellness)",
-                "retmax": max_results,
-                "sort": "relevance",
-                "retmode": "json"
-            }
-            
-            async with session.get(PUBMED_SEARCH_URL, params=search_params) as response:
-                if response.status != 200:
-                    logger.error(f"PubMed search failed: {response.status}")
-                    return articles
-                    
-                search_data = await response.json()
-                id_list = search_data.get("esearchresult", {}).get("idlist", [])
-                
-                if not id_list:
-                    return articles
+    session = get_http_session()
+    timeout = aiohttp.ClientTimeout(total=PUBMED_TIMEOUT_SECONDS)
+
+    # Search in title field specifically
+    search_params = {
+        "db": "pubmed",
+        "term": f"({search_term}[Title]) AND (mental health OR psychology OR therapy OR wellness)",
+        "retstart": retstart,
+        "retmax": retmax,
+        "sort": "relevance",
+        "retmode": "json"
+    }
+    
+    async with session.get(PUBMED_SEARCH_URL, params=search_params, timeout=timeout) as response:
+        if response.status != 200:
+            raise RuntimeError(f"PubMed search failed: {response.status}")
             
-            fetch_params = {
-                "db": "pubmed",
-                "id": ",".join(id_list),
-                "retmode": "json"
-            }
+        search_data = await response.json()
+        id_list = search_data.get("esearchresult", {}).get("idlist", [])
+        count = int(search_data.get("esearchresult", {}).get("count", retstart + len(id_list)))
+        
+        if not id_list:
+            return {"count": count, "articles": articles}
+    
+    fetch_params = {
+        "db": "pubmed",
+        "id": ",".join(id_list),
+        "retmode": "json"
+    }
+    
+    async with session.get(PUBMED_FETCH_URL, params=fetch_params, timeout=timeout) as response:
+        if response.status != 200:
+            raise RuntimeError(f"PubMed summary fetch failed: {response.status}")
             
-            async with session.get(PUBMED_FETCH_URL, params=fetch_params) as response:
-                if response.status != 200:
-                    return articles
-                    
-                fetch_data = await response.json()
-                results = fetch_data.get("result", {})
+        fetch_data = await response.json()
+        results = fetch_data.get("result", {})
+        
+        for pmid in id_list:
+            article_data = results.get(pmid, {})
+            if article_data and isinstance(article_data, dict):
+                title = article_data.get("title", "")
+                title = re.sub(r'<[^>]+>', '', title)  # Remove HTML tags
                 
-                for pmid in id_list:
-                    article_data = results.get(pmid, {})
-                    if article_data and isinstance(article_data, dict):
-                        title = article_data.get("title", "")
-                        title = re.sub(r'<[^>]+>', '', title)  # Remove HTML tags
-                        
-                        if title:
-                            articles.append({
-                                "id": f"pubmed_{pmid}",
-                                "title": title[:300],
-                                "summary": f"Published in {article_data.get('fulljournalname', 'PubMed')}. Authors: {article_data.get('sortfirstauthor', 'N/A')}",
-                                "content": title,
-                                "category": "research",
-                                "image_url": "https://images.unsplash.com/photo-1576091160399-112ba8d25d1d",
-                                "source": "PubMed",
-                                "url": f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/",
-                                "published": article_data.get("pubdate", "")
-                            })
-    except Exception as e:
-        logger.error(f"Error fetching PubMed articles: {e}")
-    
-    return articles
+                if title:
+                    articles.append({
+                        "id": f"pubmed_{pmid}",
+                        "title": title[:300],
+                        "summary": f"Published in {article_data.get('fulljournalname', 'PubMed')}. Authors: {article_data.get('sortfirstauthor', 'N/A')}",
+                        "content": title,
+                        "category": "research",
+                        "image_url": "https://images.unsplash.com/photo-1576091160399-112ba8d25d1d",
+                        "source": "PubMed",
+                        "url": f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/",
+                        "published": article_data.get("pubdate", "")
+                    })
+
+    return {"count": count, "articles": articles}
 
 @api_router.get("/articles")
 async def get_articles(
@@ -1009,51 +2738,43 @@ async def get_articles(
     limit: int = 12,
     current_user: dict = Depends(get_current_user)
 ):
-    """Get articles with search by title and pagination"""
-    all_articles = []
+    """Get articles with search by title and pagination; admin articles come first, then PubMed results"""
+    page = max(page, 1)
+    limit = max(1, min(limit, 50))
+    start = (page - 1) * limit
+    end = start + limit
     
-    # Get admin-created articles from database
-    admin_articles = await db.articles.find({}, {"_id": 0}).sort("created_at", -1).to_list(100)
+    search_term = search.strip() if search else ""
+    normalized = normalize_search_text(search_term)
+    pubmed_term = search_term or "mental health treatment"
     
-    # If searching, filter admin articles by title and fetch from PubMed
-    if search:
-        search_lower = search.lower().strip()
-        
-        # Filter admin articles by title
-        filtered_admin = [
-            a for a in admin_articles 
-            if search_lower in a.get("title", "").lower()
-        ]
-        all_articles.extend(filtered_admin)
-        
-        # Fetch from PubMed with title search
-        pubmed_articles = await fetch_pubmed_articles(search, 20)
-        all_articles.extend(pubmed_articles)
+    if normalized:
+        # Ranked by the weighted text index over the normalized fields (title > tags > summary > content)
+        query = {"$text": {"$search": normalized}}
+        projection = {**ARTICLE_PROJECTION, "score": {"$meta": "textScore"}}
+        sort = [("score", {"$meta": "textScore"}), ("created_at", DESCENDING)]
     else:
-        # No search - return admin articles + general PubMed articles
-        all_articles.extend(admin_articles)
-        
-        # Fetch general mental health articles from PubMed
-        pubmed_articles = await fetch_pubmed_articles("mental health treatment", 15)
-        all_articles.extend(pubmed_articles)
-    
-    # Remove duplicates by title
-    seen_titles = set()
-    unique_articles = []
-    for article in all_articles:
-        title_key = article.get("title", "").lower()[:50]
-        if title_key and title_key not in seen_titles:
-            seen_titles.add(title_key)
-            unique_articles.append(article)
-    
-    # Pagination
-    total = len(unique_articles)
-    start = (page - 1) * limit
-    end = start + limit
-    paginated = unique_articles[start:end]
+        query, projection, sort = {}, ARTICLE_PROJECTION, [("created_at", DESCENDING)]
     
+    admin_total = await db.articles.count_documents(query)
+    articles = []
+    if start < admin_total:
+        articles = await db.articles.find(query, projection).sort(sort).skip(start).limit(limit).to_list(limit)
+        for article in articles:
+            article.pop("score", None)
+    
+    # PubMed only supplies the part of the window past the admin articles; otherwise ask it for the hit count alone
+    pubmed_start = max(start - admin_total, 0)
+    pubmed_end = min(end - admin_total, PUBMED_MAX_RESULTS)
+    if pubmed_end > pubmed_start:
+        pubmed = await fetch_pubmed_window(pubmed_term, pubmed_start, pubmed_end)
+        articles.extend(pubmed["articles"])
+    else:
+        pubmed = await fetch_pubmed_page(pubmed_term, 0, 0)
+    
+    total = admin_total + min(pubmed["count"], PUBMED_MAX_RESULTS)
     return {
-        "articles": paginated,
+        "articles": articles,
         "page": page,
         "limit": limit,
         "total": total,
@@ -1098,7 +2819,7 @@ async def get_search_suggestions(current_user: dict = Depends(get_current_user))
 @api_router.get("/articles/{article_id}")
 async def get_article(article_id: str, current_user: dict = Depends(get_current_user)):
     # Check admin-created articles first
-    admin_article = await db.articles.find_one({"id": article_id}, {"_id": 0})
+    admin_article = await db.articles.find_one({"id": article_id}, ARTICLE_PROJECTION)
     if admin_article:
         return admin_article
     
@@ -1136,14 +2857,14 @@ async def admin_create_article(article: ArticleCreate, admin: dict = Depends(get
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     
-    await db.articles.insert_one(article_doc)
+    await db.articles.insert_one({**article_doc, "search": article_search_fields(article_doc)})
     
-    return {"message": "Article created successfully", "article": {k: v for k, v in article_doc.items() if k != "_id"}}
+    return {"message": "Article created successfully", "article": article_doc}
 
 @api_router.get("/admin/articles")
 async def admin_get_articles(admin: dict = Depends(get_admin_user)):
     """Get all admin-created articles"""
-    articles = await db.articles.find({}, {"_id": 0}).sort("created_at", -1).to_list(100)
+    articles = await db.articles.find({}, ARTICLE_PROJECTION).sort("created_at", -1).to_list(100)
     return {"articles": articles, "total": len(articles)}
 
 @api_router.put("/admin/articles/{article_id}")
@@ -1155,10 +2876,11 @@ async def admin_update_article(article_id: str, article: ArticleUpdate, admin: d
     
     update_data = {k: v for k, v in article.model_dump().items() if v is not None}
     update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+    update_data["search"] = article_search_fields({**existing, **update_data})
     
     await db.articles.update_one({"id": article_id}, {"$set": update_data})
     
-    updated = await db.articles.find_one({"id": article_id}, {"_id": 0})
+    updated = await db.articles.find_one({"id": article_id}, ARTICLE_PROJECTION)
     return {"message": "Article updated successfully", "article": updated}
 
 @api_router.delete("/admin/articles/{article_id}")
@@ -1171,6 +2893,269 @@ async def admin_delete_article(article_id: str, admin: dict = Depends(get_admin_
     await db.articles.delete_one({"id": article_id})
     return {"message": "Article deleted successfully"}
 
+# ==================== REVENUE LEDGER ====================
+
+# revenue_ledger is append-only: one entry per payment transaction, written
+# when it first flips to paid. revenue_rollups keeps running totals keyed
+# "total", "day:YYYY-MM-DD", "month:YYYY-MM" and "tier:<tier>", so revenue
+# reads are single-document lookups however many transactions exist.
+# Amounts are booked in integer cents to keep the sums exact.
+# Every step is idempotent and safe to run from any instance concurrently:
+# a transaction is marked ledger_booked once its entry exists, and an entry
+# is added to the rollups only by whoever flips its rolled_up flag from
+# false to true. reconcile_revenue_ledger finishes whatever a crash left
+# half done by looking only at unbooked transactions and unrolled entries.
+
+def to_cents(amount) -> int:
+    return int(round(float(amount or 0) * 100))
+
+def revenue_rollup_keys(entry: dict) -> list:
+    paid_at = entry["paid_at"]
+    return ["total", f"day:{paid_at[:10]}", f"month:{paid_at[:7]}", f"tier:{entry.get('tier') or 'unknown'}"]
+
+def revenue_rollup_updates(entries) -> list:
+    """$inc upserts that add the given ledger entries to every rollup they belong to"""
+    totals = {}
+    for entry in entries:
+        for key in revenue_rollup_keys(entry):
+            cents, count = totals.get(key, (0, 0))
+            totals[key] = (cents + entry["amount_cents"], count + 1)
+    return [
+        UpdateOne({"_id": key}, {"$inc": {"amount_cents": cents, "count": count}}, upsert=True)
+        for key, (cents, count) in totals.items()
+    ]
+
+def revenue_ledger_entry(payment: dict, paid_at: str) -> dict:
+    return {
+        "transaction_id": payment["id"],
+        "session_id": payment.get("session_id"),
+        "user_id": payment.get("user_id"),
+        "tier": payment.get("tier"),
+        "currency": payment.get("currency", "usd"),
+        "amount_cents": to_cents(payment.get("amount")),
+        "paid_at": paid_at,
+        "rolled_up": False
+    }
+
+async def roll_up_ledger_entry(transaction_id: str) -> bool:
+    """Add a ledger entry to the rollups unless it already has been"""
+    # Entries booked before the flag existed have no rolled_up field and are already counted
+    entry = await db.revenue_ledger.find_one_and_update(
+        {"transaction_id": transaction_id, "rolled_up": False},
+        {"$set": {"rolled_up": True}},
+        projection={"_id": 0, "amount_cents": 1, "paid_at": 1, "tier": 1}
+    )
+    if entry is None:
+        return False
+    await db.revenue_rollups.bulk_write(revenue_rollup_updates([entry]), ordered=False)
+    return True
+
+async def record_revenue(payment: dict, paid_at: str) -> bool:
+    """Append a paid transaction to the ledger and bump its rollups; no-op if already booked"""
+    entry = revenue_ledger_entry(payment, paid_at)
+    try:
+        await db.revenue_ledger.insert_one(entry)
+        booked = True
+    except DuplicateKeyError:
+        booked = False
+    await db.payment_transactions.update_one({"id": payment["id"]}, {"$set": {"ledger_booked": True}})
+    await roll_up_ledger_entry(payment["id"])
+    return booked
+
+async def mark_transaction_paid(session_id: str) -> Optional[dict]:
+    """Flip a payment transaction to paid, booking revenue only on the actual transition"""
+    now = datetime.now(timezone.utc).isoformat()
+    payment = await db.payment_transactions.find_one_and_update(
+        {"session_id": session_id},
+        {"$set": {"payment_status": "paid", "updated_at": now}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE
+    )
+    if payment and payment.get("payment_status") != "paid":
+        await record_revenue(payment, now)
+        payment_status_waiters.notify(session_id)
+    return payment
+
+async def reconcile_revenue() -> dict:
+    """Book paid transactions missing from the ledger and roll up entries the rollups have not counted"""
+    booked = 0
+    async for payment in db.payment_transactions.find({"payment_status": "paid", "ledger_booked": {"$ne": True}}, {"_id": 0}):
+        if await record_revenue(payment, payment.get("updated_at") or payment["created_at"]):
+            booked += 1
+    rolled_up = 0
+    async for entry in db.revenue_ledger.find({"rolled_up": False}, {"_id": 0, "transaction_id": 1}):
+        if await roll_up_ledger_entry(entry["transaction_id"]):
+            rolled_up += 1
+    return {"booked": booked, "rolled_up": rolled_up}
+
+def revenue_from_rollup(doc: Optional[dict]) -> dict:
+    doc = doc or {}
+    return {"revenue": doc.get("amount_cents", 0) / 100, "transactions": doc.get("count", 0)}
+
+# ==================== STRIPE WEBHOOK INBOX ====================
+
+_stripe_checkouts = {}
+
+def get_stripe_checkout(request: Request) -> StripeCheckout:
+    """StripeCheckout client for this deployment's webhook URL, built once and reused"""
+    webhook_url = f"{str(request.base_url).rstrip('/')}/api/webhook/stripe"
+    stripe_checkout = _stripe_checkouts.get(webhook_url)
+    if stripe_checkout is None:
+        stripe_checkout = _stripe_checkouts[webhook_url] = StripeCheckout(api_key=STRIPE_API_KEY, webhook_url=webhook_url)
+    return stripe_checkout
+
+class WebhookInbox(LeasedJobQueue):
+    """Verified Stripe events persisted in webhook_events (unique on event id) and applied by background workers"""
+
+    name = "Webhook"
+    claim_projection = {"_id": 0, "payload": 0}
+
+    def __init__(self, concurrency: int, max_attempts: int):
+        super().__init__("webhook_events", concurrency, max_attempts, WEBHOOK_LEASE_SECONDS,
+                         WEBHOOK_POLL_SECONDS, WEBHOOK_RETRY_BASE_SECONDS, WEBHOOK_RETRY_MAX_SECONDS)
+        self._apply_lag_ms = deque(maxlen=1000)
+        self.received = 0
+        self.duplicates = 0
+        self.applied = 0
+
+    async def accept(self, event, payload: bytes) -> bool:
+        """Store a verified event for processing; False if Stripe already delivered it"""
+        now = datetime.now(timezone.utc).isoformat()
+        doc = {
+            "id": event.event_id,
+            "event_type": event.event_type,
+            "session_id": event.session_id,
+            "payment_status": event.payment_status,
+            "metadata": dict(event.metadata or {}),
+            "payload": payload.decode("utf-8", "replace"),
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt_at": now,
+            "created_at": now,
+            "updated_at": now
+        }
+        try:
+            await self.collection.insert_one(doc)
+        except DuplicateKeyError:
+            self.duplicates += 1
+            return False
+        self.received += 1
+        self._wakeup.set()
+        return True
+
+    async def _process(self, event: dict):
+        try:
+            await apply_stripe_event(event)
+        except Exception as e:
+            logger.error(f"Failed to apply Stripe event {event['id']}: {e}")
+            await self._fail(event, str(e))
+            return
+        now = datetime.now(timezone.utc)
+        self.applied += 1
+        self._apply_lag_ms.append((now - datetime.fromisoformat(event["next_attempt_at"])).total_seconds() * 1000)
+        await self._complete(event, {"processed_at": now.isoformat()})
+
+    async def replay(self, event_id: Optional[str] = None) -> int:
+        """Queue one event (any status) or every dead-lettered event to be applied again"""
+        return await self.requeue({"id": event_id} if event_id else {"status": "dead"})
+
+    async def stats(self) -> dict:
+        lags = sorted(self._apply_lag_ms)
+        return {
+            "workers": len(self._workers),
+            **await self._status_counts(),
+            "received": self.received,
+            "duplicates": self.duplicates,
+            "applied": self.applied,
+            "failed_attempts": self.failed_attempts,
+            "dead_lettered": self.dead_lettered,
+            "apply_lag_ms_p50": round(lags[len(lags) // 2], 1) if lags else None
+        }
+
+async def activate_paid_checkout(session_id: str, user_id: Optional[str] = None):
+    """Record a paid checkout and activate the subscription; safe to repeat, revenue is booked once"""
+    payment = await mark_transaction_paid(session_id)
+    user_id = user_id or (payment or {}).get("user_id")
+    if user_id:
+        await db.users.update_one({"id": user_id}, {"$set": {"subscription_status": "active"}})
+        user_cache.invalidate(user_id)
+
+async def apply_stripe_event(event: dict):
+    """Apply a stored Stripe event; a replay or an expired lease re-applying it is harmless"""
+    if event.get("payment_status") == "paid" and event.get("session_id"):
+        await activate_paid_checkout(event["session_id"], (event.get("metadata") or {}).get("user_id"))
+
+webhook_inbox = WebhookInbox(WEBHOOK_WORKER_CONCURRENCY, WEBHOOK_MAX_ATTEMPTS)
+
+# ==================== PAYMENT STATUS ====================
+
+# Once a transaction reaches one of these states it never changes, so status
+# polls are answered from payment_transactions without calling Stripe
+PAYMENT_TERMINAL_STATUSES = ("paid", "expired")
+PAYMENT_STATUS_PROJECTION = {"_id": 0, "user_id": 1, "amount": 1, "currency": 1, "payment_status": 1}
+
+class PaymentStatusWaiters:
+    """Wakes long-polling status requests as soon as this process records a terminal state"""
+
+    def __init__(self):
+        self._waiting = {}
+
+    async def wait(self, session_id: str, timeout: float) -> bool:
+        entry = self._waiting.get(session_id)
+        if entry is None:
+            entry = self._waiting[session_id] = [asyncio.Event(), 0]
+        entry[1] += 1
+        try:
+            await asyncio.wait_for(entry[0].wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and self._waiting.get(session_id) is entry:
+                del self._waiting[session_id]
+
+    def notify(self, session_id: str):
+        entry = self._waiting.pop(session_id, None)
+        if entry is not None:
+            entry[0].set()
+
+    def stats(self) -> dict:
+        return {"sessions": len(self._waiting), "waiters": sum(count for _, count in self._waiting.values())}
+
+payment_status_waiters = PaymentStatusWaiters()
+checkout_status_cache = AsyncTTLCache(CHECKOUT_STATUS_CACHE_MAX_ENTRIES, CHECKOUT_STATUS_CACHE_SECONDS, 0)
+
+async def fetch_checkout_status(stripe_checkout: StripeCheckout, session_id: str) -> dict:
+    """Ask Stripe for a pending session's status and record it if it has become terminal"""
+    async with timed_outbound("stripe", "get_checkout_status"):
+        status = await stripe_checkout.get_checkout_status(session_id)
+    if status.payment_status == "paid":
+        await activate_paid_checkout(session_id)
+    elif status.status == "expired":
+        now = datetime.now(timezone.utc).isoformat()
+        result = await db.payment_transactions.update_one(
+            {"session_id": session_id, "payment_status": {"$nin": list(PAYMENT_TERMINAL_STATUSES)}},
+            {"$set": {"payment_status": "expired", "updated_at": now}}
+        )
+        if result.modified_count:
+            payment_status_waiters.notify(session_id)
+    return {
+        "status": status.status,
+        "payment_status": status.payment_status,
+        "amount_total": status.amount_total,
+        "currency": status.currency
+    }
+
+def recorded_payment_status(payment: dict) -> dict:
+    """Status response for a transaction in a terminal state, in Stripe's shape"""
+    return {
+        "status": "complete" if payment["payment_status"] == "paid" else payment["payment_status"],
+        "payment_status": payment["payment_status"] if payment["payment_status"] == "paid" else "unpaid",
+        "amount_total": to_cents(payment.get("amount")),
+        "currency": payment.get("currency", "usd")
+    }
+
 # ==================== PAYMENT ROUTES ====================
 
 @api_router.post("/payments/create-checkout")
@@ -1183,10 +3168,7 @@ async def create_checkout(payment: PaymentRequest, request: Request, current_use
         price = user.get("subscription_price", 15.00)
         tier = user.get("subscription_tier", "premium")
         
-        host_url = str(request.base_url).rstrip('/')
-        webhook_url = f"{host_url}/api/webhook/stripe"
-        
-        stripe_checkout = StripeCheckout(api_key=STRIPE_API_KEY, webhook_url=webhook_url)
+        stripe_checkout = get_stripe_checkout(request)
         
         success_url = f"{payment.origin_url}/payment/success?session_id={{CHECKOUT_SESSION_ID}}"
         cancel_url = f"{payment.origin_url}/payment/cancel"
@@ -1203,7 +3185,8 @@ async def create_checkout(payment: PaymentRequest, request: Request, current_use
             }
         )
         
-        session = await stripe_checkout.create_checkout_session(checkout_request)
+        async with timed_outbound("stripe", "create_checkout_session"):
+            session = await stripe_checkout.create_checkout_session(checkout_request)
         
         # Store payment transaction
         payment_doc = {
@@ -1224,65 +3207,69 @@ async def create_checkout(payment: PaymentRequest, request: Request, current_use
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.get("/payments/status/{session_id}")
-async def get_payment_status(session_id: str, request: Request, current_user: dict = Depends(get_current_user)):
+async def get_payment_status(session_id: str, request: Request, wait: float = 0, current_user: dict = Depends(get_current_user)):
+    """Checkout status; with wait=N (seconds), hold the request until the payment settles or N elapses"""
+    if wait < 0:
+        raise HTTPException(status_code=400, detail="wait must not be negative")
     try:
-        host_url = str(request.base_url).rstrip('/')
-        webhook_url = f"{host_url}/api/webhook/stripe"
+        payment = await db.payment_transactions.find_one({"session_id": session_id}, PAYMENT_STATUS_PROJECTION)
+        if not payment or payment["user_id"] != current_user["id"]:
+            raise HTTPException(status_code=404, detail="Payment session not found")
         
-        stripe_checkout = StripeCheckout(api_key=STRIPE_API_KEY, webhook_url=webhook_url)
-        status = await stripe_checkout.get_checkout_status(session_id)
+        # Long-poll: wake on a local webhook/status update, re-reading the transaction
+        # periodically in case another instance recorded it
+        deadline = time.monotonic() + min(wait, PAYMENT_STATUS_MAX_WAIT_SECONDS)
+        while payment["payment_status"] not in PAYMENT_TERMINAL_STATUSES:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            await payment_status_waiters.wait(session_id, min(remaining, PAYMENT_STATUS_RECHECK_SECONDS))
+            payment = await db.payment_transactions.find_one({"session_id": session_id}, PAYMENT_STATUS_PROJECTION)
         
-        # Update payment transaction
-        if status.payment_status == "paid":
-            await db.payment_transactions.update_one(
-                {"session_id": session_id},
-                {"$set": {"payment_status": "paid", "updated_at": datetime.now(timezone.utc).isoformat()}}
-            )
-            # Update user subscription
-            payment = await db.payment_transactions.find_one({"session_id": session_id}, {"_id": 0})
-            if payment:
-                await db.users.update_one(
-                    {"id": payment["user_id"]},
-                    {"$set": {"subscription_status": "active"}}
-                )
+        if payment["payment_status"] in PAYMENT_TERMINAL_STATUSES:
+            return recorded_payment_status(payment)
         
-        return {
-            "status": status.status,
-            "payment_status": status.payment_status,
-            "amount_total": status.amount_total,
-            "currency": status.currency
-        }
+        stripe_checkout = get_stripe_checkout(request)
+        return await checkout_status_cache.get_or_fetch(
+            session_id, lambda: fetch_checkout_status(stripe_checkout, session_id)
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Payment status error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.post("/webhook/stripe")
 async def stripe_webhook(request: Request):
+    """Verify and store the event, then acknowledge; webhook_inbox applies it in the background"""
+    body = await request.body()
+    signature = request.headers.get("Stripe-Signature")
     try:
-        body = await request.body()
-        signature = request.headers.get("Stripe-Signature")
-        
-        host_url = str(request.base_url).rstrip('/')
-        webhook_url = f"{host_url}/api/webhook/stripe"
-        
-        stripe_checkout = StripeCheckout(api_key=STRIPE_API_KEY, webhook_url=webhook_url)
-        webhook_response = await stripe_checkout.handle_webhook(body, signature)
-        
-        if webhook_response.payment_status == "paid":
-            await db.payment_transactions.update_one(
-                {"session_id": webhook_response.session_id},
-                {"$set": {"payment_status": "paid", "updated_at": datetime.now(timezone.utc).isoformat()}}
-            )
-            if webhook_response.metadata and "user_id" in webhook_response.metadata:
-                await db.users.update_one(
-                    {"id": webhook_response.metadata["user_id"]},
-                    {"$set": {"subscription_status": "active"}}
-                )
-        
-        return {"status": "ok"}
+        async with timed_outbound("stripe", "handle_webhook"):
+            event = await get_stripe_checkout(request).handle_webhook(body, signature)
     except Exception as e:
-        logger.error(f"Webhook error: {e}")
-        return {"status": "error", "message": str(e)}
+        logger.warning(f"Rejected Stripe webhook: {e}")
+        raise HTTPException(status_code=400, detail="Invalid webhook")
+    
+    # A storage failure propagates as a 500 so Stripe retries the delivery
+    accepted = await webhook_inbox.accept(event, body)
+    return {"status": "ok", "duplicate": not accepted}
+
+@api_router.get("/admin/webhooks/events")
+async def admin_list_webhook_events(status: str = "dead", limit: int = PAGE_DEFAULT_LIMIT, cursor: Optional[str] = None, admin: dict = Depends(get_admin_user)):
+    """Stored Stripe events in the given status, newest first"""
+    if status not in ("pending", "processing", "done", "dead"):
+        raise HTTPException(status_code=400, detail="status must be one of pending, processing, done, dead")
+    events, next_cursor = await paginate(db.webhook_events, {"status": status}, {"_id": 0, "payload": 0}, limit, cursor)
+    return {"events": events, "next_cursor": next_cursor}
+
+@api_router.post("/admin/webhooks/replay")
+async def admin_replay_webhook_events(event_id: Optional[str] = None, admin: dict = Depends(get_admin_user)):
+    """Apply one stored event again, or every dead-lettered event when no event_id is given"""
+    replayed = await webhook_inbox.replay(event_id)
+    if event_id and not replayed:
+        raise HTTPException(status_code=404, detail="Event not found")
+    return {"message": f"Replaying {replayed} webhook events", "replayed": replayed}
 
 # ==================== ADMIN ROUTES ====================
 
@@ -1298,148 +3285,560 @@ async def admin_delete_user(user_id: str, admin: dict = Depends(get_admin_user))
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
+    # Outbox jobs and Stripe events are keyed by address and checkout session, so collect those first
+    emails = [r["email"] async for r in db.email_reminders.find({"user_id": user_id, "email": {"$nin": [None, ""]}}, {"_id": 0, "email": 1})]
+    session_ids = [p["session_id"] async for p in db.payment_transactions.find({"user_id": user_id}, {"_id": 0, "session_id": 1})]
+    
     # Delete all user data
     await db.users.delete_one({"id": user_id})
+    user_cache.invalidate(user_id)
+    admin_user_headers.invalidate_where(lambda key: key[1] == user_id)
     await db.mood_checkins.delete_many({"user_id": user_id})
+    await db.mood_streaks.delete_many({"user_id": user_id})
+    await db.mood_rollups.delete_many({"user_id": user_id})
     await db.diary_entries.delete_many({"user_id": user_id})
-    await db.chat_messages.delete_many({"user_id": user_id})
+    await delete_chat_turns(user_id)
+    await db.chat_summaries.delete_many({"user_id": user_id})
+    await db.chat_sessions.delete_many({"user_id": user_id})
     await db.payment_transactions.delete_many({"user_id": user_id})
     await db.notification_settings.delete_many({"user_id": user_id})
+    await db.email_reminders.delete_many({"user_id": user_id})
+    await email_outbox.forget_recipient(user_id, emails)
+    await db.webhook_events.delete_many({"$or": [{"session_id": {"$in": session_ids}}, {"metadata.user_id": user_id}]})
     
     return {"message": "User and all associated data deleted", "user_id": user_id}
 
-@api_router.get("/admin/analytics")
-async def admin_get_analytics(admin: dict = Depends(get_admin_user)):
-    total_users = await db.users.count_documents({})
-    active_subscriptions = await db.users.count_documents({"subscription_status": "active"})
-    total_checkins = await db.mood_checkins.count_documents({})
-    total_diary_entries = await db.diary_entries.count_documents({})
-    total_chat_messages = await db.chat_messages.count_documents({})
-    
-    # Mood distribution
-    mood_pipeline = [
-        {"$group": {"_id": "$feeling", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}}
-    ]
-    mood_distribution = await db.mood_checkins.aggregate(mood_pipeline).to_list(20)
-    
-    # Country distribution
-    country_pipeline = [
-        {"$group": {"_id": "$country", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}}
-    ]
-    country_distribution = await db.users.aggregate(country_pipeline).to_list(20)
+# ==================== ADMIN ANALYTICS ====================
+
+async def compute_analytics() -> dict:
+    """Build the dashboard analytics with one faceted pass per collection, run concurrently"""
+    users_pipeline = [{"$facet": {
+        "total": [{"$count": "n"}],
+        "active": [{"$match": {"subscription_status": "active"}}, {"$count": "n"}],
+        "countries": [{"$group": {"_id": "$country", "count": {"$sum": 1}}}, {"$sort": {"count": -1}}, {"$limit": 20}],
+        "genders": [{"$group": {"_id": "$gender", "count": {"$sum": 1}}}, {"$limit": 10}]
+    }}]
+    moods_pipeline = [{"$facet": {
+        "total": [{"$count": "n"}],
+        "feelings": [{"$group": {"_id": "$feeling", "count": {"$sum": 1}}}, {"$sort": {"count": -1}}, {"$limit": 20}]
+    }}]
+    
+    users_facets, mood_facets, total_diary_entries, total_chat_messages = await asyncio.gather(
+        db.users.aggregate(users_pipeline).to_list(1),
+        db.mood_checkins.aggregate(moods_pipeline).to_list(1),
+        db.diary_entries.estimated_document_count(),
+        count_chat_turns()
+    )
+    users_facets, mood_facets = users_facets[0], mood_facets[0]
     
-    # Gender distribution
-    gender_pipeline = [
-        {"$group": {"_id": "$gender", "count": {"$sum": 1}}}
-    ]
-    gender_distribution = await db.users.aggregate(gender_pipeline).to_list(10)
+    def facet_count(facet):
+        return facet[0]["n"] if facet else 0
     
     return {
-        "total_users": total_users,
-        "active_subscriptions": active_subscriptions,
-        "total_checkins": total_checkins,
+        "total_users": facet_count(users_facets["total"]),
+        "active_subscriptions": facet_count(users_facets["active"]),
+        "total_checkins": facet_count(mood_facets["total"]),
         "total_diary_entries": total_diary_entries,
         "total_chat_messages": total_chat_messages,
-        "mood_distribution": [{"feeling": m["_id"], "count": m["count"]} for m in mood_distribution],
-        "country_distribution": [{"country": c["_id"], "count": c["count"]} for c in country_distribution],
-        "gender_distribution": [{"gender": g["_id"], "count": g["count"]} for g in gender_distribution]
+        "mood_distribution": [{"feeling": m["_id"], "count": m["count"]} for m in mood_facets["feelings"]],
+        "country_distribution": [{"country": c["_id"], "count": c["count"]} for c in users_facets["countries"]],
+        "gender_distribution": [{"gender": g["_id"], "count": g["count"]} for g in users_facets["genders"]]
     }
 
+class AnalyticsSnapshotter:
+    """Materializes compute_analytics() into analytics_snapshots on an interval"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._task = None
+        self._stopping = False
+        self._refresh_lock = asyncio.Lock()
+        self.refreshes = 0
+        self.last_duration_ms = None
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._stopping = True
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                snapshot = await self.latest()
+                # Another instance may have refreshed recently; only recompute when the snapshot is due
+                if snapshot is None or snapshot["age_seconds"] >= self.interval:
+                    await self.refresh()
+                    wait = self.interval
+                else:
+                    wait = self.interval - snapshot["age_seconds"]
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Analytics snapshot refresh failed: {e}")
+                wait = self.interval
+            await asyncio.sleep(wait)
+
+    async def refresh(self) -> dict:
+        """Recompute and store the snapshot; concurrent callers share one computation"""
+        if self._refresh_lock.locked():
+            async with self._refresh_lock:
+                pass
+            return await self.latest()
+        async with self._refresh_lock:
+            start = time.perf_counter()
+            analytics = await compute_analytics()
+            self.last_duration_ms = round((time.perf_counter() - start) * 1000, 1)
+            self.refreshes += 1
+            generated_at = datetime.now(timezone.utc).isoformat()
+            await db.analytics_snapshots.update_one(
+                {"_id": "latest"},
+                {"$set": {"analytics": analytics, "generated_at": generated_at, "duration_ms": self.last_duration_ms}},
+                upsert=True
+            )
+        return await self.latest()
+
+    async def latest(self):
+        doc = await db.analytics_snapshots.find_one({"_id": "latest"})
+        if not doc:
+            return None
+        age = datetime.now(timezone.utc) - datetime.fromisoformat(doc["generated_at"])
+        return {
+            **doc["analytics"],
+            "generated_at": doc["generated_at"],
+            "age_seconds": round(age.total_seconds(), 1),
+            "duration_ms": doc.get("duration_ms")
+        }
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "interval_seconds": self.interval,
+            "refreshes": self.refreshes,
+            "last_duration_ms": self.last_duration_ms
+        }
+
+analytics_snapshotter = AnalyticsSnapshotter(ANALYTICS_REFRESH_SECONDS)
+
+@api_router.get("/admin/analytics")
+async def admin_get_analytics(admin: dict = Depends(get_admin_user)):
+    """Serve the latest analytics snapshot, computing one if none exists yet"""
+    snapshot = await analytics_snapshotter.latest()
+    if snapshot is None:
+        snapshot = await analytics_snapshotter.refresh()
+    return snapshot
+
+@api_router.post("/admin/analytics/refresh")
+async def admin_refresh_analytics(admin: dict = Depends(get_admin_user)):
+    """Recompute the analytics snapshot now"""
+    return await analytics_snapshotter.refresh()
+
+# ==================== ADMIN EXPORTS ====================
+
+EXPORT_COLUMNS = {
+    "users": ["id", "username", "birthdate", "country", "city", "occupation", "gender", "language",
+              "subscription_tier", "subscription_status", "subscription_price", "created_at"],
+    "mood_checkins": ["id", "user_id", "feeling", "note", "created_at"],
+    "diary_entries": ["id", "user_id", "content", "reflective_question", "reflective_answer", "created_at"],
+    "chat_messages": ["id", "user_id", "session_id", "user_message", "ai_response", "created_at"]
+}
+EXPORT_CHUNK_ROWS = 500
+
+def parse_export_bound(value: Optional[str], name: str) -> Optional[str]:
+    """Normalize an ISO date/datetime query bound to the stored created_at format"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name} date")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat()
+
+async def stream_export(cursor, columns: List[str], fmt: str, compress: bool):
+    """Serialize cursor rows as NDJSON or CSV in chunks, optionally gzip-compressed"""
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore") if fmt == "csv" else None
+    if writer:
+        writer.writeheader()
+    rows = 0
+    
+    def drain() -> bytes:
+        data = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor.compress(data) if compressor else data
+    
+    async for doc in cursor:
+        if writer:
+            writer.writerow(doc)
+        else:
+            buffer.write(json.dumps(doc, ensure_ascii=False, default=str) + "\n")
+        rows += 1
+        if rows % EXPORT_CHUNK_ROWS == 0:
+            chunk = drain()
+            if chunk:
+                yield chunk
+    chunk = drain()
+    if compressor:
+        chunk += compressor.flush()
+    if chunk:
+        yield chunk
+
+def export_response(collection: str, cursor, fmt: str, compress: bool, name: Optional[str] = None) -> StreamingResponse:
+    """Stream cursor rows using the export columns of collection"""
+    if fmt not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'csv'")
+    filename = f"nfadhfadh_{name or collection}_{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}.{fmt}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}{".gz" if compress else ""}"'}
+    media_type = "text/csv; charset=utf-8" if fmt == "csv" else "application/x-ndjson"
+    if compress:
+        media_type = "application/gzip"
+    return StreamingResponse(stream_export(cursor, EXPORT_COLUMNS[collection], fmt, compress), media_type=media_type, headers=headers)
+
+def export_query(start: Optional[str], end: Optional[str]) -> dict:
+    created_at = {}
+    if start := parse_export_bound(start, "start"):
+        created_at["$gte"] = start
+    if end := parse_export_bound(end, "end"):
+        created_at["$lt"] = end
+    return {"created_at": created_at} if created_at else {}
+
 @api_router.get("/admin/export/users")
-async def admin_export_users(admin: dict = Depends(get_admin_user)):
-    users = await db.users.find({}, {"_id": 0, "password_hash": 0}).to_list(10000)
-    return {"data": users, "type": "users", "exported_at": datetime.now(timezone.utc).isoformat()}
+async def admin_export_users(
+    format: str = "ndjson",
+    gzip: bool = False,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    admin: dict = Depends(get_admin_user)
+):
+    """Stream users created in [start, end) as NDJSON or CSV"""
+    cursor = db.users.find(export_query(start, end), {"_id": 0, "password_hash": 0}).batch_size(1000)
+    return export_response("users", cursor, format, gzip)
 
 @api_router.get("/admin/export/moods")
-async def admin_export_moods(admin: dict = Depends(get_admin_user)):
-    moods = await db.mood_checkins.find({}, {"_id": 0}).to_list(10000)
-    return {"data": moods, "type": "mood_checkins", "exported_at": datetime.now(timezone.utc).isoformat()}
+async def admin_export_moods(
+    format: str = "ndjson",
+    gzip: bool = False,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    admin: dict = Depends(get_admin_user)
+):
+    """Stream mood check-ins created in [start, end) as NDJSON or CSV"""
+    cursor = db.mood_checkins.find(export_query(start, end), {"_id": 0}).batch_size(1000)
+    return export_response("mood_checkins", cursor, format, gzip)
 
 # ==================== ADMIN PER-USER DATA ====================
 
+# Per-section projections keep the admin views from shipping fields they never render
+ADMIN_USER_HEADER_PROJECTION = {"_id": 0, "password_hash": 0}
+ADMIN_SECTION_PROJECTIONS = {
+    "mood_checkins": {"_id": 0, "id": 1, "feeling": 1, "note": 1, "created_at": 1},
+    "diary_entries": {"_id": 0, "id": 1, "content": 1, "reflective_question": 1, "reflective_answer": 1, "created_at": 1}
+}
+ADMIN_USER_SECTIONS = ("mood_checkins", "diary_entries", "chat_messages")
+ADMIN_PAYMENT_PROJECTION = {"_id": 0, "id": 1, "session_id": 1, "amount": 1, "currency": 1, "tier": 1, "payment_status": 1, "created_at": 1, "updated_at": 1}
+
+admin_user_headers = TTLCache(1000, ADMIN_USER_HEADER_TTL_SECONDS)
+
+async def load_admin_user_header(admin: dict, user_id: str) -> Optional[dict]:
+    """User profile for the admin views, cached per admin session (token expiry identifies the session)"""
+    key = (admin.get("exp"), user_id)
+    user = admin_user_headers.get(key)
+    if user is None:
+        user = await db.users.find_one({"id": user_id}, ADMIN_USER_HEADER_PROJECTION)
+        if user is not None:
+            admin_user_headers.set(key, user)
+    return user
+
+async def load_admin_user_section(user_id: str, section: str, limit: int, cursor: Optional[str] = None) -> dict:
+    """One page of a user's activity section with its total, fetched concurrently"""
+    if section == "chat_messages":
+        (data, next_cursor), total = await asyncio.gather(
+            page_chat_turns(user_id, limit=limit, cursor=cursor),
+            count_chat_turns(user_id)
+        )
+    else:
+        (data, next_cursor), total = await asyncio.gather(
+            paginate(db[section], {"user_id": user_id}, ADMIN_SECTION_PROJECTIONS[section], limit, cursor),
+            db[section].count_documents({"user_id": user_id})
+        )
+    return {"data": data, "total": total, "next_cursor": next_cursor}
+
+async def load_admin_user_view(admin: dict, user_id: str, section: str, limit: int, cursor: Optional[str]):
+    user, page = await asyncio.gather(
+        load_admin_user_header(admin, user_id),
+        load_admin_user_section(user_id, section, limit, cursor)
+    )
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user, page
+
 @api_router.get("/admin/user/{user_id}/checkins")
-async def admin_get_user_checkins(user_id: str, admin: dict = Depends(get_admin_user)):
-    """Get all mood check-ins for a specific user"""
-    checkins = await db.mood_checkins.find({"user_id": user_id}, {"_id": 0}).sort("created_at", -1).to_list(500)
-    user = await db.users.find_one({"id": user_id}, {"_id": 0, "password_hash": 0})
-    return {"user": user, "checkins": checkins, "total": len(checkins)}
+async def admin_get_user_checkins(user_id: str, limit: int = PAGE_MAX_LIMIT, cursor: Optional[str] = None, admin: dict = Depends(get_admin_user)):
+    """Get a page of mood check-ins for a specific user"""
+    user, page = await load_admin_user_view(admin, user_id, "mood_checkins", limit, cursor)
+    return {"user": user, "checkins": page["data"], "total": page["total"], "next_cursor": page["next_cursor"]}
 
 @api_router.get("/admin/user/{user_id}/diary")
-async def admin_get_user_diary(user_id: str, admin: dict = Depends(get_admin_user)):
-    """Get all diary entries for a specific user"""
-    entries = await db.diary_entries.find({"user_id": user_id}, {"_id": 0}).sort("created_at", -1).to_list(500)
-    user = await db.users.find_one({"id": user_id}, {"_id": 0, "password_hash": 0})
-    return {"user": user, "diary_entries": entries, "total": len(entries)}
+async def admin_get_user_diary(user_id: str, limit: int = PAGE_MAX_LIMIT, cursor: Optional[str] = None, admin: dict = Depends(get_admin_user)):
+    """Get a page of diary entries for a specific user"""
+    user, page = await load_admin_user_view(admin, user_id, "diary_entries", limit, cursor)
+    return {"user": user, "diary_entries": page["data"], "total": page["total"], "next_cursor": page["next_cursor"]}
 
 @api_router.get("/admin/user/{user_id}/chats")
-async def admin_get_user_chats(user_id: str, admin: dict = Depends(get_admin_user)):
-    """Get all chat messages for a specific user"""
-    messages = await db.chat_messages.find({"user_id": user_id}, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    user = await db.users.find_one({"id": user_id}, {"_id": 0, "password_hash": 0})
+async def admin_get_user_chats(user_id: str, limit: int = PAGE_MAX_LIMIT, cursor: Optional[str] = None, admin: dict = Depends(get_admin_user)):
+    """Get a page of chat messages for a specific user, grouped by session"""
+    user, page = await load_admin_user_view(admin, user_id, "chat_messages", limit, cursor)
     
     # Group by session
     sessions = {}
-    for msg in messages:
+    for msg in page["data"]:
         sid = msg.get("session_id", "unknown")
         if sid not in sessions:
             sessions[sid] = []
         sessions[sid].append(msg)
     
-    return {"user": user, "chat_sessions": sessions, "total_messages": len(messages), "total_sessions": len(sessions)}
+    return {"user": user, "chat_sessions": sessions, "total_messages": page["total"], "total_sessions": len(sessions), "next_cursor": page["next_cursor"]}
 
 @api_router.get("/admin/user/{user_id}/full")
-async def admin_get_user_full_data(user_id: str, admin: dict = Depends(get_admin_user)):
-    """Get complete data for a specific user including all activities"""
-    user = await db.users.find_one({"id": user_id}, {"_id": 0, "password_hash": 0})
+async def admin_get_user_full_data(user_id: str, limit: int = PAGE_DEFAULT_LIMIT, admin: dict = Depends(get_admin_user)):
+    """Get complete data for a specific user including the first page of each activity"""
+    user, checkins, diary, chats, payments = await asyncio.gather(
+        load_admin_user_header(admin, user_id),
+        load_admin_user_section(user_id, "mood_checkins", limit),
+        load_admin_user_section(user_id, "diary_entries", limit),
+        load_admin_user_section(user_id, "chat_messages", limit),
+        db.payment_transactions.find({"user_id": user_id}, ADMIN_PAYMENT_PROJECTION).sort("created_at", -1).to_list(50)
+    )
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    checkins = await db.mood_checkins.find({"user_id": user_id}, {"_id": 0}).sort("created_at", -1).to_list(100)
-    diary = await db.diary_entries.find({"user_id": user_id}, {"_id": 0}).sort("created_at", -1).to_list(100)
-    chats = await db.chat_messages.find({"user_id": user_id}, {"_id": 0}).sort("created_at", -1).to_list(200)
-    payments = await db.payment_transactions.find({"user_id": user_id}, {"_id": 0}).to_list(50)
-    
     return {
         "user": user,
-        "mood_checkins": {"data": checkins, "total": len(checkins)},
-        "diary_entries": {"data": diary, "total": len(diary)},
-        "chat_messages": {"data": chats, "total": len(chats)},
+        "mood_checkins": checkins,
+        "diary_entries": diary,
+        "chat_messages": chats,
         "payments": {"data": payments, "total": len(payments)}
     }
 
+@api_router.get("/admin/user/{user_id}/section/{section}")
+async def admin_get_user_section(user_id: str, section: str, limit: int = PAGE_DEFAULT_LIMIT, cursor: Optional[str] = None, admin: dict = Depends(get_admin_user)):
+    """Next page of one activity section, in the same shape as the sections of /full"""
+    if section not in ADMIN_USER_SECTIONS:
+        raise HTTPException(status_code=400, detail="section must be mood_checkins, diary_entries or chat_messages")
+    return await load_admin_user_section(user_id, section, limit, cursor)
+
+@api_router.get("/admin/user/{user_id}/export/{section}")
+async def admin_export_user_section(user_id: str, section: str, format: str = "ndjson", gzip: bool = False, admin: dict = Depends(get_admin_user)):
+    """Stream every row of one activity section for a user"""
+    if section not in ADMIN_USER_SECTIONS:
+        raise HTTPException(status_code=400, detail="section must be mood_checkins, diary_entries or chat_messages")
+    match = {"user_id": user_id}
+    if section == "chat_messages":
+        cursor = chat_collection().aggregate(chat_turns_source(match) + [{"$sort": {"created_at": 1}}], allowDiskUse=True)
+    else:
+        cursor = db[section].find(match, {"_id": 0}).sort("created_at", 1).batch_size(1000)
+    return export_response(section, cursor, format, gzip, name=f"{section}_{user_id}")
+
+REVENUE_PERIOD_FORMATS = {"day": "YYYY-MM-DD", "month": "YYYY-MM"}
+
 @api_router.get("/admin/subscriptions")
-async def admin_get_subscriptions(admin: dict = Depends(get_admin_user)):
-    """Get detailed subscription statistics"""
-    # All subscribed users
-    subscribed = await db.users.find(
-        {"subscription_status": "active"}, 
-        {"_id": 0, "password_hash": 0}
-    ).to_list(1000)
-    
-    # Subscription by tier
+async def admin_get_subscriptions(limit: int = PAGE_DEFAULT_LIMIT, cursor: Optional[str] = None, admin: dict = Depends(get_admin_user)):
+    """Get detailed subscription statistics with a page of active subscribers"""
     tier_pipeline = [
         {"$match": {"subscription_status": "active"}},
-        {"$group": {"_id": "$subscription_tier", "count": {"$sum": 1}, "total_revenue": {"$sum": "$subscription_price"}}}
+        {"$group": {"_id": "$subscription_tier", "count": {"$sum": 1}, "monthly_revenue": {"$sum": "$subscription_price"}}}
     ]
-    by_tier = await db.users.aggregate(tier_pipeline).to_list(10)
-    
-    # Payment transactions
-    paid_transactions = await db.payment_transactions.find(
-        {"payment_status": "paid"}, {"_id": 0}
-    ).to_list(1000)
+    by_tier, tier_rollups, total, (subscribers, next_cursor) = await asyncio.gather(
+        db.users.aggregate(tier_pipeline).to_list(None),
+        db.revenue_rollups.find({"_id": {"$regex": "^tier:"}}).to_list(None),
+        db.revenue_rollups.find_one({"_id": "total"}),
+        paginate(db.users, {"subscription_status": "active"}, {"_id": 0, "password_hash": 0}, limit, cursor)
+    )
     
-    total_revenue = sum(t.get("amount", 0) for t in paid_transactions)
+    tiers = {t["_id"]: {"tier": t["_id"], "count": t["count"], "monthly_revenue": t.get("monthly_revenue", 0)} for t in by_tier}
+    for rollup in tier_rollups:
+        tier = rollup["_id"][len("tier:"):]
+        tiers.setdefault(tier, {"tier": tier, "count": 0, "monthly_revenue": 0})["revenue"] = revenue_from_rollup(rollup)["revenue"]
+    totals = revenue_from_rollup(total)
     
     return {
-        "active_subscribers": len(subscribed),
-        "subscribers": subscribed,
-        "by_tier": [{"tier": t["_id"], "count": t["count"], "revenue": t.get("total_revenue", 0)} for t in by_tier],
-        "total_revenue": total_revenue,
-        "total_transactions": len(paid_transactions)
+        "active_subscribers": sum(t["count"] for t in by_tier),
+        "subscribers": subscribers,
+        "next_cursor": next_cursor,
+        "by_tier": [{"revenue": 0, **t} for t in tiers.values()],
+        "total_revenue": totals["revenue"],
+        "total_transactions": totals["transactions"]
+    }
+
+@api_router.get("/admin/revenue")
+async def admin_get_revenue(period: str = "day", start: Optional[str] = None, end: Optional[str] = None, admin: dict = Depends(get_admin_user)):
+    """Booked revenue per day (last 30 by default) or month (last 12) from the ledger rollups"""
+    if period not in REVENUE_PERIOD_FORMATS:
+        raise HTTPException(status_code=400, detail="period must be 'day' or 'month'")
+    today = datetime.now(timezone.utc).date()
+    if period == "day":
+        end = end or today.isoformat()
+        start = start or (today - timedelta(days=29)).isoformat()
+    else:
+        year, month = divmod(today.year * 12 + today.month - 12, 12)
+        end = end or today.isoformat()[:7]
+        start = start or f"{year:04d}-{month + 1:02d}"
+    width = len(REVENUE_PERIOD_FORMATS[period])
+    if len(start) != width or len(end) != width:
+        raise HTTPException(status_code=400, detail=f"start and end must be {REVENUE_PERIOD_FORMATS[period]}")
+    
+    rollups = await db.revenue_rollups.find(
+        {"_id": {"$gte": f"{period}:{start}", "$lte": f"{period}:{end}"}}
+    ).sort("_id", 1).to_list(400)
+    return {
+        "period": period,
+        "start": start,
+        "end": end,
+        "series": [{period: r["_id"][len(period) + 1:], **revenue_from_rollup(r)} for r in rollups],
+        **revenue_from_rollup(await db.revenue_rollups.find_one({"_id": "total"}))
     }
 
+# ==================== SYSTEM STATS ====================
+
+@api_router.get("/admin/system/stats")
+async def admin_get_system_stats(admin: dict = Depends(get_admin_user)):
+    """Get runtime statistics for internal worker pools and caches"""
+    return {
+        "password_pool": password_pool.stats(),
+        "user_cache": user_cache.stats(),
+        "admin_user_headers": admin_user_headers.stats(),
+        "pubmed_cache": pubmed_cache.stats(),
+        "chat_context": chat_context_stats.stats(),
+        "email_outbox": await email_outbox.stats(),
+        "reminder_scheduler": reminder_scheduler.stats(),
+        "analytics": analytics_snapshotter.stats(),
+        "llm": llm_limiter.stats(),
+        "webhooks": await webhook_inbox.stats(),
+        "checkout_status": {**checkout_status_cache.stats(), "long_polls": payment_status_waiters.stats()},
+        "event_loop": event_loop_monitor.stats()
+    }
+
+# ==================== METRICS ENDPOINT ====================
+
+class EventLoopLagMonitor:
+    """Samples how late the event loop wakes a task sleeping on a timer"""
+
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+        self._task = None
+        self.last_lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started_at = loop.time()
+            await asyncio.sleep(self.interval_seconds)
+            lag = max(0.0, loop.time() - started_at - self.interval_seconds)
+            self.last_lag_seconds = lag
+            self.max_lag_seconds = max(self.max_lag_seconds, lag)
+            event_loop_lag.observe((), lag)
+
+    def stats(self) -> dict:
+        return {
+            "interval_seconds": self.interval_seconds,
+            "last_lag_ms": round(self.last_lag_seconds * 1000, 1),
+            "max_lag_ms": round(self.max_lag_seconds * 1000, 1)
+        }
+
+event_loop_monitor = EventLoopLagMonitor(EVENT_LOOP_LAG_INTERVAL_SECONDS)
+
+class MetricsMiddleware:
+    """ASGI middleware recording http_request_duration by route template, not raw path"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        started_at = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the shared scope
+            route = scope.get("route")
+            http_request_duration.observe(
+                (scope["method"], route.path if route is not None else "unmatched", status),
+                time.perf_counter() - started_at
+            )
+
+def cache_metric_lines() -> List[str]:
+    caches = {
+        "user": user_cache.stats(),
+        "admin_user_headers": admin_user_headers.stats(),
+        "pubmed": pubmed_cache.stats(),
+        "checkout_status": checkout_status_cache.stats()
+    }
+    families = [
+        ("cache_hits_total", "counter", "Lookups served from the cache (including stale and coalesced)",
+         lambda s: s["hits"] + s.get("stale_hits", 0) + s.get("coalesced", 0)),
+        ("cache_misses_total", "counter", "Lookups that had to load the value", lambda s: s["misses"]),
+        ("cache_hit_ratio", "gauge", "Share of lookups served from the cache", lambda s: s["hit_ratio"]),
+        ("cache_entries", "gauge", "Entries currently held", lambda s: s["entries"])
+    ]
+    lines = []
+    for name, metric_type, help_text, value in families:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+        lines += [f'{name}{{cache="{cache}"}} {value(stats)}' for cache, stats in caches.items()]
+    return lines
+
+def render_metrics() -> str:
+    lines = []
+    for histogram in (http_request_duration, mongo_command_duration, outbound_call_duration, event_loop_lag):
+        lines += histogram.render()
+    lines += cache_metric_lines()
+    lines += [
+        "# HELP llm_queue_depth Model calls waiting for a slot",
+        "# TYPE llm_queue_depth gauge",
+        f"llm_queue_depth {llm_limiter.waiting}",
+        "# HELP llm_in_flight Model calls in progress",
+        "# TYPE llm_in_flight gauge",
+        f"llm_in_flight {llm_limiter.in_flight}"
+    ]
+    return "\n".join(lines) + "\n"
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics(authorization: Optional[str] = Header(None)):
+    """Prometheus text exposition of request, MongoDB, outbound, cache and event-loop metrics"""
+    if METRICS_TOKEN and authorization != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # ==================== HEALTH CHECK ====================
 
 @api_router.get("/")
@@ -1450,6 +3849,124 @@ async def root():
 async def health():
     return {"status": "healthy"}
 
+# ==================== MAINTENANCE ====================
+
+@api_router.post("/admin/maintenance/backfill-streaks")
+async def admin_backfill_streaks(admin: dict = Depends(get_admin_user)):
+    """Rebuild stored streak state for every user who has check-ins"""
+    user_ids = await db.mood_checkins.distinct("user_id")
+    for user_id in user_ids:
+        await rebuild_streak_state(user_id)
+    return {"message": f"Rebuilt streak state for {len(user_ids)} users", "users": len(user_ids)}
+
+@api_router.post("/admin/maintenance/backfill-mood-rollups")
+async def admin_backfill_mood_rollups(admin: dict = Depends(get_admin_user)):
+    """Rebuild per-user feeling counters for every user who has check-ins"""
+    user_ids = await db.mood_checkins.distinct("user_id")
+    for user_id in user_ids:
+        await rebuild_mood_rollup(user_id)
+    return {"message": f"Rebuilt mood rollups for {len(user_ids)} users", "users": len(user_ids)}
+
+@api_router.post("/admin/maintenance/backfill-chat-sessions")
+async def admin_backfill_chat_sessions(admin: dict = Depends(get_admin_user)):
+    """Rebuild chat session summaries for every user who has chat messages"""
+    user_ids = await chat_collection().distinct("user_id")
+    sessions = 0
+    for user_id in user_ids:
+        sessions += await rebuild_chat_sessions(user_id)
+    return {"message": f"Rebuilt {sessions} chat sessions for {len(user_ids)} users", "users": len(user_ids), "sessions": sessions}
+
+@api_router.post("/admin/maintenance/migrate-chat-buckets")
+async def admin_migrate_chat_buckets(admin: dict = Depends(get_admin_user)):
+    """Copy chat_messages into the bucketed layout; run before switching CHAT_STORAGE_LAYOUT to buckets"""
+    result = await migrate_chat_messages_to_buckets()
+    return {"message": f"Copied {result['turns']} chat turns from {result['sessions']} sessions into {result['buckets']} new buckets", **result}
+
+@api_router.post("/admin/maintenance/reindex-articles")
+async def admin_reindex_articles(admin: dict = Depends(get_admin_user)):
+    """Recompute the normalized search fields of every admin article"""
+    indexed = await reindex_articles({})
+    return {"message": f"Reindexed {indexed} articles", "articles": indexed}
+
+@api_router.post("/admin/maintenance/reconcile-revenue-ledger")
+async def admin_reconcile_revenue_ledger(admin: dict = Depends(get_admin_user)):
+    """Book paid transactions missing from the revenue ledger and roll up entries not yet counted"""
+    result = await reconcile_revenue()
+    return {"message": f"Booked {result['booked']} transactions and rolled up {result['rolled_up']} ledger entries", **result}
+
+@api_router.get("/admin/maintenance/streak-consistency")
+async def admin_check_streak_consistency(limit: int = 100, admin: dict = Depends(get_admin_user)):
+    """Compare stored streak state against the legacy history-based algorithm"""
+    states = await db.mood_streaks.find({}, {"_id": 0}).limit(limit).to_list(limit)
+    
+    mismatches = []
+    for state in states:
+        stored = streak_info_from_state(state)
+        legacy = await calculate_streak_from_history(state["user_id"])
+        # The legacy algorithm only sees the latest 365 check-ins, so it is only authoritative below that
+        if stored["total_checkins"] > 365:
+            continue
+        fields = ["current_streak", "longest_streak", "checked_in_today", "weekly_badge", "total_checkins"]
+        diff = {f: {"stored": stored[f], "legacy": legacy.get(f, 0)} for f in fields if stored[f] != legacy.get(f, 0)}
+        if diff:
+            mismatches.append({"user_id": state["user_id"], "diff": diff})
+    
+    return {"checked": len(states), "mismatches": mismatches, "consistent": not mismatches}
+
+# ==================== DATABASE INDEXES ====================
+
+# (collection, keys, options) for every query pattern the API relies on
+INDEX_SPECS = [
+    ("users", [("id", ASCENDING)], {"unique": True}),
+    ("users", [("username", ASCENDING)], {"unique": True}),
+    ("users", [("subscription_status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {}),
+    ("mood_checkins", [("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {}),
+    ("mood_checkins", [("created_at", ASCENDING)], {}),
+    ("mood_streaks", [("user_id", ASCENDING)], {"unique": True}),
+    ("mood_rollups", [("user_id", ASCENDING)], {"unique": True}),
+    ("diary_entries", [("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {}),
+    ("chat_messages", [("user_id", ASCENDING), ("session_id", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)], {}),
+    ("chat_messages", [("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {}),
+    ("chat_buckets", [("user_id", ASCENDING), ("session_id", ASCENDING), ("last_at", DESCENDING)], {}),
+    ("chat_buckets", [("user_id", ASCENDING), ("last_at", DESCENDING)], {}),
+    ("chat_summaries", [("user_id", ASCENDING), ("session_id", ASCENDING)], {"unique": True}),
+    ("chat_sessions", [("user_id", ASCENDING), ("session_id", ASCENDING)], {"unique": True}),
+    ("chat_sessions", [("user_id", ASCENDING), ("last_message_at", DESCENDING), ("session_id", ASCENDING),
+                       ("message_count", ASCENDING), ("preview", ASCENDING)], {"name": "chat_sessions_sidebar"}),
+    ("payment_transactions", [("session_id", ASCENDING)], {"unique": True}),
+    ("payment_transactions", [("user_id", ASCENDING)], {}),
+    ("payment_transactions", [("payment_status", ASCENDING)], {}),
+    ("payment_transactions", [("payment_status", ASCENDING), ("ledger_booked", ASCENDING)], {}),
+    ("revenue_ledger", [("transaction_id", ASCENDING)], {"unique": True}),
+    ("revenue_ledger", [("rolled_up", ASCENDING)], {"partialFilterExpression": {"rolled_up": False}}),
+    ("webhook_events", [("id", ASCENDING)], {"unique": True}),
+    ("webhook_events", [("status", ASCENDING), ("next_attempt_at", ASCENDING)], {}),
+    ("webhook_events", [("status", ASCENDING), ("locked_until", ASCENDING)], {}),
+    ("webhook_events", [("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {}),
+    ("webhook_events", [("completed_at", ASCENDING)], {"expireAfterSeconds": int(WEBHOOK_EVENT_RETENTION_DAYS * 86400)}),
+    ("articles", [("id", ASCENDING)], {"unique": True}),
+    ("articles", [("created_at", DESCENDING)], {}),
+    ("articles", [("search.title", TEXT), ("search.tags", TEXT), ("search.summary", TEXT), ("search.content", TEXT)],
+     {"name": "articles_search", "default_language": "none",
+      "weights": {"search.title": 10, "search.tags": 5, "search.summary": 3, "search.content": 1}}),
+    ("email_reminders", [("user_id", ASCENDING)], {"unique": True}),
+    ("email_reminders", [("enabled", ASCENDING)], {}),
+    ("email_reminders", [("enabled", ASCENDING), ("next_fire_at", ASCENDING)], {}),
+    ("email_outbox", [("id", ASCENDING)], {"unique": True}),
+    ("email_outbox", [("status", ASCENDING), ("next_attempt_at", ASCENDING)], {}),
+    ("email_outbox", [("status", ASCENDING), ("locked_until", ASCENDING)], {}),
+    ("email_outbox", [("completed_at", ASCENDING)], {"expireAfterSeconds": int(EMAIL_OUTBOX_RETENTION_DAYS * 86400)}),
+    ("notification_settings", [("user_id", ASCENDING)], {"unique": True}),
+]
+
+async def ensure_indexes():
+    """Create all indexes used by the API; safe to run on every startup"""
+    for collection, keys, options in INDEX_SPECS:
+        try:
+            await db[collection].create_index(keys, background=True, **options)
+        except PyMongoError as e:
+            logger.error(f"Failed to create index {keys} on {collection}: {e}")
+
 # Include router and middleware
 app.include_router(api_router)
 
@@ -1461,6 +3978,63 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so request timings include every other middleware
+app.add_middleware(MetricsMiddleware)
+
+@app.on_event("startup")
+async def create_db_indexes():
+    await ensure_indexes()
+
+@app.on_event("startup")
+async def index_unsearchable_articles():
+    # Articles saved before the search fields existed never match $text until indexed
+    try:
+        indexed = await reindex_articles({"search": {"$exists": False}})
+        if indexed:
+            logger.info(f"Indexed {indexed} articles for search")
+    except PyMongoError as e:
+        logger.error(f"Failed to index articles for search: {e}")
+
+@app.on_event("startup")
+async def reconcile_revenue_ledger():
+    # Only touches unbooked transactions and unrolled entries, so it is cheap and safe alongside other instances
+    try:
+        result = await reconcile_revenue()
+        if result["booked"] or result["rolled_up"]:
+            logger.info(f"Revenue reconcile booked {result['booked']} transactions and rolled up {result['rolled_up']} ledger entries")
+    except PyMongoError as e:
+        logger.error(f"Failed to reconcile revenue ledger: {e}")
+
+@app.on_event("startup")
+async def open_http_session():
+    get_http_session()
+
+@app.on_event("startup")
+async def start_email_workers():
+    email_outbox.start()
+    if REMINDER_SCHEDULER_ENABLED:
+        reminder_scheduler.start()
+
+@app.on_event("startup")
+async def start_webhook_workers():
+    webhook_inbox.start()
+
+@app.on_event("startup")
+async def start_event_loop_monitor():
+    if METRICS_ENABLED:
+        event_loop_monitor.start()
+
+@app.on_event("startup")
+async def start_analytics_snapshots():
+    analytics_snapshotter.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await event_loop_monitor.stop()
+    await analytics_snapshotter.stop()
+    await webhook_inbox.stop()
+    await reminder_scheduler.stop()
+    await email_outbox.stop()
     client.close()
+    password_pool.shutdown()
+    await close_http_session()
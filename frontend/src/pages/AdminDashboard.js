@@ -108,6 +108,18 @@ const AdminDashboard = () => {
     }
   };
 
+  const fetchMoreSubscribers = async () => {
+    try {
+      const response = await axios.get(`${API}/admin/subscriptions`, { params: { cursor: subscriptions.next_cursor } });
+      setSubscriptions((prev) => ({
+        ...response.data,
+        subscribers: [...(prev?.subscribers || []), ...(response.data.subscribers || [])]
+      }));
+    } catch (error) {
+      toast.error(language === 'ar' ? 'فشل تحميل البيانات' : 'Failed to load data');
+    }
+  };
+
   const handleRefresh = () => {
     fetchData();
     toast.success(language === 'ar' ? 'تم تحديث البيانات' : 'Data refreshed');
@@ -125,6 +137,20 @@ const AdminDashboard = () => {
     }
   };
 
+  const fetchMoreUserSection = async (section) => {
+    try {
+      const response = await axios.get(`${API}/admin/user/${selectedUser.id}/section/${section}`, {
+        params: { cursor: userData[section].next_cursor }
+      });
+      setUserData((prev) => ({
+        ...prev,
+        [section]: { ...response.data, data: [...(prev[section]?.data || []), ...(response.data.data || [])] }
+      }));
+    } catch (error) {
+      toast.error(language === 'ar' ? 'فشل تحميل بيانات المستخدم' : 'Failed to load user data');
+    }
+  };
+
   const handleViewUser = (user) => {
     setSelectedUser(user);
     fetchUserData(user.id);
@@ -151,13 +177,16 @@ const AdminDashboard = () => {
 
   const handleExport = async (type) => {
     try {
-      const response = await axios.get(`${API}/admin/export/${type}`);
-      const blob = new Blob([JSON.stringify(response.data.data, null, 2)], { type: 'application/json' });
-      const url = URL.createObjectURL(blob);
+      const response = await axios.get(`${API}/admin/export/${type}`, {
+        params: { format: 'csv' },
+        responseType: 'blob'
+      });
+      const url = URL.createObjectURL(response.data);
       const a = document.createElement('a');
       a.href = url;
-      a.download = `nfadhfadh_${type}_export.json`;
+      a.download = `nfadhfadh_${type}_export.csv`;
       a.click();
+      URL.revokeObjectURL(url);
       toast.success(language === 'ar' ? 'تم تصدير البيانات' : 'Data exported');
     } catch (error) {
       toast.error(language === 'ar' ? 'فشل التصدير' : 'Export failed');
@@ -614,6 +643,11 @@ const AdminDashboard = () => {
                           {language === 'ar' ? 'لا يوجد مشتركين بعد' : 'No subscribers yet'}
                         </p>
                       )}
+                      {subscriptions?.next_cursor && (
+                        <Button variant="outline" size="sm" className="w-full" onClick={fetchMoreSubscribers}>
+                          {language === 'ar' ? 'عرض المزيد' : 'Load more'}
+                        </Button>
+                      )}
                     </div>
                   </ScrollArea>
                 </CardContent>
@@ -691,7 +725,7 @@ const AdminDashboard = () => {
                       <h3 className="font-semibold text-slate-800">
                         {language === 'ar' ? 'تصدير بيانات المستخدمين' : 'Export User Data'}
                       </h3>
-                      <p className="text-sm text-slate-500">JSON format</p>
+                      <p className="text-sm text-slate-500">CSV format</p>
                     </div>
                   </div>
                   <Button onClick={() => handleExport('users')} className="w-full btn-primary" data-testid="export-users-btn">
@@ -711,7 +745,7 @@ const AdminDashboard = () => {
                       <h3 className="font-semibold text-slate-800">
                         {language === 'ar' ? 'تصدير بيانات المزاج' : 'Export Mood Data'}
                       </h3>
-                      <p className="text-sm text-slate-500">JSON format</p>
+                      <p className="text-sm text-slate-500">CSV format</p>
                     </div>
                   </div>
                   <Button onClick={() => handleExport('moods')} className="w-full btn-primary" data-testid="export-moods-btn">
@@ -828,6 +862,11 @@ const AdminDashboard = () => {
                       {(!userData.mood_checkins?.data || userData.mood_checkins.data.length === 0) && (
                         <p className="text-center text-slate-400 py-8">{language === 'ar' ? 'لا توجد بيانات' : 'No data'}</p>
                       )}
+                      {userData.mood_checkins?.next_cursor && (
+                        <Button variant="outline" size="sm" className="w-full" onClick={() => fetchMoreUserSection('mood_checkins')}>
+                          {language === 'ar' ? 'عرض المزيد' : 'Load more'}
+                        </Button>
+                      )}
                     </div>
                   </TabsContent>
 
@@ -850,6 +889,11 @@ const AdminDashboard = () => {
                       {(!userData.diary_entries?.data || userData.diary_entries.data.length === 0) && (
                         <p className="text-center text-slate-400 py-8">{language === 'ar' ? 'لا توجد بيانات' : 'No data'}</p>
                       )}
+                      {userData.diary_entries?.next_cursor && (
+                        <Button variant="outline" size="sm" className="w-full" onClick={() => fetchMoreUserSection('diary_entries')}>
+                          {language === 'ar' ? 'عرض المزيد' : 'Load more'}
+                        </Button>
+                      )}
                     </div>
                   </TabsContent>
 
@@ -876,6 +920,11 @@ const AdminDashboard = () => {
                       {(!userData.chat_messages?.data || userData.chat_messages.data.length === 0) && (
                         <p className="text-center text-slate-400 py-8">{language === 'ar' ? 'لا توجد بيانات' : 'No data'}</p>
                       )}
+                      {userData.chat_messages?.next_cursor && (
+                        <Button variant="outline" size="sm" className="w-full" onClick={() => fetchMoreUserSection('chat_messages')}>
+                          {language === 'ar' ? 'عرض المزيد' : 'Load more'}
+                        </Button>
+                      )}
                     </div>
                   </TabsContent>
                 </ScrollArea>
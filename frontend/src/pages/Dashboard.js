@@ -40,9 +40,9 @@ const Dashboard = () => {
   const fetchDashboardData = async () => {
     try {
       const [checkinsRes, summaryRes, diaryRes, streakRes, questionRes, notifRes] = await Promise.all([
-        axios.get(`${API}/mood/checkins`),
+        axios.get(`${API}/mood/checkins`, { params: { limit: 7 } }),
         axios.get(`${API}/mood/summary`),
-        axios.get(`${API}/diary/entries`),
+        axios.get(`${API}/diary/count`),
         axios.get(`${API}/mood/streak`),
         axios.get(`${API}/mood/question-of-day`),
         axios.get(`${API}/notifications/settings`)
@@ -50,7 +50,7 @@ const Dashboard = () => {
       
       setMoodData(checkinsRes.data.checkins || []);
       setMoodSummary(summaryRes.data);
-      setDiaryCount(diaryRes.data.entries?.length || 0);
+      setDiaryCount(diaryRes.data.total || 0);
       setStreak(streakRes.data);
       setQuestionOfDay(questionRes.data.question);
       setNotificationSettings(notifRes.data);
@@ -20,6 +20,7 @@ const Diary = () => {
   const [loading, setLoading] = useState(false);
   const [showNewEntry, setShowNewEntry] = useState(true);
   const [expandedEntry, setExpandedEntry] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
 
   useEffect(() => {
     fetchEntries();
@@ -30,6 +31,17 @@ const Diary = () => {
     try {
       const response = await axios.get(`${API}/diary/entries`);
       setEntries(response.data.entries || []);
+      setNextCursor(response.data.next_cursor || null);
+    } catch (error) {
+      console.error('Error fetching entries:', error);
+    }
+  };
+
+  const fetchMoreEntries = async () => {
+    try {
+      const response = await axios.get(`${API}/diary/entries`, { params: { cursor: nextCursor } });
+      setEntries((prev) => [...prev, ...(response.data.entries || [])]);
+      setNextCursor(response.data.next_cursor || null);
     } catch (error) {
       console.error('Error fetching entries:', error);
     }
@@ -218,6 +230,16 @@ const Diary = () => {
                 </CardContent>
               </Card>
             ))}
+            {nextCursor && (
+              <Button
+                variant="outline"
+                onClick={fetchMoreEntries}
+                className="w-full rounded-full"
+                data-testid="diary-load-more-btn"
+              >
+                {language === 'ar' ? 'عرض المزيد' : 'Load more'}
+              </Button>
+            )}
           </div>
         ) : (
           <Card className="card-soft">
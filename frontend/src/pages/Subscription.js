@@ -38,7 +38,8 @@ const Subscription = () => {
     setCheckingPayment(true);
 
     try {
-      const response = await axios.get(`${API}/payments/status/${sid}`);
+      // wait: the server holds the request until the payment settles (long-poll)
+      const response = await axios.get(`${API}/payments/status/${sid}`, { params: { wait: 20 } });
       
       if (response.data.payment_status === 'paid') {
         toast.success(language === 'ar' ? 'تم الدفع بنجاح!' : 'Payment successful!');
@@ -72,22 +72,7 @@ const VentingChat = () => {
     };
     setMessages(prev => [...prev, tempUserMsg]);
 
-    try {
-      const response = await axios.post(`${API}/chat/message`, {
-        message: userMessage,
-        session_id: currentSession
-      });
-
-      const { response: aiResponse, session_id, disclaimer: disc } = response.data;
-
-      if (!currentSession) {
-        setCurrentSession(session_id);
-        fetchSessions();
-      }
-
-      setDisclaimer(disc);
-
-      // Update the last message with AI response
+    const setAiResponse = (aiResponse) => {
       setMessages(prev => {
         const updated = [...prev];
         updated[updated.length - 1] = {
@@ -96,6 +81,56 @@ const VentingChat = () => {
         };
         return updated;
       });
+    };
+
+    try {
+      // fetch rather than axios so the reply can be read as it streams in
+      const response = await fetch(`${API}/chat/message/stream`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          Authorization: axios.defaults.headers.common['Authorization']
+        },
+        body: JSON.stringify({ message: userMessage, session_id: currentSession })
+      });
+      if (!response.ok) throw new Error(`Chat stream failed: ${response.status}`);
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let aiResponse = '';
+      let done = false;
+
+      const handleEvent = (block) => {
+        const event = block.match(/^event: (.*)$/m)?.[1];
+        const data = block.match(/^data: (.*)$/m)?.[1];
+        if (!event || !data) return;
+        const payload = JSON.parse(data);
+        if (event === 'session' && !currentSession) {
+          setCurrentSession(payload.session_id);
+        } else if (event === 'delta') {
+          aiResponse += payload.text;
+          setAiResponse(aiResponse);
+        } else if (event === 'disclaimer') {
+          setDisclaimer(payload.disclaimer);
+        } else if (event === 'done') {
+          done = true;
+          setAiResponse(payload.response);
+        }
+      };
+
+      while (true) {
+        const { value, done: streamDone } = await reader.read();
+        if (streamDone) break;
+        buffer += decoder.decode(value, { stream: true });
+        const blocks = buffer.split('\n\n');
+        buffer = blocks.pop();
+        blocks.forEach(handleEvent);
+      }
+      if (buffer.trim()) handleEvent(buffer);
+      if (!done && !aiResponse) throw new Error('Chat stream ended without a reply');
+
+      if (!currentSession) fetchSessions();
     } catch (error) {
       console.error('Error sending message:', error);
       // Remove the temp message on error
@@ -148,6 +183,9 @@ const VentingChat = () => {
                         )}
                       </span>
                     </div>
+                    {session.preview && (
+                      <p className="text-xs text-slate-500 mt-1 truncate">{session.preview}</p>
+                    )}
                     <p className="text-xs text-slate-400 mt-1">
                       {session.message_count} {language === 'ar' ? 'رسائل' : 'messages'}
                     </p>
@@ -0,0 +1,44 @@
+"""
+Shared setup for the tests that run the backend module in-process
+
+Puts backend/ on sys.path so test modules can `import server`, defaults the
+MongoDB settings the module reads at import time, and provides a scratch
+database factory for tests that need MongoDB.
+"""
+
+import pytest
+import os
+import sys
+import uuid
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'test_database')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+
+@pytest.fixture
+def scratch_database(monkeypatch):
+    """Factory for a throwaway database patched in as server.db.
+
+    Enter it inside the test's own event loop, since Motor clients are bound to the loop that uses them:
+
+        async with scratch_database("prefix", indexes=True) as database:
+    """
+    import server
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    @asynccontextmanager
+    async def open_database(prefix: str = "scratch", indexes: bool = False):
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+        database = client[f"{prefix}_{uuid.uuid4().hex[:8]}"]
+        monkeypatch.setattr(server, "db", database)
+        try:
+            if indexes:
+                await server.ensure_indexes()
+            yield database
+        finally:
+            await client.drop_database(database.name)
+            client.close()
+    return open_database
@@ -0,0 +1,104 @@
+"""
+Test suite for admin article search
+Tests:
+- Arabic normalization (diacritics, tatweel, letter variants, definite article)
+- Text-index search over a 50k-article synthetic corpus: ranking and latency
+
+The benchmark runs the backend module in-process against a scratch
+database on MONGO_URL; requires MongoDB.
+"""
+
+import pytest
+import asyncio
+import random
+import time
+
+import server
+
+CORPUS_SIZE = 50000
+QUERIES = 200
+
+TEST_USER = {"id": "search-bench-user", "language": "en"}
+
+FILLER_WORDS = ["daily", "habits", "community", "support", "routine", "research", "family", "work",
+                "الحياة", "العمل", "الأسرة", "الدعم", "الروتين", "اليومية"]
+TOPICS = ["anxiety", "depression", "sleep", "mindfulness", "القلق", "الاكتئاب", "النوم", "الصحة النفسية"]
+
+
+class TestNormalization:
+    """Arabic and Latin text normalize to the same search keys"""
+
+    @pytest.mark.parametrize("raw,expected", [
+        ("القَلَقُ", "قلق"),
+        ("ـــالصحة", "صحه"),
+        ("أمل", "امل"),
+        ("إدارة", "اداره"),
+        ("آمنة", "امنه"),
+        ("مستشفى", "مستشفي"),
+        ("للصحة النفسية", "صحه نفسيه"),
+        ("Self-Esteem & Anxiety!", "self esteem anxiety"),
+    ])
+    def test_normalize(self, raw, expected):
+        assert server.normalize_search_text(raw) == expected
+
+    def test_variants_share_keys(self):
+        """Spelling variants a user might type match the stored form"""
+        assert server.normalize_search_text("الاكتئاب") == server.normalize_search_text("اكتئاب")
+        assert server.normalize_search_text("مدرسة") == server.normalize_search_text("مدرسه")
+
+    def test_search_fields(self):
+        fields = server.article_search_fields({"title": "Coping with القلق", "tags": ["Sleep", "النوم"]})
+        assert fields == {"title": "coping with قلق", "summary": "", "content": "", "tags": "sleep نوم"}
+
+
+def synthetic_article(rng, i):
+    topic = rng.choice(TOPICS)
+    words = rng.sample(FILLER_WORDS, 6)
+    doc = {
+        "id": f"bench-{i}",
+        "title": f"{' '.join(words[:2])} {topic if i % 5 == 0 else ''}".strip(),
+        "summary": f"{' '.join(words[2:4])} {topic}",
+        "content": " ".join(words * 10),
+        "tags": [rng.choice(TOPICS)],
+        "created_at": f"2025-01-01T00:00:{i % 60:02d}+00:00",
+    }
+    doc["search"] = server.article_search_fields(doc)
+    return doc
+
+
+def test_search_benchmark(monkeypatch, scratch_database):
+    """Ranked text search over 50k articles without loading the collection"""
+    async def scenario():
+        monkeypatch.setattr(server, "PUBMED_MAX_RESULTS", 0)
+
+        async def no_pubmed(search_term, retstart, retmax):
+            return {"count": 0, "articles": []}
+        monkeypatch.setattr(server, "fetch_pubmed_page", no_pubmed)
+        async with scratch_database("article_search") as database:
+            rng = random.Random(7)
+            corpus = [synthetic_article(rng, i) for i in range(CORPUS_SIZE)]
+            for i in range(0, CORPUS_SIZE, 5000):
+                await database.articles.insert_many(corpus[i:i + 5000])
+            await server.ensure_indexes()
+
+            result = await server.get_articles(search="القَلَق", page=1, limit=10, current_user=TEST_USER)
+            assert result["total"] > 0
+            assert all("search" not in a for a in result["articles"])
+            # Title matches outrank summary/tag-only matches
+            assert "قلق" in server.normalize_search_text(result["articles"][0]["title"])
+
+            samples = []
+            for _ in range(QUERIES):
+                term = rng.choice(TOPICS)
+                start = time.perf_counter()
+                await database.articles.find(
+                    {"$text": {"$search": server.normalize_search_text(term)}},
+                    {**server.ARTICLE_PROJECTION, "score": {"$meta": "textScore"}}
+                ).sort([("score", {"$meta": "textScore"})]).limit(10).to_list(10)
+                samples.append((time.perf_counter() - start) * 1000)
+            samples.sort()
+            p50 = samples[len(samples) // 2]
+            p99 = samples[int(len(samples) * 0.99)]
+            print(f"\n{CORPUS_SIZE} articles: search p50={p50:.2f}ms p99={p99:.2f}ms")
+            assert p50 < 50
+    asyncio.run(scenario())
@@ -0,0 +1,108 @@
+"""
+Benchmark for the bucketed chat storage layout
+Tests:
+- Migrated buckets return the same history pages as chat_messages
+- Storage size, index size and history-read latency for both layouts
+- Re-running the migration keeps turns written only to chat_buckets
+
+Runs the backend module in-process against a scratch database on
+MONGO_URL; requires MongoDB.
+"""
+
+import asyncio
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+
+import server
+
+USERS = 20
+SESSIONS_PER_USER = 5
+TURNS_PER_SESSION = 200
+READS = 200
+
+
+def seed_messages():
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    for u in range(USERS):
+        for s in range(SESSIONS_PER_USER):
+            for t in range(TURNS_PER_SESSION):
+                yield {
+                    "id": str(uuid.uuid4()),
+                    "user_id": f"bench-user-{u}",
+                    "session_id": f"bench-session-{u}-{s}",
+                    "user_message": f"How do I cope with feeling {t % 7} today?",
+                    "ai_response": "That sounds hard. Try breathing slowly and naming what you feel.",
+                    "created_at": (start + timedelta(minutes=s * TURNS_PER_SESSION + t)).isoformat()
+                }
+
+
+async def collection_sizes(database, name):
+    stats = await database.command("collStats", name)
+    return stats["storageSize"], stats["totalIndexSize"]
+
+
+async def read_latency_ms(user_id, session_id):
+    """Median latency of the first chat history page"""
+    samples = []
+    for _ in range(READS):
+        start = time.perf_counter()
+        await server.page_chat_turns(user_id, session_id, server.PAGE_MAX_LIMIT)
+        samples.append((time.perf_counter() - start) * 1000)
+    return sorted(samples)[len(samples) // 2]
+
+
+def test_bucket_layout_benchmark(monkeypatch, scratch_database):
+    async def scenario():
+        async with scratch_database("chat_bench", indexes=True) as database:
+            messages = list(seed_messages())
+            for i in range(0, len(messages), 5000):
+                await database.chat_messages.insert_many(messages[i:i + 5000])
+            result = await server.migrate_chat_messages_to_buckets()
+            assert result["sessions"] == USERS * SESSIONS_PER_USER
+
+            user_id, session_id = "bench-user-3", "bench-session-3-2"
+            results = {}
+            pages = {}
+            for layout in ("documents", "buckets"):
+                monkeypatch.setattr(server, "CHAT_STORAGE_LAYOUT", layout)
+                pages[layout], _ = await server.page_chat_turns(user_id, session_id, 50)
+                storage, indexes = await collection_sizes(database, server.chat_collection().name)
+                results[layout] = (storage, indexes, await read_latency_ms(user_id, session_id))
+
+            assert [m["id"] for m in pages["documents"]] == [m["id"] for m in pages["buckets"]]
+            print()
+            for layout, (storage, indexes, latency) in results.items():
+                print(f"{layout:>9}: storage={storage / 1024:.0f}KiB indexes={indexes / 1024:.0f}KiB history p50={latency:.2f}ms")
+            assert results["buckets"][1] < results["documents"][1], "Bucket indexes should be smaller"
+    asyncio.run(scenario())
+
+
+def test_migration_rerun_keeps_bucket_only_turns(monkeypatch, scratch_database):
+    """Turns appended after switching to buckets survive a second migration, without duplicates"""
+    async def scenario():
+        async with scratch_database("chat_rerun", indexes=True) as database:
+            user_id, session_id = "rerun-user", "rerun-session"
+            start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+            await database.chat_messages.insert_many([
+                {"id": f"old-{t}", "user_id": user_id, "session_id": session_id, "user_message": "hi",
+                 "ai_response": "hello", "created_at": (start + timedelta(minutes=t)).isoformat()}
+                for t in range(120)
+            ])
+            assert (await server.migrate_chat_messages_to_buckets())["turns"] == 120
+
+            monkeypatch.setattr(server, "CHAT_STORAGE_LAYOUT", "buckets")
+            for t in range(5):
+                await server.append_chat_turn({
+                    "id": f"new-{t}", "user_id": user_id, "session_id": session_id, "user_message": "again",
+                    "ai_response": "still here", "created_at": (start + timedelta(days=1, minutes=t)).isoformat()
+                })
+
+            rerun = await server.migrate_chat_messages_to_buckets()
+            assert rerun["turns"] == 0
+            turns, _ = await server.page_chat_turns(user_id, session_id, server.PAGE_MAX_LIMIT, max_limit=200)
+            ids = [turn["id"] for turn in turns]
+            assert len(ids) == len(set(ids))
+            assert ids[:5] == [f"new-{t}" for t in reversed(range(5))]
+            assert await server.count_chat_turns(user_id) == 125
+    asyncio.run(scenario())
@@ -0,0 +1,48 @@
+"""
+Test suite for chat context building
+Tests:
+- Unsummarized turns older than the history fetch window are folded into the summary
+- Folded turns are not folded again on the next message
+
+Runs the backend module in-process against a scratch database on MONGO_URL;
+requires MongoDB.
+"""
+
+import asyncio
+from datetime import datetime, timezone, timedelta
+
+import server
+
+USER_ID = "context-user"
+SESSION_ID = "context-session"
+
+
+def turn(i, start):
+    return {"id": f"turn-{i:04d}", "user_id": USER_ID, "session_id": SESSION_ID, "user_message": f"message {i}",
+            "ai_response": f"reply {i}", "created_at": (start + timedelta(minutes=i)).isoformat()}
+
+
+def test_turns_beyond_fetch_window_are_summarized(monkeypatch, scratch_database):
+    async def scenario():
+        async with scratch_database("chat_context", indexes=True) as database:
+            monkeypatch.setattr(server, "CHAT_HISTORY_FETCH_LIMIT", 20)
+            monkeypatch.setattr(server, "CHAT_CONTEXT_TOKEN_BUDGET", 400)
+            monkeypatch.setattr(server, "CHAT_SUMMARY_MAX_TOKENS", 5000)
+            start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+            await database.chat_messages.insert_many([turn(i, start) for i in range(75)])
+
+            context = await server.build_chat_context(USER_ID, SESSION_ID, "system", "hello")
+            summary = context[0]["content"]
+            assert "User: message 0\n" in summary
+            assert "User: message 54\n" in summary
+            kept = [m["content"] for m in context[1:] if m["role"] == "user"]
+            assert kept[-1] == "message 74"
+            assert f"User: {kept[0]}\n" not in summary
+
+            state = await database.chat_summaries.find_one({"user_id": USER_ID, "session_id": SESSION_ID})
+            assert state["summarized_until"] < turn(75 - len(kept), start)["created_at"]
+
+            await database.chat_messages.insert_one(turn(75, start))
+            again = await server.build_chat_context(USER_ID, SESSION_ID, "system", "hello")
+            assert again[0]["content"].count("User: message 0\n") == 1
+    asyncio.run(scenario())
@@ -0,0 +1,142 @@
+"""
+Test suite for the streaming venting chat endpoint
+Tests:
+- Tokens are pushed over SSE as the model produces them (time-to-first-token)
+- The disclaimer is sent as a trailing event
+- The complete response is persisted to chat history
+- stream_llm_reply forwards the provider's content deltas
+
+Runs the backend in-process on a local uvicorn server with a fake
+streaming model; requires MongoDB at MONGO_URL/DB_NAME.
+"""
+
+import pytest
+import asyncio
+import json
+import socket
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+
+import requests
+import uvicorn
+
+import server
+
+FAKE_TOKENS = ["I ", "hear ", "you. ", "Tell ", "me ", "more."]
+FIRST_TOKEN_DELAY = 0.05
+TOKEN_INTERVAL = 0.2
+
+TEST_USER = {
+    "id": f"test_stream_user_{uuid.uuid4().hex[:8]}",
+    "username": "stream_tester",
+    "language": "en"
+}
+
+
+async def fake_stream_llm_reply(session_id, system_prompt, context_messages, text):
+    """Fake streaming model that emits tokens over time"""
+    await asyncio.sleep(FIRST_TOKEN_DELAY)
+    for i, token in enumerate(FAKE_TOKENS):
+        if i:
+            await asyncio.sleep(TOKEN_INTERVAL)
+        yield token
+
+
+def read_sse(response):
+    """Yield (event, data, arrival_time) tuples from an SSE response"""
+    event = None
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith("event: "):
+            event = line[len("event: "):]
+        elif line.startswith("data: "):
+            yield event, json.loads(line[len("data: "):]), time.perf_counter()
+
+
+def test_provider_deltas_forwarded(monkeypatch):
+    """The litellm stream's content deltas are yielded as they arrive, skipping empty ones"""
+    def chunk(content):
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+    async def fake_acompletion(**kwargs):
+        assert kwargs["stream"] is True
+        assert kwargs["messages"][-1] == {"role": "user", "content": "Hi"}
+
+        async def stream():
+            for content in ["Hello", None, " there", ""]:
+                yield chunk(content)
+        return stream()
+    monkeypatch.setattr(server, "acompletion", fake_acompletion)
+
+    async def collect():
+        return [delta async for delta in server.stream_llm_reply("s", "system", [], "Hi")]
+    assert asyncio.run(collect()) == ["Hello", " there"]
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    """Run the app on a local port with the fake model and a fixed user"""
+    patched_stream = server.stream_llm_reply
+    server.stream_llm_reply = fake_stream_llm_reply
+    server.app.dependency_overrides[server.get_current_user] = lambda: TEST_USER
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    uvicorn_server = uvicorn.Server(uvicorn.Config(server.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=uvicorn_server.run, daemon=True)
+    thread.start()
+    while not uvicorn_server.started:
+        time.sleep(0.05)
+
+    yield f"http://127.0.0.1:{port}"
+
+    uvicorn_server.should_exit = True
+    thread.join(timeout=5)
+    server.app.dependency_overrides.clear()
+    server.stream_llm_reply = patched_stream
+
+
+class TestChatStream:
+    """Server-Sent Events chat streaming"""
+
+    def test_stream_tokens_then_disclaimer(self, base_url):
+        """Tokens arrive incrementally, followed by disclaimer and done events"""
+        start = time.perf_counter()
+        response = requests.post(f"{base_url}/api/chat/message/stream",
+                                 json={"message": "I had a rough day"}, stream=True)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+
+        events = list(read_sse(response))
+        names = [name for name, _, _ in events]
+        assert names[0] == "session"
+        assert names[-2:] == ["disclaimer", "done"]
+
+        tokens = [(data["text"], at) for name, data, at in events if name == "delta"]
+        assert [text for text, _ in tokens] == FAKE_TOKENS
+
+        time_to_first_token = tokens[0][1] - start
+        total_time = events[-1][2] - start
+        print(f"\ntime to first token={time_to_first_token * 1000:.0f}ms total={total_time * 1000:.0f}ms")
+        assert time_to_first_token < TOKEN_INTERVAL * 2, "First token should not wait for the full completion"
+        assert total_time >= TOKEN_INTERVAL * (len(FAKE_TOKENS) - 1)
+
+        done = events[-1][1]
+        assert done["response"] == "".join(FAKE_TOKENS)
+        assert done["disclaimer"] == server.DISCLAIMER_EN
+        assert events[-2][1]["disclaimer"] == server.DISCLAIMER_EN
+
+    def test_streamed_reply_persisted(self, base_url):
+        """The complete streamed reply is saved to the session history"""
+        session_id = str(uuid.uuid4())
+        response = requests.post(f"{base_url}/api/chat/message/stream",
+                                 json={"message": "Hello", "session_id": session_id}, stream=True)
+        list(read_sse(response))
+
+        history = requests.get(f"{base_url}/api/chat/history/{session_id}").json()["messages"]
+        assert len(history) == 1
+        assert history[0]["user_message"] == "Hello"
+        assert history[0]["ai_response"] == "".join(FAKE_TOKENS)
+
@@ -0,0 +1,91 @@
+"""
+Test suite for the email outbox
+Tests:
+- A batch SendGrid rejects for one invalid address is split until only that address dead-letters
+- Transient failures are retried rather than split
+- Deleting a user strips their address from queued jobs and drops their Stripe events
+
+Runs the backend module in-process against a scratch database on MONGO_URL
+with SendGrid replaced by a fake; requires MongoDB.
+"""
+
+import asyncio
+
+import server
+
+
+def fake_sendgrid(monkeypatch, status_for):
+    requests = []
+
+    async def send(recipients, language="en"):
+        requests.append([r["email"] for r in recipients])
+        return status_for(recipients)
+    monkeypatch.setattr(server, "send_reminder_batch", send)
+    return requests
+
+
+async def drain(outbox):
+    while (job := await outbox._claim()) is not None:
+        await outbox._process(job)
+
+
+def test_poison_batch_is_bisected(monkeypatch, scratch_database):
+    async def scenario():
+        async with scratch_database("outbox") as database:
+            requests = fake_sendgrid(monkeypatch, lambda rs: 400 if any(r["email"] == "bad" for r in rs) else 202)
+            recipients = [{"email": f"user{i}@example.com", "username": f"user{i}"} for i in range(64)]
+            recipients[41]["email"] = "bad"
+
+            outbox = server.EmailOutbox(1, 1000, 1000, 5)
+            await outbox.enqueue_batch(recipients)
+            await drain(outbox)
+
+            assert outbox.sent == 63
+            assert len(requests) == 2 * 6 + 1  # one rejected and one accepted request per level, plus the root
+            dead = await database.email_outbox.find({"status": "dead"}, {"_id": 0}).to_list(None)
+            assert [r["email"] for job in dead for r in job["recipients"]] == ["bad"]
+            assert dead[0]["attempts"] == 1
+    asyncio.run(scenario())
+
+
+def test_transient_failure_retried_whole(monkeypatch, scratch_database):
+    async def scenario():
+        async with scratch_database("outbox") as database:
+            fake_sendgrid(monkeypatch, lambda rs: 503)
+            outbox = server.EmailOutbox(1, 1000, 1000, 5)
+            job_id = await outbox.enqueue_batch([{"email": f"user{i}@example.com", "username": "u"} for i in range(4)])
+            await outbox._process(await outbox._claim())
+
+            job = await database.email_outbox.find_one({"id": job_id})
+            assert job["status"] == "pending"
+            assert job["recipient_count"] == 4
+            assert outbox.split_batches == 0
+    asyncio.run(scenario())
+
+
+def test_deleted_user_purged_from_queues(monkeypatch, scratch_database):
+    async def scenario():
+        async with scratch_database("outbox") as database:
+            outbox = server.EmailOutbox(1, 1000, 1000, 5)
+            monkeypatch.setattr(server, "email_outbox", outbox)
+            await database.users.insert_one({"id": "gone", "username": "gone"})
+            await database.email_reminders.insert_one({"user_id": "gone", "email": "gone@example.com"})
+            await database.payment_transactions.insert_one({"user_id": "gone", "session_id": "cs_gone"})
+            await database.webhook_events.insert_many([
+                {"id": "evt_1", "session_id": "cs_gone", "payload": "{}"},
+                {"id": "evt_2", "session_id": "cs_other", "payload": "{}"}
+            ])
+            shared = await outbox.enqueue_batch([
+                {"email": "gone@example.com", "username": "gone"},
+                {"email": "kept@example.com", "username": "kept", "user_id": "kept"}
+            ])
+            alone = await outbox.enqueue("gone-alt@example.com", "gone", user_id="gone")
+
+            await server.admin_delete_user("gone", admin={"id": "admin"})
+
+            job = await database.email_outbox.find_one({"id": shared})
+            assert [r["email"] for r in job["recipients"]] == ["kept@example.com"]
+            assert job["recipient_count"] == 1
+            assert await database.email_outbox.find_one({"id": alone}) is None
+            assert [e["id"] async for e in database.webhook_events.find({})] == ["evt_2"]
+    asyncio.run(scenario())
@@ -0,0 +1,122 @@
+"""
+Explain-plan checks for the startup index bootstrap
+Tests:
+- Every hot query the API issues is served by an index (no COLLSCAN)
+
+Creates the indexes with the backend's own ensure_indexes() in a scratch
+database on MONGO_URL, then inspects each query's winning plan; requires MongoDB.
+"""
+
+import pytest
+import asyncio
+import os
+import uuid
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
+
+import server
+
+MONGO_URL = os.environ['MONGO_URL']
+
+USER_ID = "explain-user"
+SESSION_ID = "explain-session"
+
+# (collection, filter, sort) for each hot query in backend/server.py
+HOT_QUERIES = [
+    ("users", {"id": USER_ID}, None),
+    ("users", {"username": "explain-username"}, None),
+    ("users", {"subscription_status": "active"}, [("created_at", -1), ("id", -1)]),
+    ("mood_checkins", {"user_id": USER_ID}, [("created_at", -1)]),
+    ("mood_checkins", {"user_id": USER_ID, "created_at": {"$gte": "2025-01-01"}}, [("created_at", 1)]),
+    ("diary_entries", {"user_id": USER_ID}, [("created_at", -1)]),
+    ("diary_entries", {"user_id": USER_ID, "created_at": {"$gte": "2025-01-01"}}, None),
+    ("chat_messages", {"user_id": USER_ID, "session_id": SESSION_ID}, [("created_at", 1)]),
+    ("chat_messages", {"user_id": USER_ID}, [("created_at", -1)]),
+    # Keyset pagination pages: (created_at, id) continuation after a cursor
+    ("mood_checkins", {"user_id": USER_ID, "created_at": {"$lte": "2025-01-01"},
+                       "$or": [{"created_at": {"$lt": "2025-01-01"}}, {"id": {"$lt": "m"}}]},
+     [("created_at", -1), ("id", -1)]),
+    ("diary_entries", {"user_id": USER_ID, "created_at": {"$lte": "2025-01-01"},
+                       "$or": [{"created_at": {"$lt": "2025-01-01"}}, {"id": {"$lt": "m"}}]},
+     [("created_at", -1), ("id", -1)]),
+    ("chat_messages", {"user_id": USER_ID, "session_id": SESSION_ID}, [("created_at", -1), ("id", -1)]),
+    ("chat_sessions", {"user_id": USER_ID}, [("last_message_at", -1)]),
+    ("chat_sessions", {"user_id": USER_ID, "session_id": SESSION_ID}, None),
+    ("payment_transactions", {"session_id": "cs_explain"}, None),
+    ("payment_transactions", {"user_id": USER_ID}, None),
+    ("payment_transactions", {"payment_status": "paid"}, None),
+    ("payment_transactions", {"payment_status": "paid", "ledger_booked": {"$ne": True}}, None),
+    ("revenue_ledger", {"transaction_id": "explain-transaction"}, None),
+    ("revenue_ledger", {"rolled_up": False}, None),
+    ("webhook_events", {"id": "evt_explain"}, None),
+    ("webhook_events", {"status": "pending", "next_attempt_at": {"$lte": "2025-01-01T09:00:00+00:00"}}, None),
+    ("webhook_events", {"status": "dead"}, [("created_at", -1), ("id", -1)]),
+    ("articles", {"id": "explain-article"}, None),
+    ("articles", {}, [("created_at", -1)]),
+    ("articles", {"$text": {"$search": "قلق"}}, None),
+    ("email_reminders", {"user_id": USER_ID}, None),
+    ("email_reminders", {"enabled": True}, None),
+    ("email_reminders", {"enabled": True, "next_fire_at": {"$lte": "2025-01-01T09:00:00+00:00"}}, None),
+    ("notification_settings", {"user_id": USER_ID}, None),
+]
+
+# Stages through which a plan reads an index rather than the collection
+INDEX_STAGES = {"IXSCAN", "IDHACK", "EXPRESS_IXSCAN", "EXPRESS_IDHACK", "COUNT_SCAN", "DISTINCT_SCAN"}
+
+
+def plan_stages(plan):
+    """Yield every stage name in a (possibly nested) query plan"""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from plan_stages(item)
+
+
+async def create_indexes(db_name):
+    client = AsyncIOMotorClient(MONGO_URL)
+    try:
+        with pytest.MonkeyPatch.context() as patch:
+            patch.setattr(server, "db", client[db_name])
+            await server.ensure_indexes()
+    finally:
+        client.close()
+
+
+@pytest.fixture(scope="module")
+def database():
+    client = MongoClient(MONGO_URL, serverSelectionTimeoutMS=5000)
+    db_name = f"explain_{uuid.uuid4().hex[:8]}"
+    asyncio.run(create_indexes(db_name))
+    yield client[db_name]
+    client.drop_database(db_name)
+    client.close()
+
+
+class TestHotQueryIndexes:
+    """Hot queries must never fall back to a collection scan"""
+
+    @pytest.mark.parametrize("collection,query,sort", HOT_QUERIES,
+                             ids=[f"{c}:{','.join(q) or 'all'}" for c, q, _ in HOT_QUERIES])
+    def test_query_uses_index(self, database, collection, query, sort):
+        cursor = database[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = cursor.explain()
+        winning_plan = explain["queryPlanner"]["winningPlan"]
+        stages = set(plan_stages(winning_plan))
+        assert "COLLSCAN" not in stages, f"{collection} query {query} uses a collection scan: {winning_plan}"
+        assert stages & INDEX_STAGES, f"{collection} query {query} reads no index: {winning_plan}"
+
+    def test_chat_sidebar_is_covered(self, database):
+        """The /chat/sessions read is answered from the index without fetching documents"""
+        cursor = database.chat_sessions.find(
+            {"user_id": USER_ID},
+            {"_id": 0, "session_id": 1, "last_message_at": 1, "message_count": 1, "preview": 1}
+        ).sort("last_message_at", -1)
+        winning_plan = cursor.explain()["queryPlanner"]["winningPlan"]
+        assert "FETCH" not in set(plan_stages(winning_plan)), f"Sidebar query fetches documents: {winning_plan}"
@@ -0,0 +1,62 @@
+"""
+Test suite for the fair LLM concurrency limiter
+Tests:
+- Global concurrency cap with one in-flight call per user
+- Round-robin admission so one busy user cannot starve others
+- Queue-wait deadline raises LlmQueueTimeout and leaves no waiters behind
+"""
+
+import asyncio
+
+import server
+
+CALL_SECONDS = 0.05
+
+
+async def run_calls(limiter, users, log):
+    async def call(user_id):
+        try:
+            async with limiter.slot(user_id):
+                log.append(user_id)
+                assert limiter.in_flight <= limiter.max_concurrency
+                await asyncio.sleep(CALL_SECONDS)
+            return "ok"
+        except server.LlmQueueTimeout:
+            return "timeout"
+    return await asyncio.gather(*[call(user_id) for user_id in users])
+
+
+class TestFairLlmLimiter:
+    """Admission order and deadlines for model calls"""
+
+    def test_busy_user_does_not_starve_others(self):
+        """A user with many queued calls is served round-robin with the others"""
+        limiter = server.FairLlmLimiter(max_concurrency=2, queue_timeout=5)
+        log = []
+        results = asyncio.run(run_calls(limiter, ["A"] * 5 + ["B", "C"], log))
+        assert results == ["ok"] * 7
+        assert log.index("C") < 3, f"C waited behind A's backlog: {log}"
+        stats = limiter.stats()
+        assert stats["completed"] == 7
+        assert stats["in_flight"] == 0 and stats["queue_depth"] == 0
+
+    def test_one_in_flight_per_user(self):
+        """A user's calls run one after another even when slots are free"""
+        limiter = server.FairLlmLimiter(max_concurrency=4, queue_timeout=5)
+
+        async def scenario():
+            start = asyncio.get_running_loop().time()
+            await run_calls(limiter, ["A"] * 3, [])
+            return asyncio.get_running_loop().time() - start
+        assert asyncio.run(scenario()) >= CALL_SECONDS * 3
+
+    def test_queue_deadline_falls_back(self):
+        """Calls that cannot get a slot before the deadline fail fast"""
+        limiter = server.FairLlmLimiter(max_concurrency=1, queue_timeout=CALL_SECONDS * 1.5)
+        results = asyncio.run(run_calls(limiter, ["A", "B", "C", "D"], []))
+        assert results.count("ok") == 2
+        assert results.count("timeout") == 2
+        stats = limiter.stats()
+        assert stats["queue_timeouts"] == 2
+        assert stats["queue_depth"] == 0
+        assert stats["queue_ms"]["max"] >= CALL_SECONDS * 1000
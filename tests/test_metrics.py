@@ -0,0 +1,115 @@
+"""
+Test suite for the /metrics endpoint
+Tests:
+- Histogram exposition (cumulative buckets, label escaping)
+- MongoDB command listener attributes getMore to its collection
+- Requests are recorded under their route template
+- Overhead of middleware plus command monitoring on a MongoDB-backed endpoint
+
+The overhead benchmark runs the backend module in-process against
+MONGO_URL/DB_NAME; requires MongoDB.
+"""
+
+import pytest
+import asyncio
+import time
+import uuid
+from types import SimpleNamespace
+
+import httpx
+
+import server
+
+ROUNDS = 15
+REQUESTS_PER_ROUND = 200
+
+
+class TestExposition:
+    """Prometheus text format"""
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = server.Histogram("demo_seconds", "Demo", ("route",), buckets=(0.1, 1.0))
+        for seconds in (0.05, 0.5, 0.5, 5):
+            histogram.observe(("/a",), seconds)
+        lines = histogram.render()
+        assert 'demo_seconds_bucket{route="/a",le="0.1"} 1' in lines
+        assert 'demo_seconds_bucket{route="/a",le="1.0"} 3' in lines
+        assert 'demo_seconds_bucket{route="/a",le="+Inf"} 4' in lines
+        assert 'demo_seconds_count{route="/a"} 4' in lines
+
+    def test_label_values_escaped(self):
+        histogram = server.Histogram("demo_seconds", "Demo", ("route",))
+        histogram.observe(('/a"b\\c',), 0.01)
+        assert 'demo_seconds_count{route="/a\\"b\\\\c"} 1' in histogram.render()
+
+    def test_get_more_attributed_to_collection(self):
+        listener = server.MongoCommandMetrics()
+        connection = ("localhost", 27017)
+        listener.started(SimpleNamespace(command_name="getMore", command={"getMore": 42, "collection": "metrics_demo"},
+                                         connection_id=connection, request_id=1))
+        listener.succeeded(SimpleNamespace(command_name="getMore", connection_id=connection, request_id=1,
+                                           duration_micros=2000))
+        assert any(line.startswith('mongodb_command_duration_seconds_count{collection="metrics_demo",command="getMore"')
+                   for line in server.mongo_command_duration.render())
+
+
+@pytest.fixture
+def diary_user():
+    """A user with a page of diary entries, served by the app in-process"""
+    user_id = f"test_metrics_user_{uuid.uuid4().hex[:8]}"
+    server.app.dependency_overrides[server.get_current_user] = lambda: {"id": user_id, "language": "en"}
+    yield user_id
+    server.app.dependency_overrides.clear()
+
+
+async def seed_diary(user_id):
+    await server.db.diary_entries.insert_many([
+        {"id": str(uuid.uuid4()), "user_id": user_id, "content": f"Entry {i}",
+         "created_at": f"2025-01-01T00:{i // 60:02d}:{i % 60:02d}+00:00"}
+        for i in range(50)
+    ])
+
+
+def test_routes_recorded_by_template(diary_user):
+    session_id = str(uuid.uuid4())
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://test") as http:
+            await http.get(f"/api/chat/history/{session_id}")
+            text = (await http.get("/metrics")).text
+        assert 'route="/api/chat/history/{session_id}"' in text
+        assert session_id not in text
+        assert 'collection="chat_messages"' in text
+    asyncio.run(scenario())
+
+
+def test_overhead_benchmark(diary_user, monkeypatch):
+    """Metrics cost under 2% of a MongoDB-backed endpoint's latency"""
+    async def timed_round(http):
+        start = time.perf_counter()
+        for _ in range(REQUESTS_PER_ROUND):
+            response = await http.get("/api/diary/entries")
+            assert response.status_code == 200
+        return time.perf_counter() - start
+
+    async def scenario():
+        await seed_diary(diary_user)
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://test") as http:
+                await timed_round(http)
+                samples = {True: [], False: []}
+                for i in range(ROUNDS):
+                    # Alternate which setting goes first so drift affects both equally
+                    for enabled in ((True, False) if i % 2 else (False, True)):
+                        monkeypatch.setattr(server, "METRICS_ENABLED", enabled)
+                        samples[enabled].append(await timed_round(http))
+        finally:
+            await server.db.diary_entries.delete_many({"user_id": diary_user})
+        return {enabled: sorted(times)[len(times) // 2] for enabled, times in samples.items()}
+
+    medians = asyncio.run(scenario())
+    overhead = medians[True] / medians[False] - 1
+    per_request_us = (medians[True] - medians[False]) / REQUESTS_PER_ROUND * 1e6
+    print(f"\nmetrics off={medians[False] / REQUESTS_PER_ROUND * 1000:.3f}ms/req "
+          f"on={medians[True] / REQUESTS_PER_ROUND * 1000:.3f}ms/req overhead={overhead:.2%} ({per_request_us:.1f}us)")
+    assert overhead < 0.02
@@ -0,0 +1,69 @@
+"""
+Test suite for the incrementally maintained streak state and mood rollups
+Tests:
+- Concurrent first check-ins are each counted exactly once
+- Users with history but no stored state are seeded from it once
+- Seeding never overwrites state that already exists
+
+Runs the backend module in-process against a scratch database on MONGO_URL;
+requires MongoDB.
+"""
+
+import asyncio
+import uuid
+from datetime import datetime, timezone, timedelta
+
+import server
+
+
+def user(user_id):
+    return {"id": user_id, "username": user_id, "language": "en"}
+
+
+async def check_in(user_id, feeling):
+    return await server.create_mood_checkin(server.MoodCheckIn(feeling=feeling), current_user=user(user_id))
+
+
+async def assert_matches_history(database, user_id, total):
+    streak = await database.mood_streaks.find_one({"user_id": user_id}, {"_id": 0})
+    rollup = await database.mood_rollups.find_one({"user_id": user_id}, {"_id": 0})
+    assert streak["total_checkins"] == total
+    assert rollup["total_checkins"] == total
+    expected = await server.compute_mood_rollup(user_id)
+    assert rollup["feelings"] == expected["feelings"]
+    assert rollup["days"] == expected["days"]
+
+
+def test_concurrent_first_checkins_counted_once(scratch_database):
+    async def scenario():
+        async with scratch_database("mood", indexes=True) as database:
+            feelings = ["happy", "sad", "happy", "anxious", "calm", "happy"]
+            await asyncio.gather(*(check_in("new-user", feeling) for feeling in feelings))
+            await assert_matches_history(database, "new-user", len(feelings))
+    asyncio.run(scenario())
+
+
+def test_legacy_history_seeded_once(scratch_database):
+    async def scenario():
+        async with scratch_database("mood", indexes=True) as database:
+            yesterday = datetime.now(timezone.utc) - timedelta(days=1)
+            await database.mood_checkins.insert_many([
+                {"id": str(uuid.uuid4()), "user_id": "legacy", "feeling": "sad", "note": "",
+                 "created_at": (yesterday - timedelta(minutes=i)).isoformat()}
+                for i in range(3)
+            ])
+            result = await asyncio.gather(check_in("legacy", "happy"), check_in("legacy", "calm"))
+            await assert_matches_history(database, "legacy", 5)
+            assert max(r["streak"]["current_streak"] for r in result) == 2
+    asyncio.run(scenario())
+
+
+def test_seed_does_not_overwrite(scratch_database):
+    async def scenario():
+        async with scratch_database("mood", indexes=True) as database:
+            await database.mood_streaks.insert_one({"user_id": "seeded", "total_checkins": 7, "current_streak": 3,
+                                                    "longest_streak": 4, "last_checkin_date": "2025-06-01"})
+            state = await server.seed_streak_state("seeded")
+            assert state["total_checkins"] == 7
+            assert (await database.mood_streaks.find_one({"user_id": "seeded"}))["total_checkins"] == 7
+    asyncio.run(scenario())
@@ -0,0 +1,101 @@
+"""
+Benchmark for the password hashing pool
+Tests:
+- /api/health p99 latency stays steady while 200 concurrent logins run
+- Password pool statistics are exposed to the admin
+"""
+
+import pytest
+import requests
+import os
+import uuid
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'https://wellness-hub-438.preview.emergentagent.com').rstrip('/')
+
+# Admin credentials
+ADMIN_USERNAME = "msallam227"
+ADMIN_PASSWORD = "Muhammad#01"
+
+# Test user credentials
+TEST_USER = f"test_pool_user_{uuid.uuid4().hex[:8]}"
+TEST_PASSWORD = "Test123!"
+
+CONCURRENT_LOGINS = 200
+HEALTH_PROBES = 100
+
+
+def p99(samples):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+
+
+def probe_health(count):
+    """Measure /api/health latency in milliseconds"""
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        response = requests.get(f"{BASE_URL}/api/health")
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200
+    return latencies
+
+
+class TestPasswordPoolBenchmark:
+    """Login spikes must not stall the event loop"""
+
+    @pytest.fixture(scope="class")
+    def registered_user(self):
+        """Register a user to log in with"""
+        response = requests.post(f"{BASE_URL}/api/auth/register", json={
+            "username": TEST_USER,
+            "password": TEST_PASSWORD,
+            "birthdate": "1990-01-15",
+            "country": "Egypt",
+            "city": "Cairo",
+            "occupation": "Engineer",
+            "gender": "male",
+            "language": "en"
+        })
+        assert response.status_code == 200, f"Registration failed: {response.text}"
+        return TEST_USER
+
+    def login(self, username):
+        return requests.post(f"{BASE_URL}/api/auth/login", json={
+            "username": username,
+            "password": TEST_PASSWORD
+        }).status_code
+
+    def test_health_p99_under_login_spike(self, registered_user):
+        """Health check p99 stays within bounds while logins are hashing"""
+        baseline = probe_health(HEALTH_PROBES)
+
+        with ThreadPoolExecutor(max_workers=CONCURRENT_LOGINS) as pool:
+            logins = [pool.submit(self.login, registered_user) for _ in range(CONCURRENT_LOGINS)]
+            under_load = probe_health(HEALTH_PROBES)
+            statuses = [f.result() for f in logins]
+
+        assert all(status in (200, 503) for status in statuses), f"Unexpected login statuses: {set(statuses)}"
+        assert statuses.count(200) > 0, "No login succeeded"
+
+        baseline_p99 = p99(baseline)
+        load_p99 = p99(under_load)
+        print(f"\n/api/health p99 baseline={baseline_p99:.1f}ms under_load={load_p99:.1f}ms")
+        assert load_p99 < max(baseline_p99 * 3, baseline_p99 + 100), \
+            f"Health p99 degraded from {baseline_p99:.1f}ms to {load_p99:.1f}ms"
+
+    def test_password_pool_stats(self):
+        """Admin can read password pool queue metrics"""
+        response = requests.post(f"{BASE_URL}/api/auth/admin/login", json={
+            "username": ADMIN_USERNAME,
+            "password": ADMIN_PASSWORD
+        })
+        assert response.status_code == 200, "Admin login failed"
+        headers = {"Authorization": f"Bearer {response.json()['token']}"}
+
+        response = requests.get(f"{BASE_URL}/api/admin/system/stats", headers=headers)
+        assert response.status_code == 200
+        stats = response.json()["password_pool"]
+        for key in ("queue_depth", "peak_queue_depth", "in_flight", "completed", "max_concurrency"):
+            assert key in stats, f"Missing {key} in password pool stats"
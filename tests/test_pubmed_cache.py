@@ -0,0 +1,146 @@
+"""
+Test suite for the PubMed results cache
+Tests:
+- Repeat searches are served from the cache
+- Concurrent identical misses share one upstream fetch
+- Expired entries are served stale while a refresh runs
+- Upstream failures are not cached
+- Result windows are fetched with retstart in aligned, cached blocks
+
+Runs the backend module in-process against a local fake PubMed server.
+"""
+
+import asyncio
+
+from aiohttp import web
+
+import server
+
+
+class FakePubMed:
+    """Minimal esearch/esummary server that counts upstream calls"""
+
+    def __init__(self, delay=0.0, hits=2):
+        self.delay = delay
+        self.hits = hits
+        self.search_calls = 0
+        self.summary_calls = 0
+        self.fail = False
+
+    async def esearch(self, request):
+        self.search_calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            return web.Response(status=503)
+        retstart = int(request.query.get("retstart", 0))
+        retmax = int(request.query["retmax"])
+        ids = [str(101 + i) for i in range(retstart, min(retstart + retmax, self.hits))]
+        return web.json_response({"esearchresult": {"idlist": ids, "count": str(self.hits)}})
+
+    async def esummary(self, request):
+        self.summary_calls += 1
+        ids = request.query["id"].split(",")
+        return web.json_response({"result": {
+            pmid: {"title": f"Study {pmid}", "fulljournalname": "Journal", "sortfirstauthor": "Author", "pubdate": "2025"}
+            for pmid in ids
+        }})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/esearch.fcgi", self.esearch)
+        app.router.add_get("/esummary.fcgi", self.esummary)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+def run_with_fake_pubmed(monkeypatch, scenario, delay=0.0, ttl=60.0, stale=60.0, hits=2):
+    """Point the backend at a fake PubMed server with a fresh cache and run scenario(fake)"""
+    async def runner():
+        fake = FakePubMed(delay=delay, hits=hits)
+        base_url = await fake.start()
+        monkeypatch.setattr(server, "PUBMED_SEARCH_URL", f"{base_url}/esearch.fcgi")
+        monkeypatch.setattr(server, "PUBMED_FETCH_URL", f"{base_url}/esummary.fcgi")
+        monkeypatch.setattr(server, "pubmed_cache", server.AsyncTTLCache(100, ttl, stale))
+        try:
+            await scenario(fake)
+        finally:
+            await server.close_http_session()
+            await fake.stop()
+    asyncio.run(runner())
+
+
+class TestPubMedCache:
+    """PubMed results cache behaviour"""
+
+    def test_repeat_search_served_from_cache(self, monkeypatch):
+        """Second identical search does not hit PubMed"""
+        async def scenario(fake):
+            first = await server.fetch_pubmed_articles("anxiety", 20)
+            second = await server.fetch_pubmed_articles("Anxiety ", 20)
+            assert len(first) == 2
+            assert second == first
+            assert fake.search_calls == 1
+            assert server.pubmed_cache.stats()["hits"] == 1
+        run_with_fake_pubmed(monkeypatch, scenario)
+
+    def test_concurrent_misses_coalesced(self, monkeypatch):
+        """Concurrent identical misses share a single upstream fetch"""
+        async def scenario(fake):
+            results = await asyncio.gather(*[server.fetch_pubmed_articles("stress", 20) for _ in range(50)])
+            assert all(len(r) == 2 for r in results)
+            assert fake.search_calls == 1
+            stats = server.pubmed_cache.stats()
+            assert stats["misses"] == 1
+            assert stats["coalesced"] == 49
+        run_with_fake_pubmed(monkeypatch, scenario, delay=0.2)
+
+    def test_stale_while_revalidate(self, monkeypatch):
+        """Expired entries are returned immediately and refreshed in the background"""
+        async def scenario(fake):
+            await server.fetch_pubmed_articles("sleep", 20)
+            await asyncio.sleep(0.15)
+
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            stale = await server.fetch_pubmed_articles("sleep", 20)
+            assert loop.time() - start < 0.1, "Stale entry should be served without waiting for upstream"
+            assert len(stale) == 2
+
+            await asyncio.sleep(0.4)
+            assert fake.search_calls == 2
+            assert server.pubmed_cache.stats()["stale_hits"] == 1
+        run_with_fake_pubmed(monkeypatch, scenario, delay=0.2, ttl=0.1, stale=60.0)
+
+    def test_failures_not_cached(self, monkeypatch):
+        """A failed upstream fetch returns no articles and is retried next time"""
+        async def scenario(fake):
+            fake.fail = True
+            assert await server.fetch_pubmed_articles("trauma", 20) == []
+            fake.fail = False
+            assert len(await server.fetch_pubmed_articles("trauma", 20)) == 2
+            assert fake.search_calls == 2
+        run_with_fake_pubmed(monkeypatch, scenario)
+
+    def test_window_fetched_in_cached_blocks(self, monkeypatch):
+        """Deep windows use retstart and neighbouring pages reuse the same blocks"""
+        async def scenario(fake):
+            monkeypatch.setattr(server, "PUBMED_BLOCK_SIZE", 20)
+            window = await server.fetch_pubmed_window("anxiety", 30, 45)
+            assert window["count"] == 45
+            assert [a["id"] for a in window["articles"]] == [f"pubmed_{101 + i}" for i in range(30, 45)]
+            assert fake.search_calls == 2
+
+            await server.fetch_pubmed_window("anxiety", 25, 35)
+            assert fake.search_calls == 2
+
+            counted = await server.fetch_pubmed_page("anxiety", 0, 0)
+            assert counted == {"count": 45, "articles": []}
+            assert fake.summary_calls == 2
+        run_with_fake_pubmed(monkeypatch, scenario, hits=45)
@@ -0,0 +1,121 @@
+"""
+Test suite for the reminder scheduler
+Tests:
+- compute_next_fire_at across DST transitions and day rollover
+- Reminders missed by more than the lateness cutoff are advanced, not sent
+- A restarted scheduler does not resend a reminder it already dispatched
+- A database error during startup backfill is retried on the next tick
+
+The dispatch tests run the backend module in-process against a scratch
+database on MONGO_URL; requires MongoDB.
+"""
+
+import pytest
+import asyncio
+from datetime import datetime, timezone, timedelta
+
+from pymongo.errors import PyMongoError
+
+import server
+
+UTC = timezone.utc
+
+
+class TestComputeNextFireAt:
+    """Wall-clock reminder times resolved to UTC instants"""
+
+    def test_same_day_and_rollover(self):
+        after = datetime(2025, 6, 1, 12, 0, tzinfo=UTC)
+        assert server.compute_next_fire_at("14:30", "UTC", after) == datetime(2025, 6, 1, 14, 30, tzinfo=UTC)
+        assert server.compute_next_fire_at("09:00", "UTC", after) == datetime(2025, 6, 2, 9, 0, tzinfo=UTC)
+        # Exactly at the fire time moves to the next day
+        fire = datetime(2025, 6, 1, 14, 30, tzinfo=UTC)
+        assert server.compute_next_fire_at("14:30", "UTC", fire) == fire + timedelta(days=1)
+
+    def test_offset_changes_across_dst(self):
+        """09:00 in New York is 14:00 UTC in winter and 13:00 UTC after the spring change"""
+        before = server.compute_next_fire_at("09:00", "America/New_York", datetime(2025, 3, 8, 15, 0, tzinfo=UTC))
+        after = server.compute_next_fire_at("09:00", "America/New_York", before)
+        assert before == datetime(2025, 3, 9, 13, 0, tzinfo=UTC)
+        assert after == datetime(2025, 3, 10, 13, 0, tzinfo=UTC)
+        assert server.compute_next_fire_at("09:00", "America/New_York", datetime(2025, 3, 7, 15, 0, tzinfo=UTC)) == \
+            datetime(2025, 3, 8, 14, 0, tzinfo=UTC)
+
+    def test_skipped_time_resolves_forward(self):
+        """02:30 does not exist on the spring-forward day; it fires at 03:30 local time"""
+        fire = server.compute_next_fire_at("02:30", "America/New_York", datetime(2025, 3, 9, 5, 0, tzinfo=UTC))
+        assert fire == datetime(2025, 3, 9, 7, 30, tzinfo=UTC)
+
+    def test_repeated_time_fires_once(self):
+        """01:30 happens twice on the fall-back day; only the first occurrence fires"""
+        first = server.compute_next_fire_at("01:30", "America/New_York", datetime(2025, 11, 2, 4, 0, tzinfo=UTC))
+        assert first == datetime(2025, 11, 2, 5, 30, tzinfo=UTC)
+        assert server.compute_next_fire_at("01:30", "America/New_York", first) == datetime(2025, 11, 3, 6, 30, tzinfo=UTC)
+
+    def test_invalid_input_falls_back(self):
+        after = datetime(2025, 6, 1, 0, 0, tzinfo=UTC)
+        assert server.compute_next_fire_at("bogus", "Not/AZone", after) == datetime(2025, 6, 1, 9, 0, tzinfo=UTC)
+
+
+async def seed_reminder(database, user_id, next_fire_at):
+    await database.users.insert_one({"id": user_id, "username": user_id, "language": "en"})
+    await database.email_reminders.insert_one({
+        "user_id": user_id, "email": f"{user_id}@example.com", "enabled": True,
+        "reminder_time": "09:00", "timezone": "UTC", "next_fire_at": next_fire_at.isoformat()
+    })
+
+
+async def queued_recipients(database):
+    jobs = await database.email_outbox.find({}, {"_id": 0, "recipients": 1}).to_list(None)
+    return sorted(r["email"] for job in jobs for r in job["recipients"])
+
+
+def test_late_reminders_advanced_not_sent(scratch_database):
+    async def scenario():
+        async with scratch_database("reminders") as database:
+            now = datetime(2025, 6, 1, 9, 0, 20, tzinfo=UTC)
+            await seed_reminder(database, "on-time", datetime(2025, 6, 1, 9, 0, tzinfo=UTC))
+            await seed_reminder(database, "stale", now - timedelta(minutes=server.REMINDER_MAX_LATENESS_MINUTES + 5))
+
+            scheduler = server.ReminderScheduler()
+            assert await scheduler.dispatch_due(now) == 1
+            assert await queued_recipients(database) == ["on-time@example.com"]
+            assert scheduler.total_skipped_late == 1
+
+            stale = await database.email_reminders.find_one({"user_id": "stale"})
+            assert stale["next_fire_at"] == datetime(2025, 6, 2, 9, 0, tzinfo=UTC).isoformat()
+    asyncio.run(scenario())
+
+
+def test_restart_does_not_resend(scratch_database):
+    async def scenario():
+        async with scratch_database("reminders") as database:
+            now = datetime(2025, 6, 1, 9, 0, 5, tzinfo=UTC)
+            await seed_reminder(database, "user-a", datetime(2025, 6, 1, 9, 0, tzinfo=UTC))
+
+            assert await server.ReminderScheduler().dispatch_due(now) == 1
+            # A new process ticking the same minute finds the reminder already advanced
+            assert await server.ReminderScheduler().dispatch_due(now + timedelta(seconds=30)) == 0
+            assert await queued_recipients(database) == ["user-a@example.com"]
+    asyncio.run(scenario())
+
+
+def test_startup_backfill_retried(monkeypatch, scratch_database):
+    """A failed backfill neither stops the scheduler nor is skipped on later ticks"""
+    async def scenario():
+        async with scratch_database("reminders") as database:
+            await database.email_reminders.insert_one({"user_id": "legacy", "enabled": True, "reminder_time": "09:00", "timezone": "UTC"})
+            scheduler = server.ReminderScheduler()
+            original = scheduler.assign_missing_fire_times
+
+            async def flaky():
+                monkeypatch.setattr(scheduler, "assign_missing_fire_times", original)
+                raise PyMongoError("connection refused")
+            monkeypatch.setattr(scheduler, "assign_missing_fire_times", flaky)
+
+            with pytest.raises(PyMongoError):
+                await scheduler.tick()
+            await scheduler.tick()
+            assert "next_fire_at" in await database.email_reminders.find_one({"user_id": "legacy"})
+            assert scheduler.last_tick_at is not None
+    asyncio.run(scenario())
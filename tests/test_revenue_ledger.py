@@ -0,0 +1,83 @@
+"""
+Test suite for revenue ledger reconciliation
+Tests:
+- Transactions paid before the ledger existed (or whose booking was lost) are booked at startup
+- Ledger entries a crash left out of the rollups are added exactly once
+- Reconciling only adds deltas, so concurrent bookings and existing totals are kept
+
+Runs the backend module in-process against a scratch database on MONGO_URL;
+requires MongoDB.
+"""
+
+import asyncio
+import uuid
+
+import server
+
+
+def transaction(amount, tier, paid_at, status="paid"):
+    return {
+        "id": str(uuid.uuid4()), "session_id": f"cs_{uuid.uuid4().hex[:8]}", "user_id": "user-a",
+        "amount": amount, "currency": "usd", "tier": tier, "payment_status": status,
+        "created_at": paid_at, "updated_at": paid_at
+    }
+
+
+async def rollup(database, key):
+    return server.revenue_from_rollup(await database.revenue_rollups.find_one({"_id": key}))
+
+
+def test_startup_books_unledgered_payments(scratch_database):
+    async def scenario():
+        async with scratch_database("revenue", indexes=True) as database:
+            await database.payment_transactions.insert_many([
+                transaction(9.99, "monthly", "2025-05-03T10:00:00+00:00"),
+                transaction(99.99, "yearly", "2025-06-01T08:00:00+00:00"),
+                transaction(9.99, "monthly", "2025-06-02T08:00:00+00:00", status="pending")
+            ])
+
+            await server.reconcile_revenue_ledger()
+            assert await rollup(database, "total") == {"revenue": 109.98, "transactions": 2}
+            assert await rollup(database, "month:2025-06") == {"revenue": 99.99, "transactions": 1}
+            assert await rollup(database, "tier:monthly") == {"revenue": 9.99, "transactions": 1}
+
+            await server.reconcile_revenue_ledger()
+            assert await database.revenue_ledger.count_documents({}) == 2
+            assert await rollup(database, "total") == {"revenue": 109.98, "transactions": 2}
+    asyncio.run(scenario())
+
+
+def test_unrolled_entries_added_once(scratch_database):
+    """An entry whose rollup write never happened is counted; entries predating the flag are not recounted"""
+    async def scenario():
+        async with scratch_database("revenue", indexes=True) as database:
+            legacy = transaction(9.99, "monthly", "2025-06-01T12:00:00+00:00")
+            crashed = transaction(19.99, "monthly", "2025-06-05T12:00:00+00:00")
+            legacy_entry = server.revenue_ledger_entry(legacy, legacy["updated_at"])
+            del legacy_entry["rolled_up"]
+            await database.revenue_ledger.insert_many([legacy_entry, server.revenue_ledger_entry(crashed, crashed["updated_at"])])
+            await database.revenue_rollups.insert_one({"_id": "total", "amount_cents": 999, "count": 1})
+            await database.payment_transactions.insert_many([{**legacy, "ledger_booked": True}, {**crashed, "ledger_booked": True}])
+
+            assert await server.reconcile_revenue() == {"booked": 0, "rolled_up": 1}
+            assert await server.reconcile_revenue() == {"booked": 0, "rolled_up": 0}
+            assert await rollup(database, "total") == {"revenue": 29.98, "transactions": 2}
+            assert await rollup(database, "day:2025-06-05") == {"revenue": 19.99, "transactions": 1}
+    asyncio.run(scenario())
+
+
+def test_concurrent_reconcile_counts_once(scratch_database):
+    async def scenario():
+        async with scratch_database("revenue", indexes=True) as database:
+            payments = [transaction(9.99, "monthly", f"2025-06-0{i + 1}T08:00:00+00:00") for i in range(4)]
+            await database.payment_transactions.insert_many(payments)
+
+            await asyncio.gather(
+                server.reconcile_revenue(),
+                server.reconcile_revenue(),
+                *(server.record_revenue(p, p["updated_at"]) for p in payments)
+            )
+            assert await database.revenue_ledger.count_documents({}) == 4
+            assert await rollup(database, "total") == {"revenue": 39.96, "transactions": 4}
+            assert await rollup(database, "tier:monthly") == {"revenue": 39.96, "transactions": 4}
+    asyncio.run(scenario())
@@ -0,0 +1,235 @@
+"""
+Test suite for the Stripe webhook inbox
+Tests:
+- Bad signatures are rejected and nothing is stored
+- Redelivered events are acknowledged but applied exactly once
+- Replaying an applied event does not double-book revenue
+- Acknowledgement latency under a burst of deliveries
+- /payments/status coalesces Stripe lookups and long-polls until the webhook lands
+
+Runs the backend in-process on a local uvicorn server with a fake Stripe
+signer standing in for StripeCheckout; requires MongoDB at MONGO_URL/DB_NAME.
+"""
+
+import pytest
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import requests
+import uvicorn
+from pymongo import MongoClient
+
+import server
+
+SIGNING_SECRET = "whsec_test_secret"
+BURST = 200
+
+
+def sign(body: bytes, timestamp: int = None) -> str:
+    """Stripe-Signature header for body, in Stripe's t=...,v1=... format"""
+    timestamp = timestamp or int(time.time())
+    digest = hmac.new(SIGNING_SECRET.encode(), f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+class FakeStripeCheckout:
+    """Verifies signatures like Stripe's SDK and parses checkout.session.completed events"""
+
+    status_lookups = []
+
+    def __init__(self, api_key, webhook_url):
+        self.webhook_url = webhook_url
+
+    async def get_checkout_status(self, session_id):
+        self.status_lookups.append(session_id)
+        await asyncio.sleep(0.05)
+        return SimpleNamespace(status="open", payment_status="unpaid", amount_total=500, currency="usd")
+
+    async def handle_webhook(self, body, signature):
+        parts = dict(item.split("=", 1) for item in (signature or "").split(","))
+        expected = hmac.new(SIGNING_SECRET.encode(), f"{parts.get('t')}.".encode() + body, hashlib.sha256).hexdigest()
+        if not hmac.compare_digest(expected, parts.get("v1", "")):
+            raise ValueError("No signatures found matching the expected signature for payload")
+        event = json.loads(body)
+        session = event["data"]["object"]
+        return SimpleNamespace(
+            event_id=event["id"],
+            event_type=event["type"],
+            session_id=session["id"],
+            payment_status=session["payment_status"],
+            metadata=session.get("metadata", {})
+        )
+
+
+def checkout_event(session_id, user_id):
+    return json.dumps({
+        "id": f"evt_{uuid.uuid4().hex}",
+        "type": "checkout.session.completed",
+        "data": {"object": {"id": session_id, "payment_status": "paid", "metadata": {"user_id": user_id}}}
+    }).encode()
+
+
+@pytest.fixture(scope="module")
+def database():
+    client = MongoClient(os.environ['MONGO_URL'])
+    yield client[os.environ['DB_NAME']]
+    client.close()
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    """Run the app on a local port with the fake Stripe signer"""
+    patched = server.StripeCheckout
+    server.StripeCheckout = FakeStripeCheckout
+    server._stripe_checkouts.clear()
+    server.app.dependency_overrides[server.get_admin_user] = lambda: {"is_admin": True}
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    uvicorn_server = uvicorn.Server(uvicorn.Config(server.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=uvicorn_server.run, daemon=True)
+    thread.start()
+    while not uvicorn_server.started:
+        time.sleep(0.05)
+
+    yield f"http://127.0.0.1:{port}"
+
+    uvicorn_server.should_exit = True
+    thread.join(timeout=5)
+    server.app.dependency_overrides.clear()
+    server.StripeCheckout = patched
+    server._stripe_checkouts.clear()
+
+
+@pytest.fixture
+def pending_checkout(database):
+    """A user with a pending checkout session"""
+    user_id = f"test_webhook_user_{uuid.uuid4().hex[:8]}"
+    session_id = f"cs_test_{uuid.uuid4().hex}"
+    database.users.insert_one({"id": user_id, "username": user_id, "subscription_status": "inactive",
+                               "created_at": "2025-01-01T00:00:00+00:00"})
+    database.payment_transactions.insert_one({"id": str(uuid.uuid4()), "session_id": session_id, "user_id": user_id,
+                                              "amount": 5.0, "currency": "usd", "tier": "standard",
+                                              "payment_status": "pending", "created_at": "2025-01-01T00:00:00+00:00"})
+    yield user_id, session_id
+    database.users.delete_one({"id": user_id})
+    database.payment_transactions.delete_many({"user_id": user_id})
+    database.revenue_ledger.delete_many({"user_id": user_id})
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+class TestStripeWebhook:
+    """Fast-ack webhook with an idempotent background consumer"""
+
+    def test_bad_signature_rejected(self, base_url, database):
+        body = checkout_event("cs_forged", "nobody")
+        response = requests.post(f"{base_url}/api/webhook/stripe", data=body,
+                                 headers={"Stripe-Signature": "t=1,v1=deadbeef"})
+        assert response.status_code == 400
+        assert database.webhook_events.find_one({"session_id": "cs_forged"}) is None
+
+    def test_redelivery_applied_once(self, base_url, database, pending_checkout):
+        """Stripe retries of one event are all acknowledged, applied once"""
+        user_id, session_id = pending_checkout
+        body = checkout_event(session_id, user_id)
+        with ThreadPoolExecutor(5) as pool:
+            responses = list(pool.map(
+                lambda _: requests.post(f"{base_url}/api/webhook/stripe", data=body, headers={"Stripe-Signature": sign(body)}),
+                range(5)
+            ))
+        assert [r.status_code for r in responses] == [200] * 5
+        assert sum(not r.json()["duplicate"] for r in responses) == 1
+
+        event_id = json.loads(body)["id"]
+        assert wait_for(lambda: database.webhook_events.find_one({"id": event_id})["status"] == "done")
+        assert database.users.find_one({"id": user_id})["subscription_status"] == "active"
+        assert database.payment_transactions.find_one({"session_id": session_id})["payment_status"] == "paid"
+        assert database.revenue_ledger.count_documents({"session_id": session_id}) == 1
+
+    def test_replay_does_not_double_book(self, base_url, database, pending_checkout):
+        user_id, session_id = pending_checkout
+        body = checkout_event(session_id, user_id)
+        requests.post(f"{base_url}/api/webhook/stripe", data=body, headers={"Stripe-Signature": sign(body)})
+        event_id = json.loads(body)["id"]
+        assert wait_for(lambda: database.webhook_events.find_one({"id": event_id})["status"] == "done")
+
+        response = requests.post(f"{base_url}/api/admin/webhooks/replay", params={"event_id": event_id})
+        assert response.json()["replayed"] == 1
+        assert wait_for(lambda: database.webhook_events.find_one({"id": event_id})["status"] == "done")
+        assert database.revenue_ledger.count_documents({"session_id": session_id}) == 1
+
+    def test_ack_latency_benchmark(self, base_url, database, pending_checkout):
+        """Acknowledgement does not wait for the subscription updates"""
+        user_id, session_id = pending_checkout
+        bodies = [checkout_event(session_id, user_id) for _ in range(BURST)]
+        http = requests.Session()
+        samples = []
+        for body in bodies:
+            start = time.perf_counter()
+            response = http.post(f"{base_url}/api/webhook/stripe", data=body, headers={"Stripe-Signature": sign(body)})
+            samples.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200
+        samples.sort()
+        p50 = samples[len(samples) // 2]
+        p99 = samples[int(len(samples) * 0.99)]
+        print(f"\n{BURST} webhook deliveries: ack p50={p50:.2f}ms p99={p99:.2f}ms")
+
+        event_ids = [json.loads(body)["id"] for body in bodies]
+        assert wait_for(lambda: database.webhook_events.count_documents({"id": {"$in": event_ids}, "status": "done"}) == BURST, timeout=30)
+        assert database.revenue_ledger.count_documents({"session_id": session_id}) == 1
+        database.webhook_events.delete_many({"id": {"$in": event_ids}})
+        assert p50 < 50
+
+
+class TestPaymentStatus:
+    """Status polls go to Stripe only while the session is pending"""
+
+    def test_polls_coalesce_then_answer_from_database(self, base_url, pending_checkout):
+        user_id, session_id = pending_checkout
+        server.app.dependency_overrides[server.get_current_user] = lambda: {"id": user_id}
+        url = f"{base_url}/api/payments/status/{session_id}"
+
+        with ThreadPoolExecutor(10) as pool:
+            pending = list(pool.map(lambda _: requests.get(url).json(), range(10)))
+        assert all(p["payment_status"] == "unpaid" for p in pending)
+        assert FakeStripeCheckout.status_lookups.count(session_id) == 1
+
+        # A long-poll returns as soon as the webhook records the payment
+        with ThreadPoolExecutor(1) as pool:
+            start = time.perf_counter()
+            long_poll = pool.submit(requests.get, url, params={"wait": 10})
+            time.sleep(0.3)
+            body = checkout_event(session_id, user_id)
+            requests.post(f"{base_url}/api/webhook/stripe", data=body, headers={"Stripe-Signature": sign(body)})
+            result = long_poll.result(timeout=15).json()
+            elapsed = time.perf_counter() - start
+        assert result["payment_status"] == "paid"
+        assert elapsed < 3, f"Long-poll took {elapsed:.1f}s after the webhook"
+
+        for _ in range(20):
+            assert requests.get(url).json() == {"status": "complete", "payment_status": "paid",
+                                                "amount_total": 500, "currency": "usd"}
+        assert FakeStripeCheckout.status_lookups.count(session_id) == 1
+
+    def test_other_users_session_not_found(self, base_url, pending_checkout):
+        _, session_id = pending_checkout
+        server.app.dependency_overrides[server.get_current_user] = lambda: {"id": "someone-else"}
+        assert requests.get(f"{base_url}/api/payments/status/{session_id}").status_code == 404